@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from analysis.screener import ScreenQuery, QueryError
+from config import ALERTS_DB, ALERT_BATCH_SIZE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    coins TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_state (
+    rule_id INTEGER NOT NULL,
+    crypto_id TEXT NOT NULL,
+    active INTEGER NOT NULL,
+    date TEXT,
+    PRIMARY KEY (rule_id, crypto_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS alert_state_coin ON alert_state (crypto_id);
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_id INTEGER NOT NULL,
+    rule_name TEXT NOT NULL,
+    crypto_id TEXT NOT NULL,
+    date TEXT,
+    fired REAL NOT NULL,
+    payload TEXT NOT NULL,
+    delivered REAL
+);
+CREATE INDEX IF NOT EXISTS alert_outbox_pending ON alert_outbox (delivered, id);
+CREATE TABLE IF NOT EXISTS alert_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _plain(value):
+    """JSON-safe scalar from a table cell (numpy types, NaN -> None)"""
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class AlertEngine:
+    """
+    Edge-triggered alert rules over the screener's latest indicator table.
+
+    A rule is a screener condition ("signal == 'BUY'", "RSI < 30"), optionally
+    limited to some coins. The engine stores, per rule and coin, whether the
+    condition held at the last evaluation and fires only when it turns true -
+    "RSI < 30" fires when RSI crosses below 30, not on every bar it stays there.
+    Fired alerts go to an SQLite outbox for a delivery worker to drain.
+
+    evaluate() looks only at the coins saved since its last change-feed
+    position. Rules sharing a condition are evaluated once, each distinct
+    condition as a vectorized mask over the changed rows, and rule state is
+    read and written in batches, so thousands of rules cost a few SQLite
+    round trips per ingest. The feed position is committed with the state and
+    outbox rows, so a crash or a concurrent process never fires a change twice.
+    """
+
+    def __init__(self, screener, changes, db_path=ALERTS_DB, batch_size=ALERT_BATCH_SIZE):
+        self.screener = screener
+        self.changes = changes
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = _connect(db_path)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    # ---- Rules ----
+    def add_rule(self, name, condition, coins=None):
+        """
+        Store a rule and seed its state from the current table, so it fires on
+        the next change that makes it true; returns the rule dictionary.
+        Raises QueryError for a condition the table cannot evaluate or when
+        coins is not a list of coin ids.
+        """
+        if coins is not None and (not isinstance(coins, (list, tuple))
+                                  or not all(isinstance(c, str) and c and ',' not in c for c in coins)):
+            raise QueryError("coins must be a list of coin ids")
+        table = self.screener.table()
+        mask = ScreenQuery(condition, table.columns).mask(table)
+        coins = sorted(set(coins)) if coins else None
+        if coins:
+            mask = mask[mask.index.isin(coins)]
+
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rule_id = conn.execute("INSERT INTO alert_rules (name, condition, coins, created) VALUES (?, ?, ?, ?)",
+                                   (name, condition, ','.join(coins) if coins else None, time.time())).lastrowid
+            dates = table['date'] if 'date' in table.columns else {}
+            conn.executemany("INSERT INTO alert_state (rule_id, crypto_id, active, date) VALUES (?, ?, ?, ?)",
+                             ((rule_id, crypto_id, int(active), _plain(dates.get(crypto_id)))
+                              for crypto_id, active in mask.items()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self.logger.info(f"Added alert rule {rule_id} ({name}): {condition}")
+        return {'id': rule_id, 'name': name, 'condition': condition, 'coins': coins}
+
+    def remove_rule(self, rule_id):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,)).rowcount
+            conn.execute("DELETE FROM alert_state WHERE rule_id = ?", (rule_id,))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return bool(removed)
+
+    def rules(self):
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT * FROM alert_rules ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        return [{'id': row['id'], 'name': row['name'], 'condition': row['condition'],
+                 'coins': row['coins'].split(',') if row['coins'] else None, 'created': row['created']}
+                for row in rows]
+
+    # ---- Evaluate ----
+    def _position(self, conn):
+        row = conn.execute("SELECT value FROM alert_meta WHERE key = 'feed_position'").fetchone()
+        return int(row['value']) if row else None
+
+    def evaluate(self):
+        """Fire the rules that turned true for coins saved since the last evaluation; returns the fired count"""
+        with self._lock:
+            conn = _connect(self.db_path)
+            try:
+                return self._evaluate(conn)
+            finally:
+                conn.close()
+
+    def _evaluate(self, conn):
+        started = time.perf_counter()
+        position = self._position(conn)
+        if position is None:
+            position = 0  # first run: every coin in the feed gets its state recorded
+        changed, new_position = self.changes.changed_ids(position, kinds=('historical', 'metrics'))
+        if new_position == position:
+            return 0
+        # Read the feed first: the refreshed table then covers at least these changes
+        self.screener.refresh()
+        table = self.screener.table()
+        rows = table[table.index.isin(changed)]
+
+        transitions, fired = [], []
+        rules = self.rules()
+        if len(rows) and rules:
+            dates = rows['date'] if 'date' in rows.columns else {}
+            previous = self._load_state(conn, rows.index)
+            compiled = {}  # condition -> (query, mask); rules sharing a condition evaluate it once
+            for rule in rules:
+                if rule['condition'] not in compiled:
+                    compiled[rule['condition']] = self._compile(rule, rows)
+                query, mask = compiled[rule['condition']]
+                if mask is None:
+                    continue
+                if rule['coins']:
+                    mask = mask[mask.index.isin(rule['coins'])]
+                for crypto_id, active in zip(mask.index, mask.to_numpy()):
+                    before = previous.get((rule['id'], crypto_id))
+                    if before is not None and before == active:
+                        continue
+                    transitions.append((rule['id'], crypto_id, int(active), _plain(dates.get(crypto_id))))
+                    if active and before is not None:  # a coin seen for the first time only records its state
+                        fired.append(self._alert(rule, query, crypto_id, rows.loc[crypto_id]))
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._position(conn) not in (None, position):
+                conn.execute("ROLLBACK")  # another process evaluated these changes meanwhile
+                return 0
+            conn.executemany("INSERT OR REPLACE INTO alert_state (rule_id, crypto_id, active, date) "
+                             "VALUES (?, ?, ?, ?)", transitions)
+            conn.executemany("INSERT INTO alert_outbox (rule_id, rule_name, crypto_id, date, fired, payload) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", fired)
+            conn.execute("INSERT OR REPLACE INTO alert_meta (key, value) VALUES ('feed_position', ?)",
+                         (str(new_position),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.logger.info(f"Alerts: {len(rules)} rules over {len(rows)} changed coins, {len(fired)} fired "
+                         f"in {time.perf_counter() - started:.2f}s")
+        return len(fired)
+
+    def _load_state(self, conn, crypto_ids):
+        """{(rule_id, crypto_id): active} for the given coins, read in batches"""
+        state = {}
+        for batch in _batches(crypto_ids, self.batch_size):
+            placeholders = ','.join('?' * len(batch))
+            for row in conn.execute(f"SELECT rule_id, crypto_id, active FROM alert_state "
+                                    f"WHERE crypto_id IN ({placeholders})", batch):
+                state[(row['rule_id'], row['crypto_id'])] = bool(row['active'])
+        return state
+
+    def _compile(self, rule, rows):
+        try:
+            query = ScreenQuery(rule['condition'], rows.columns)
+            return query, query.mask(rows)
+        except QueryError as e:
+            self.logger.warning(f"Alert rule {rule['id']} ({rule['name']}) skipped: {e}")
+            return None, None
+
+    @staticmethod
+    def _alert(rule, query, crypto_id, row):
+        """Outbox row with the values that made the condition true"""
+        values = {column: _plain(row.get(column)) for column in dict.fromkeys(('close', 'signal', *query.referenced))}
+        return (rule['id'], rule['name'], crypto_id, _plain(row.get('date')), time.time(),
+                json.dumps({'condition': rule['condition'], 'values': values}, default=str))
+
+    # ---- Outbox ----
+    def pending(self, limit=100):
+        """Undelivered alerts, oldest first"""
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT * FROM alert_outbox WHERE delivered IS NULL ORDER BY id LIMIT ?",
+                                (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [{'id': row['id'], 'rule_id': row['rule_id'], 'rule_name': row['rule_name'],
+                 'crypto_id': row['crypto_id'], 'date': row['date'], 'fired': row['fired'],
+                 **json.loads(row['payload'])} for row in rows]
+
+    def mark_delivered(self, alert_ids):
+        """Remove alerts from the pending list once delivered; returns how many were pending"""
+        conn = _connect(self.db_path)
+        try:
+            now, marked = time.time(), 0
+            for batch in _batches(alert_ids, self.batch_size):
+                placeholders = ','.join('?' * len(batch))
+                marked += conn.execute(f"UPDATE alert_outbox SET delivered = ? "
+                                       f"WHERE delivered IS NULL AND id IN ({placeholders})",
+                                       (now, *batch)).rowcount
+        finally:
+            conn.close()
+        return marked
+
+
+if __name__ == "__main__":
+    import argparse
+    from analysis.screener import Screener
+    from analysis.technical_analyzer import TechnicalAnalyzer
+    from utils.csv_manager import CSVManager
+
+    parser = argparse.ArgumentParser(description="Manage alert rules and evaluate them against saved data")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="add a rule, e.g. add oversold \"RSI < 30\"")
+    add.add_argument('name')
+    add.add_argument('condition')
+    add.add_argument('--coins', help="comma-separated crypto ids (all coins when omitted)")
+    remove = commands.add_parser('remove')
+    remove.add_argument('rule_id', type=int)
+    commands.add_parser('list')
+    commands.add_parser('run', help="evaluate the coins saved since the last run")
+    commands.add_parser('outbox', help="print undelivered alerts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    csv_manager = CSVManager()
+    engine = AlertEngine(Screener(TechnicalAnalyzer(), csv_manager), csv_manager.changes)
+    if args.command == 'add':
+        print(engine.add_rule(args.name, args.condition, args.coins.split(',') if args.coins else None))
+    elif args.command == 'remove':
+        print("Removed" if engine.remove_rule(args.rule_id) else "No such rule")
+    elif args.command == 'list':
+        for rule in engine.rules():
+            print(f"{rule['id']:>5}  {rule['name']:<20} {rule['condition']}"
+                  + (f"  [{','.join(rule['coins'])}]" if rule['coins'] else ""))
+    elif args.command == 'run':
+        print(f"{engine.evaluate()} alerts fired")
+    else:
+        for alert in engine.pending(limit=1000):
+            print(f"{alert['id']:>6}  {alert['date']}  {alert['crypto_id']:<20} {alert['rule_name']}: {alert['values']}")
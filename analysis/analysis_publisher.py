@@ -0,0 +1,67 @@
+import logging
+import threading
+
+from config import ANALYSIS_PUSH_INTERVAL
+
+
+class AnalysisPublisher:
+    """
+    Pushes fresh analysis to SSE watchers when the pipeline writes new data.
+
+    Every `interval` seconds the change feed is read from the last position,
+    which also covers saves made by a pipeline running in another process.
+    Only changed coins that have at least one watcher are analysed, once each,
+    and the same 'analysis' event is fanned out to all of their watchers by
+    the broadcaster.
+    """
+
+    def __init__(self, broadcaster, analyze, changes, interval=ANALYSIS_PUSH_INTERVAL):
+        self.broadcaster = broadcaster
+        self.analyze = analyze  # crypto_id -> event payload (or None to skip)
+        self.changes = changes  # ChangeFeed written by CSVManager
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._position = changes.position()  # only changes made after startup are pushed
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_once(self):
+        """Analyse and publish every watched coin changed since the last check; returns the published ids"""
+        with self._lock:
+            changed_ids, self._position = self.changes.changed_ids(self._position, kinds=('historical', 'metrics'))
+        changed = sorted(changed_ids & self.broadcaster.watched_topics())
+
+        published = []
+        for crypto_id in changed:
+            try:
+                payload = self.analyze(crypto_id)
+            except Exception as e:
+                self.logger.error(f"Analysis push failed for {crypto_id}: {e}")
+                continue
+            if payload and self.broadcaster.publish('analysis', payload, topic=crypto_id):
+                published.append(crypto_id)
+        return published
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                published = self.check_once()
+                if published:
+                    self.logger.info(f"Pushed fresh analysis for {len(published)} watched coins")
+            except Exception as e:
+                self.logger.error(f"Analysis push check failed: {e}")
+
+    def start(self):
+        """Check on a daemon thread every `interval` seconds (no-op if already running)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='analysis-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
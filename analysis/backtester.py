@@ -0,0 +1,246 @@
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import BACKTEST_DIR, BACKTEST_TRAIN_DAYS, BACKTEST_TEST_DAYS, BACKTEST_FEE_BPS, BACKTEST_CANDIDATES
+from analysis.technical_analyzer import TechnicalAnalyzer, compute_signals
+
+
+def positions_from_signals(signals, allow_short=False):
+    """BUY opens a long, SELL closes it (or goes short); HOLD keeps the previous position"""
+    signals = np.asarray(signals)
+    target = np.select([signals == 'BUY', signals == 'SELL'], [1.0, -1.0 if allow_short else 0.0], np.nan)
+    # Forward-fill the last BUY/SELL decision over HOLD rows
+    last = np.where(np.isnan(target), 0, np.arange(len(target)))
+    np.maximum.accumulate(last, out=last)
+    positions = target[last]
+    return np.nan_to_num(positions, nan=0.0)
+
+
+def strategy_returns(close, positions, fee_bps=BACKTEST_FEE_BPS):
+    """
+    Per-bar strategy returns and the position held over each bar.
+
+    A signal is acted on at the close of its bar, so it earns the next bar's return.
+    """
+    asset_returns = np.zeros(len(close))
+    asset_returns[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros(len(close))
+    held[1:] = positions[:-1]
+    turnover = np.abs(np.diff(held, prepend=0.0))
+    return held * asset_returns - turnover * fee_bps / 10_000, held, asset_returns
+
+
+def performance(returns, held, asset_returns, periods_per_year=365):
+    """Return, drawdown, Sharpe ratio and trade hit rate of a strategy return series"""
+    equity = np.cumprod(1 + returns)
+    total_return = equity[-1] - 1
+    years = len(returns) / periods_per_year
+    volatility = returns.std()
+
+    # A trade is a run of bars with the same non-zero position
+    entries = (held != 0) & (held != np.concatenate(([0.0], held[:-1])))
+    trade_ids = np.cumsum(entries)[held != 0]
+    with np.errstate(divide='ignore'):
+        # A bar losing everything (after fees) ends the trade at -100%
+        log_returns = np.log1p(np.maximum(returns[held != 0], -1.0))
+    trade_returns = np.expm1(np.bincount(trade_ids, weights=log_returns))[1:] if trade_ids.size else np.array([])
+
+    return {
+        'total_return': float(total_return),
+        'cagr': float(equity[-1] ** (1 / years) - 1) if years > 0 and equity[-1] > 0 else -1.0,
+        'sharpe': float(returns.mean() / volatility * np.sqrt(periods_per_year)) if volatility > 0 else 0.0,
+        'max_drawdown': float((equity / np.maximum.accumulate(equity) - 1).min()),
+        'trades': int(len(trade_returns)),
+        'hit_rate': float((trade_returns > 0).mean()) if len(trade_returns) else 0.0,
+        'exposure': float((held != 0).mean()),
+        'buy_hold_return': float(np.prod(1 + asset_returns) - 1)
+    }
+
+
+def walk_forward_windows(n_rows, train_rows, test_rows):
+    """(start, end) of consecutive out-of-sample windows, each preceded by `train_rows` of history"""
+    return [(start, min(start + test_rows, n_rows)) for start in range(train_rows, n_rows, test_rows)]
+
+
+class Backtester:
+    """
+    Walk-forward backtest of TechnicalAnalyzer signals over the whole store.
+
+    Before each out-of-sample window, every candidate parameter set (the coin's
+    configured settings plus a random sample of the sweep space) is scored on
+    the preceding `train_days` of in-sample history, and the best by Sharpe
+    trades the window. Indicators only look backwards, so each candidate's
+    signals are computed once per coin and sliced. Coins run in parallel on a
+    process pool.
+    """
+
+    def __init__(self, csv_manager=None, train_days=BACKTEST_TRAIN_DAYS, test_days=BACKTEST_TEST_DAYS,
+                 fee_bps=BACKTEST_FEE_BPS, allow_short=False, candidates=BACKTEST_CANDIDATES, max_workers=None):
+        # parameter_sweep imports this module for its metrics
+        from analysis.parameter_sweep import ParameterSweep
+
+        self.csv_manager = csv_manager
+        self.train_days = train_days
+        self.test_days = test_days
+        self.fee_bps = fee_bps
+        self.allow_short = allow_short
+        self.candidates = candidates
+        self.max_workers = max_workers
+        self.analyzer = TechnicalAnalyzer()
+        self.sweep_combos = ParameterSweep(None, samples=candidates).combinations() if candidates else {}
+        self.logger = logging.getLogger(__name__)
+
+    def _settings(self):
+        return {'train_days': self.train_days, 'test_days': self.test_days, 'fee_bps': self.fee_bps,
+                'allow_short': self.allow_short, 'candidates': self.candidates}
+
+    def candidate_params(self, crypto_id=None):
+        """{combo_id: params} tried on each in-sample window; the coin's configured settings come first"""
+        from analysis.parameter_sweep import combo_id
+
+        configured = self.analyzer.params_for(crypto_id)
+        return {combo_id(configured): configured, **self.sweep_combos}
+
+    def backtest_coin(self, crypto_id, records=None):
+        """Return (summary row, window rows) for one coin, or None if its history is too short"""
+        from analysis.parameter_sweep import IndicatorCache
+
+        if records is None:
+            records = self.csv_manager.load_historical_records(crypto_id)
+        if not records:
+            return None
+        df = pd.DataFrame(records)
+        if not {'date', 'high', 'low', 'close'}.issubset(df.columns):
+            return None
+        df = df.dropna(subset=['close'])
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date', ignore_index=True)
+        if len(df) < 2:
+            return None
+
+        # Legacy series use multi-day bars; scale windows and annualisation by bar length
+        bar_days = max(float(df['date'].diff().dt.days.median()), 1.0)
+        periods_per_year = 365 / bar_days
+        train_rows = int(self.train_days / bar_days)
+        windows = walk_forward_windows(len(df), train_rows, int(self.test_days / bar_days))
+        if not windows:
+            return None
+
+        close = df['close'].to_numpy(dtype=float)
+        cache = IndicatorCache(df)
+        candidates = {}
+        for key, params in self.candidate_params(crypto_id).items():
+            signal, _ = compute_signals(cache.signal_inputs(params), params)
+            positions = positions_from_signals(signal, self.allow_short)
+            candidates[key] = (positions, *strategy_returns(close, positions, self.fee_bps))
+
+        # The decision at bar t is held over bar t + 1, so each window trades
+        # the positions its chosen parameters set from the bar before it opens
+        positions = np.zeros(len(close))
+        chosen = []
+        for start, end in windows:
+            fit = slice(max(start - train_rows, 0), start)
+            scores = {key: performance(returns[fit], held[fit], asset_returns[fit], periods_per_year)['sharpe']
+                      for key, (_, returns, held, asset_returns) in candidates.items()}
+            best = max(scores, key=scores.get)  # ties keep the earlier candidate, the configured one first
+            trade = slice(max(start - 1, 0), end - 1)
+            positions[trade] = candidates[best][0][trade]
+            chosen.append((best, scores[best]))
+        returns, held, asset_returns = strategy_returns(close, positions, self.fee_bps)
+        dates = df['date'].dt.strftime('%Y-%m-%d').to_numpy()
+
+        window_rows = []
+        for (start, end), (key, is_sharpe) in zip(windows, chosen):
+            window_rows.append({
+                'crypto_id': crypto_id,
+                'start_date': dates[start],
+                'end_date': dates[end - 1],
+                'combo_id': key,
+                'is_sharpe': is_sharpe,
+                **performance(returns[start:end], held[start:end], asset_returns[start:end], periods_per_year)
+            })
+
+        # Out-of-sample summary: every test window stitched together
+        oos = slice(windows[0][0], None)
+        summary = {
+            'crypto_id': crypto_id,
+            'start_date': dates[windows[0][0]],
+            'end_date': dates[-1],
+            'windows': len(windows),
+            'window_hit_rate': float(np.mean([row['total_return'] > 0 for row in window_rows])),
+            'combos_used': len({key for key, _ in chosen}),
+            **performance(returns[oos], held[oos], asset_returns[oos], periods_per_year)
+        }
+        return summary, window_rows
+
+    def run(self, coin_ids=None):
+        """Backtest every coin; returns (summary DataFrame sorted by Sharpe, windows DataFrame)"""
+        coin_ids = coin_ids or self.csv_manager.historical_ids()
+        started = time.perf_counter()
+        summaries, windows = [], []
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(self._settings(),)) as executor:
+            for crypto_id, result in zip(coin_ids, executor.map(_backtest_worker, coin_ids, chunksize=8)):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Backtest failed for {crypto_id}: {result}")
+                elif result is not None:
+                    summaries.append(result[0])
+                    windows.extend(result[1])
+
+        self.logger.info(f"Backtested {len(summaries)}/{len(coin_ids)} coins "
+                         f"in {time.perf_counter() - started:.2f}s")
+        summary = pd.DataFrame(summaries)
+        if not summary.empty:
+            summary = summary.sort_values('sharpe', ascending=False, ignore_index=True)
+        return summary, pd.DataFrame(windows)
+
+    def save(self, summary, windows):
+        os.makedirs(BACKTEST_DIR, exist_ok=True)
+        summary.to_csv(os.path.join(BACKTEST_DIR, 'backtest_summary.csv'), index=False)
+        windows.to_csv(os.path.join(BACKTEST_DIR, 'backtest_windows.csv'), index=False)
+        # Parameters behind the combo_id chosen for each window
+        params = {key: params for coin in summary.get('crypto_id', [])
+                  for key, params in self.candidate_params(coin).items()}
+        pd.DataFrame.from_dict(params, orient='index').rename_axis('combo_id').to_csv(
+            os.path.join(BACKTEST_DIR, 'backtest_params.csv'))
+        self.logger.info(f"Backtest results written to {BACKTEST_DIR}")
+
+
+# ---- Process pool workers ----
+_worker_backtester = None
+
+
+def _init_worker(settings):
+    global _worker_backtester
+    from utils.csv_manager import CSVManager
+    logging.getLogger('analysis.technical_analyzer').setLevel(logging.ERROR)
+    _worker_backtester = Backtester(CSVManager(), **settings)
+
+
+def _backtest_worker(crypto_id):
+    try:
+        return _worker_backtester.backtest_coin(crypto_id)
+    except Exception as e:
+        return e
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    backtester = Backtester(CSVManager(), allow_short='--short' in sys.argv)
+    summary, windows = backtester.run()
+    backtester.save(summary, windows)
+
+    columns = ['crypto_id', 'total_return', 'buy_hold_return', 'sharpe', 'max_drawdown', 'hit_rate', 'trades']
+    print(summary[columns].head(20).to_string(index=False))
+    print(f"\n{len(summary)} coins, {len(windows)} windows: median Sharpe {summary['sharpe'].median():.2f}, "
+          f"median max drawdown {summary['max_drawdown'].median():.1%}, "
+          f"{(summary['total_return'] > summary['buy_hold_return']).mean():.0%} beat buy-and-hold")
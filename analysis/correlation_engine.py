@@ -0,0 +1,420 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import (HISTORICAL_DIR, CSV_ENCODING, CORRELATION_DIR, CORRELATION_WINDOW,
+                    CORRELATION_MIN_OVERLAP, CORRELATION_MAX_GAP, CORRELATION_CLUSTER_DISTANCE,
+                    CORRELATION_REFRESH_SECONDS)
+
+
+def daily_returns(close, max_gap=CORRELATION_MAX_GAP):
+    """
+    Daily log returns of a days x coins close array on a daily calendar.
+
+    Stored histories mix daily and 4-day candles, so the return between two
+    consecutive bars up to `max_gap` days apart is spread evenly over the days
+    it spans; longer gaps stay missing. Returns a (days - 1) x coins array.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_close = np.log(np.asarray(close, dtype=float))
+    present = np.isfinite(log_close)
+    days = len(log_close)
+    rows = np.broadcast_to(np.arange(days)[:, None], log_close.shape)
+    # Last bar at or before day t - 1 and first bar at or after day t
+    previous = np.maximum.accumulate(np.where(present, rows, -1), axis=0)[:-1]
+    following = np.minimum.accumulate(np.where(present, rows, days)[::-1], axis=0)[::-1][1:]
+    gap = following - previous
+    valid = (previous >= 0) & (following < days) & (gap <= max_gap)
+    start = np.take_along_axis(log_close, np.clip(previous, 0, None), axis=0)
+    end = np.take_along_axis(log_close, np.clip(following, None, days - 1), axis=0)
+    with np.errstate(invalid='ignore'):
+        return np.where(valid, (end - start) / gap, np.nan)
+
+
+class WindowStats:
+    """
+    Pairwise sufficient statistics of return rows (NaN = missing).
+
+    For every coin pair it keeps the overlap count and the sums needed for
+    pairwise-complete covariance and correlation, so a window can slide by
+    adding the newest day and removing the oldest in O(coins^2).
+    """
+
+    def __init__(self, n_coins):
+        shape = (n_coins, n_coins)
+        self.n = np.zeros(shape)
+        self.sx = np.zeros(shape)  # sum of x_i over days where j is also present
+        self.sxx = np.zeros(shape)
+        self.sxy = np.zeros(shape)
+
+    @classmethod
+    def from_rows(cls, rows, block_size=128):
+        """Build from a days x coins matrix, one block of coins at a time"""
+        stats = cls(rows.shape[1])
+        present = ~np.isnan(rows)
+        x = np.where(present, rows, 0.0)
+        mask = present.astype(float)
+        for start in range(0, rows.shape[1], block_size):
+            block = slice(start, start + block_size)
+            stats.n[block] = mask[:, block].T @ mask
+            stats.sx[block] = x[:, block].T @ mask
+            stats.sxx[block] = (x[:, block] ** 2).T @ mask
+            stats.sxy[block] = x[:, block].T @ x
+        return stats
+
+    def add(self, row, sign=1.0):
+        present = ~np.isnan(row)
+        x = np.where(present, row, 0.0)
+        mask = present.astype(float)
+        self.n += sign * np.outer(mask, mask)
+        self.sx += sign * np.outer(x, mask)
+        self.sxx += sign * np.outer(x * x, mask)
+        self.sxy += sign * np.outer(x, x)
+
+    def remove(self, row):
+        self.add(row, sign=-1.0)
+
+    def covariance(self, min_overlap=2):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = (self.sxy - self.sx * self.sx.T / self.n) / (self.n - 1)
+        cov[self.n < max(min_overlap, 2)] = np.nan
+        return cov
+
+    def correlation(self, min_overlap=2):
+        sy, syy = self.sx.T, self.sxx.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = (self.n * self.sxy - self.sx * sy) / np.sqrt(
+                (self.n * self.sxx - self.sx ** 2) * (self.n * syy - sy ** 2))
+        corr[self.n < max(min_overlap, 2)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationEngine:
+    """
+    Correlation and covariance of daily log returns across every stored coin.
+
+    Closes are aligned on a daily calendar and returns between bars a few days
+    apart are spread over the days they span (see daily_returns). The state (last `window` return rows plus the
+    sufficient statistics) is persisted and rolled forward as new days arrive;
+    back-filled history or new coins trigger a full rebuild.
+    """
+
+    STATE_FILE = 'correlation_state.npz'
+
+    def __init__(self, csv_manager, window=CORRELATION_WINDOW, min_overlap=CORRELATION_MIN_OVERLAP,
+                 max_gap=CORRELATION_MAX_GAP, block_size=128, state_dir=CORRELATION_DIR):
+        self.csv_manager = csv_manager
+        self.window = window
+        self.min_overlap = min_overlap
+        self.max_gap = max_gap
+        self.block_size = block_size
+        self.state_dir = state_dir
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()  # held by updates and queries alike
+        self._checked_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.coin_ids = []
+        self.tail = np.empty((0, 0))  # last `window` return rows (days x coins)
+        self.last_date = None
+        self.last_bar_date = np.empty(0, dtype='datetime64[D]')  # each coin's latest stored bar
+        self.last_bar_close = np.empty(0)
+        self.files = {}  # crypto_id -> (mtime_ns, size, rows)
+        self.stats = None
+        self._matrices = None
+        self._derived = {}  # results computed from the current matrices, e.g. clusters
+
+    # ---- Store access ----
+    def _file_state(self, crypto_id):
+        stat = os.stat(os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv"))
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_closes(self, crypto_id):
+        path = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+        try:
+            frame = pd.read_csv(path, usecols=['date', 'close'], encoding=CSV_ENCODING)
+        except ValueError:
+            return None  # exchange snapshot, not candles
+        frame['date'] = pd.to_datetime(frame['date'], errors='coerce')
+        frame = frame.dropna().drop_duplicates('date', keep='last')
+        return frame[frame['close'] > 0].set_index('date')['close'].sort_index()
+
+    # ---- Build / update ----
+    def _load_store(self):
+        """({crypto_id: close Series}, {crypto_id: (mtime_ns, size, rows)}) for every candle file"""
+        series, files = {}, {}
+        for crypto_id in self.csv_manager.historical_ids():
+            closes = self._read_closes(crypto_id)
+            if closes is None or closes.empty:
+                continue
+            series[crypto_id] = closes
+            files[crypto_id] = (*self._file_state(crypto_id), len(closes))
+        return series, files
+
+    def _aligned_returns(self, series, start, end):
+        """
+        Daily log returns for the days after start up to end; (coin ids, returns ndarray).
+        Bars up to `max_gap` days before start are read so the first days get their returns.
+        """
+        calendar = pd.date_range(start - pd.Timedelta(days=self.max_gap), end, freq='D')
+        closes = pd.DataFrame({cid: s.reindex(calendar) for cid, s in series.items()})
+        return list(closes.columns), daily_returns(closes.to_numpy(dtype=float), self.max_gap)[self.max_gap:]
+
+    def returns_matrix(self):
+        """Aligned daily log returns of every coin over the whole stored history"""
+        series, _ = self._load_store()
+        start = min(s.index.min() for s in series.values())
+        end = max(s.index.max() for s in series.values())
+        coin_ids, returns = self._aligned_returns(series, start, end)
+        return pd.DataFrame(returns, index=pd.date_range(start + pd.Timedelta(days=1), end, freq='D'),
+                            columns=coin_ids)
+
+    def build(self):
+        """Recompute the returns window and statistics from the whole store"""
+        started = time.perf_counter()
+        series, files = self._load_store()
+        self._reset()
+        if not series:
+            return
+
+        # Only the last `window` days (+1 for the first return) are needed
+        last_date = max(s.index.max() for s in series.values())
+        self.coin_ids, returns = self._aligned_returns(series, last_date - pd.Timedelta(days=self.window),
+                                                       last_date)
+        self.tail = returns
+        self.last_date = last_date
+        self.last_bar_date = np.array([series[cid].index[-1] for cid in self.coin_ids], dtype='datetime64[D]')
+        self.last_bar_close = np.array([series[cid].iloc[-1] for cid in self.coin_ids], dtype=float)
+        self.files = files
+        self.stats = WindowStats.from_rows(returns, self.block_size)
+        self.save()
+        self.logger.info(f"Correlation state built for {len(self.coin_ids)} coins "
+                         f"in {time.perf_counter() - started:.2f}s")
+
+    def update(self):
+        """Roll the window forward over days appended since the last build; returns the mode used"""
+        with self._lock:
+            return self._update()
+
+    def _update(self):
+        if self.stats is None and not self.load():
+            self.build()
+            return 'build'
+
+        current = self.csv_manager.historical_ids()
+        removed = set(self.coin_ids) - set(current)
+        if removed:
+            return self._rebuild(f"{len(removed)} coins removed")
+
+        changed = {}
+        for crypto_id in current:
+            file_state = self._file_state(crypto_id)
+            known = self.files.get(crypto_id)
+            if known and known[:2] == file_state:
+                continue
+            closes = self._read_closes(crypto_id)
+            if closes is None or closes.empty:
+                continue  # not a candle file
+            if known is None:
+                return self._rebuild(f"new coin {crypto_id}")
+            appended = closes[closes.index > self.last_date]
+            if len(closes) - known[2] != len(appended):
+                return self._rebuild(f"history of {crypto_id} changed")
+            changed[crypto_id] = (appended, (*file_state, len(closes)))
+
+        if not changed:
+            return 'unchanged'
+
+        new_last = max((appended.index.max() for appended, _ in changed.values() if len(appended)),
+                       default=self.last_date)
+        days = pd.date_range(self.last_date + pd.Timedelta(days=1), new_last, freq='D')
+        if len(days) > self.window:
+            return self._rebuild('gap longer than the window')
+
+        # Return rows of the current tail followed by the new days. A bar spreads its return back
+        # to the coin's previous bar, which can reach into days already counted in the statistics.
+        first_day = np.datetime64(self.last_date, 'D') - (len(self.tail) - 1)
+        rows = np.vstack([self.tail, np.full((len(days), len(self.coin_ids)), np.nan)])
+        patched = set()
+        index = {cid: i for i, cid in enumerate(self.coin_ids)}
+        for crypto_id, (appended, file_state) in changed.items():
+            column = index[crypto_id]
+            previous_date, previous_close = self.last_bar_date[column], self.last_bar_close[column]
+            for date, close in appended.items():
+                date = np.datetime64(date, 'D')
+                gap = int((date - previous_date).astype(int))
+                if gap <= self.max_gap:
+                    start = max(int((previous_date - first_day).astype(int)) + 1, 0)
+                    end = int((date - first_day).astype(int)) + 1
+                    rows[start:end, column] = np.log(close / previous_close) / gap
+                    patched.update(range(start, min(end, len(self.tail))))
+                previous_date, previous_close = date, close
+            self.last_bar_date[column], self.last_bar_close[column] = previous_date, previous_close
+            self.files[crypto_id] = file_state
+
+        for row in sorted(patched):
+            self.stats.remove(self.tail[row])
+            self.stats.add(rows[row])
+        tail = list(rows[:len(self.tail)])
+        for row in rows[len(self.tail):]:
+            self.stats.add(row)
+            tail.append(row)
+            if len(tail) > self.window:
+                self.stats.remove(tail.pop(0))
+
+        self.tail = np.array(tail)
+        self.last_date = new_last
+        self._matrices = None
+        self.save()
+        self.logger.info(f"Correlation state rolled forward {len(days)} days to {new_last:%Y-%m-%d}")
+        return 'incremental'
+
+    def _rebuild(self, reason):
+        self.logger.info(f"Rebuilding correlation state: {reason}")
+        self.build()
+        return 'build'
+
+    def ensure_fresh(self, max_age=CORRELATION_REFRESH_SECONDS):
+        """Load or update the state at most every `max_age` seconds (thread-safe)"""
+        with self._lock:
+            if self.stats is not None and time.monotonic() - self._checked_at < max_age:
+                return
+            self.update()
+            self._checked_at = time.monotonic()
+
+    # ---- Persistence ----
+    def _state_path(self):
+        return os.path.join(self.state_dir, self.STATE_FILE)
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self._state_path() + '.tmp.npz'
+        files = [self.files[cid] for cid in self.coin_ids]
+        np.savez(tmp_path, coin_ids=np.array(self.coin_ids), tail=self.tail,
+                 last_bar_date=self.last_bar_date.astype(np.int64), last_bar_close=self.last_bar_close,
+                 last_date=str(self.last_date.date()), window=self.window, max_gap=self.max_gap,
+                 files=np.array(files, dtype=np.int64).reshape(-1, 3),
+                 n=self.stats.n, sx=self.stats.sx, sxx=self.stats.sxx, sxy=self.stats.sxy)
+        os.replace(tmp_path, self._state_path())
+
+    def load(self):
+        if not os.path.exists(self._state_path()):
+            return False
+        with np.load(self._state_path()) as data:
+            if int(data['window']) != self.window or 'max_gap' not in data or int(data['max_gap']) != self.max_gap:
+                return False  # saved with other settings, or before returns spanned multi-day bars
+            self.coin_ids = [str(cid) for cid in data['coin_ids']]
+            self.tail = data['tail']
+            self.last_bar_date = data['last_bar_date'].astype('datetime64[D]')
+            self.last_bar_close = data['last_bar_close']
+            self.last_date = pd.Timestamp(str(data['last_date']))
+            self.files = {cid: tuple(int(v) for v in row) for cid, row in zip(self.coin_ids, data['files'])}
+            self.stats = WindowStats(len(self.coin_ids))
+            self.stats.n, self.stats.sx, self.stats.sxx, self.stats.sxy = \
+                data['n'], data['sx'], data['sxx'], data['sxy']
+        self._matrices = None
+        return True
+
+    # ---- Queries ----
+    def matrices(self):
+        """(correlation, covariance) DataFrames for the current window"""
+        with self._lock:
+            if self._matrices is None:
+                corr = self.stats.correlation(self.min_overlap)
+                cov = self.stats.covariance(self.min_overlap)
+                self._matrices = (pd.DataFrame(corr, index=self.coin_ids, columns=self.coin_ids),
+                                  pd.DataFrame(cov, index=self.coin_ids, columns=self.coin_ids))
+                self._derived = {}
+            return self._matrices
+
+    def top_correlated(self, crypto_id, k=10):
+        """The k coins whose returns are most correlated with `crypto_id`"""
+        with self._lock:
+            corr, cov = self.matrices()
+            if crypto_id not in corr.index:
+                return []
+            row = corr.loc[crypto_id].drop(crypto_id).dropna().sort_values(ascending=False).head(k)
+            overlap = self.stats.n[self.coin_ids.index(crypto_id)]
+            index = {cid: i for i, cid in enumerate(self.coin_ids)}
+        return [{'crypto_id': other,
+                 'correlation': round(float(value), 4),
+                 'covariance': float(cov.at[crypto_id, other]),
+                 'overlap_days': int(overlap[index[other]])}
+                for other, value in row.items()]
+
+    def return_days(self, crypto_id):
+        """Days in the window on which `crypto_id` has a return"""
+        with self._lock:
+            i = self.coin_ids.index(crypto_id)
+            return int(self.stats.n[i, i])
+
+    def clusters(self, threshold=CORRELATION_CLUSTER_DISTANCE):
+        """
+        Average-linkage hierarchical clusters on distance sqrt((1 - corr) / 2).
+
+        Coins whose distance is below `threshold` end up together; coins without
+        enough overlap are treated as uncorrelated. Needs scipy.
+        """
+        from scipy.cluster.hierarchy import linkage, fcluster
+        from scipy.spatial.distance import squareform
+
+        key = ('clusters', threshold)
+        with self._lock:
+            corr, _ = self.matrices()
+            if key in self._derived:
+                return self._derived[key]
+            active = corr.index[corr.notna().sum(axis=1) > 1]
+            if len(active) < 2:
+                return pd.Series(1, index=active, name='cluster')
+            values = corr.loc[active, active].fillna(0.0).to_numpy(copy=True)
+            np.fill_diagonal(values, 1.0)
+            distance = np.sqrt(np.clip((1 - values) / 2, 0.0, 1.0))
+            tree = linkage(squareform(distance, checks=False), method='average')
+            self._derived[key] = pd.Series(fcluster(tree, t=threshold, criterion='distance'), index=active,
+                                           name='cluster')
+            return self._derived[key]
+
+
+def rolling_average_correlation(returns, window, min_overlap=CORRELATION_MIN_OVERLAP):
+    """Mean pairwise correlation of each trailing window of a days x coins return matrix"""
+    stats = WindowStats.from_rows(returns[:window])
+    upper = np.triu_indices(returns.shape[1], k=1)
+    averages = [np.nanmean(stats.correlation(min_overlap)[upper])]
+    for day in range(window, len(returns)):
+        stats.add(returns[day])
+        stats.remove(returns[day - window])
+        averages.append(np.nanmean(stats.correlation(min_overlap)[upper]))
+    return np.array(averages)
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    engine = CorrelationEngine(CSVManager())
+    if '--rebuild' in sys.argv:
+        engine.build()
+    else:
+        print(f"Update mode: {engine.update()}")
+
+    clusters = engine.clusters()
+    sizes = clusters.value_counts()
+    print(f"{len(engine.coin_ids)} coins, window {engine.window} days to {engine.last_date:%Y-%m-%d}; "
+          f"{len(sizes)} clusters, largest {sizes.max()} coins")
+    if '--rolling' in sys.argv:
+        returns = engine.returns_matrix()
+        averages = rolling_average_correlation(returns.to_numpy(), engine.window)
+        output = os.path.join(engine.state_dir, 'average_correlation.csv')
+        pd.Series(averages, index=returns.index[engine.window - 1:], name='average_correlation').to_csv(output)
+        print(f"Rolling average pairwise correlation written to {output}")
+
+    for crypto_id in sys.argv[1:]:
+        if not crypto_id.startswith('--'):
+            print(f"\n{crypto_id}:")
+            print(pd.DataFrame(engine.top_correlated(crypto_id)).to_string(index=False))
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import (GLOBAL_LSTM_DIR, GLOBAL_LSTM_PATH, GLOBAL_LSTM_EPOCHS,
+                    GLOBAL_LSTM_EMBEDDING_DIM, GLOBAL_LSTM_BATCH_SIZE)
+from analysis.lstm_predictor import prepare_dataset, inverse_close, CLOSE_INDEX
+
+
+def _windows(scaled, start, end, lookback):
+    """Sequences ending before rows start..end-1 and their 'Close' targets"""
+    X = np.lib.stride_tricks.sliding_window_view(scaled[start - lookback:end - 1], lookback, axis=0)
+    return X.transpose(0, 2, 1), scaled[start:end, CLOSE_INDEX]
+
+
+class GlobalLSTMTrainer:
+    """
+    Offline stage that fits one LSTM across every stored coin.
+
+    Each coin is min-max scaled with statistics from its own training split, so
+    coins of very different price levels share the same weights. An optional
+    coin embedding is concatenated to the LSTM state before the Dense layers.
+    Batches are streamed from the store a few coins at a time, the model is
+    checkpointed after every epoch, and the result is exported for NumpyLSTM.
+    """
+
+    def __init__(self, csv_manager, lookback=30, embedding_dim=GLOBAL_LSTM_EMBEDDING_DIM,
+                 epochs=GLOBAL_LSTM_EPOCHS, batch_size=GLOBAL_LSTM_BATCH_SIZE, coins_per_chunk=32,
+                 min_rows=100, checkpoint_dir=GLOBAL_LSTM_DIR, export_path=GLOBAL_LSTM_PATH):
+        self.csv_manager = csv_manager
+        self.lookback = lookback
+        self.embedding_dim = embedding_dim
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.coins_per_chunk = coins_per_chunk
+        self.min_rows = min_rows
+        self.checkpoint_dir = checkpoint_dir
+        self.export_path = export_path
+        self.logger = logging.getLogger(__name__)
+        self.coins = {}  # crypto_id -> {'index', 'split', 'scaler_min', 'scaler_scale'}
+
+    # ---- Data ----
+    def _load_dataset(self, crypto_id):
+        try:
+            return prepare_dataset(self.csv_manager.load_historical_records(crypto_id))
+        except KeyError:
+            return None  # not a candle file
+
+    def _scaled(self, crypto_id):
+        coin = self.coins[crypto_id]
+        return self._load_dataset(crypto_id) * coin['scaler_scale'] + coin['scaler_min']
+
+    def prepare(self, coin_ids=None):
+        """Fit per-coin scalers on each training split; keeps only the scaler statistics"""
+        coin_ids = coin_ids or self.csv_manager.historical_ids()
+        for crypto_id in coin_ids:
+            dataset = self._load_dataset(crypto_id)
+            if dataset is None or len(dataset) < self.min_rows:
+                continue
+            split = int(len(dataset) * 0.7)
+            low, high = dataset[:split].min(axis=0), dataset[:split].max(axis=0)
+            span = np.where(high > low, high - low, 1.0)
+            self.coins[crypto_id] = {
+                'index': len(self.coins),
+                'split': split,
+                'scaler_scale': 1.0 / span,
+                'scaler_min': -low / span
+            }
+        self.logger.info(f"Prepared {len(self.coins)} coins for global LSTM training")
+        return self.coins
+
+    def _batches(self, rng):
+        """Yield shuffled training batches, loading `coins_per_chunk` coins at a time"""
+        coin_ids = list(self.coins)
+        rng.shuffle(coin_ids)
+        for start in range(0, len(coin_ids), self.coins_per_chunk):
+            X_parts, y_parts, coin_parts = [], [], []
+            for crypto_id in coin_ids[start:start + self.coins_per_chunk]:
+                coin = self.coins[crypto_id]
+                X, y = _windows(self._scaled(crypto_id), self.lookback, coin['split'], self.lookback)
+                X_parts.append(X)
+                y_parts.append(y)
+                coin_parts.append(np.full(len(y), coin['index']))
+            X, y, coin_idx = np.concatenate(X_parts), np.concatenate(y_parts), np.concatenate(coin_parts)
+            order = rng.permutation(len(y))
+            for b in range(0, len(order), self.batch_size):
+                idx = order[b:b + self.batch_size]
+                yield X[idx], coin_idx[idx], y[idx]
+
+    # ---- Model ----
+    def _build_model(self):
+        from tensorflow.keras import Model
+        from tensorflow.keras.layers import Input, LSTM, Dense, Embedding, Flatten, Concatenate
+        from tensorflow.keras.optimizers import Adam
+
+        sequence_in = Input(shape=(self.lookback, 5))
+        x = LSTM(50, return_sequences=True)(sequence_in)
+        x = LSTM(50, return_sequences=False)(x)
+        inputs = [sequence_in]
+        if self.embedding_dim:
+            coin_in = Input(shape=(1,), dtype='int32')
+            embedded = Flatten()(Embedding(len(self.coins), self.embedding_dim)(coin_in))
+            x = Concatenate()([x, embedded])
+            inputs.append(coin_in)
+        x = Dense(25)(x)
+        output = Dense(1)(x)
+
+        model = Model(inputs=inputs, outputs=output)
+        model.compile(optimizer=Adam(0.001), loss='mean_squared_error')
+        return model
+
+    def _inputs(self, X, coin_idx):
+        return [X, coin_idx.reshape(-1, 1)] if self.embedding_dim else X
+
+    # ---- Checkpointing ----
+    def _state_path(self):
+        return os.path.join(self.checkpoint_dir, 'state.json')
+
+    def _weights_path(self):
+        return os.path.join(self.checkpoint_dir, 'global_lstm.weights.h5')
+
+    def _save_checkpoint(self, model, epoch):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_weights = os.path.join(self.checkpoint_dir, 'global_lstm.tmp.weights.h5')
+        model.save_weights(tmp_weights)
+        os.replace(tmp_weights, self._weights_path())
+
+        state = {
+            'epoch': epoch,
+            'lookback': self.lookback,
+            'embedding_dim': self.embedding_dim,
+            'coin_ids': list(self.coins)
+        }
+        tmp_state = self._state_path() + '.tmp'
+        with open(tmp_state, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_state, self._state_path())
+
+    def _restore_checkpoint(self, model):
+        """Return the last completed epoch, or 0 when no compatible checkpoint exists"""
+        if not os.path.exists(self._state_path()):
+            return 0
+        with open(self._state_path(), encoding='utf-8') as f:
+            state = json.load(f)
+        if (state['lookback'], state['embedding_dim'], state['coin_ids']) != \
+                (self.lookback, self.embedding_dim, list(self.coins)):
+            self.logger.warning("Checkpoint does not match the current coins/settings, starting over")
+            return 0
+        model.load_weights(self._weights_path())
+        self.logger.info(f"Resuming global LSTM training after epoch {state['epoch']}")
+        return state['epoch']
+
+    # ---- Stage ----
+    def train(self, resume=True, seed=42):
+        if not self.coins:
+            self.prepare()
+        model = self._build_model()
+        first_epoch = self._restore_checkpoint(model) + 1 if resume else 1
+
+        rng = np.random.default_rng(seed)
+        for epoch in range(first_epoch, self.epochs + 1):
+            started = time.perf_counter()
+            losses = [model.train_on_batch(self._inputs(X, coin_idx), y)
+                      for X, coin_idx, y in self._batches(rng)]
+            self._save_checkpoint(model, epoch)
+            self.logger.info(f"Epoch {epoch}/{self.epochs}: loss {float(np.mean(losses)):.6f} "
+                             f"({len(losses)} batches, {time.perf_counter() - started:.1f}s)")
+        return model
+
+    def evaluate(self, model):
+        """Per-coin RMSE/MAPE/R2 on each coin's held-out last 30%, in price units"""
+        rows = []
+        for crypto_id, coin in self.coins.items():
+            scaled = self._scaled(crypto_id)
+            if len(scaled) - coin['split'] <= self.lookback:
+                continue
+            X, y = _windows(scaled, coin['split'] + self.lookback, len(scaled), self.lookback)
+            predicted = model.predict(self._inputs(X, np.full(len(y), coin['index'])), verbose=0)
+
+            real = inverse_close(y, coin['scaler_min'], coin['scaler_scale'])
+            predicted = inverse_close(predicted, coin['scaler_min'], coin['scaler_scale'])
+            errors = predicted - real
+            total = np.sum((real - real.mean()) ** 2)
+            rows.append({
+                'crypto_id': crypto_id,
+                'RMSE': round(float(np.sqrt(np.mean(errors ** 2))), 3),
+                'MAPE': round(float(np.mean(np.abs(errors) / np.maximum(np.abs(real), 1e-12))), 3),
+                'R2': round(float(1 - np.sum(errors ** 2) / total), 3) if total > 0 else 0.0,
+                'test_rows': len(y)
+            })
+        return pd.DataFrame(rows)
+
+    def export(self, model, metrics):
+        """
+        Write weights for NumpyLSTM.
+
+        The coin embedding only enters the first Dense layer, so it is folded into
+        a per-coin bias of that layer and inference stays a plain LSTM/Dense stack.
+        """
+        lstm_layers = [layer for layer in model.layers if type(layer).__name__ == 'LSTM']
+        dense_layers = [layer for layer in model.layers if type(layer).__name__ == 'Dense']
+        arrays = {}
+        layer_types = []
+        for layer in lstm_layers + dense_layers:
+            for j, weights in enumerate(layer.get_weights()):
+                arrays[f"layer{len(layer_types)}_{j}"] = weights
+            layer_types.append(type(layer).__name__.lower())
+
+        coin_ids = list(self.coins)
+        first_dense = len(lstm_layers)
+        first_kernel, first_bias = dense_layers[0].get_weights()
+        units = lstm_layers[-1].units
+        arrays[f"layer{first_dense}_0"] = first_kernel[:units]
+        if self.embedding_dim:
+            embedding = next(layer for layer in model.layers if type(layer).__name__ == 'Embedding')
+            coin_bias = first_bias + embedding.get_weights()[0] @ first_kernel[units:]
+        else:
+            coin_bias = np.tile(first_bias, (len(coin_ids), 1))
+
+        metrics = metrics.set_index('crypto_id').reindex(coin_ids)
+        os.makedirs(os.path.dirname(self.export_path) or '.', exist_ok=True)
+        tmp_path = self.export_path + '.tmp.npz'
+        np.savez(tmp_path,
+                 layer_types=np.array(layer_types),
+                 coin_ids=np.array(coin_ids),
+                 coin_bias=coin_bias,
+                 coin_bias_layer=first_dense,
+                 scaler_min=np.stack([self.coins[c]['scaler_min'] for c in coin_ids]),
+                 scaler_scale=np.stack([self.coins[c]['scaler_scale'] for c in coin_ids]),
+                 metrics=metrics[['RMSE', 'MAPE', 'R2']].to_numpy(dtype=float),
+                 lookback=self.lookback,
+                 trained_at=datetime.now().isoformat(timespec='seconds'),
+                 **arrays)
+        os.replace(tmp_path, self.export_path)
+        self.logger.info(f"Global LSTM exported to {self.export_path} ({len(coin_ids)} coins)")
+
+    def process(self, resume=True):
+        model = self.train(resume=resume)
+        metrics = self.evaluate(model)
+        metrics.to_csv(os.path.join(self.checkpoint_dir, 'metrics.csv'), index=False)
+        self.export(model, metrics)
+        return metrics
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.csv_manager import CSVManager
+
+    parser = argparse.ArgumentParser(description="Train one LSTM across every stored coin")
+    parser.add_argument('--epochs', type=int, default=GLOBAL_LSTM_EPOCHS)
+    parser.add_argument('--embedding-dim', type=int, default=GLOBAL_LSTM_EMBEDDING_DIM,
+                        help="coin embedding size (0 disables it)")
+    parser.add_argument('--restart', action='store_true', help="ignore the last checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    trainer = GlobalLSTMTrainer(CSVManager(), epochs=args.epochs, embedding_dim=args.embedding_dim)
+    results = trainer.process(resume=not args.restart)
+    print(results.to_string(index=False))
+    print(f"Median over {len(results)} coins: RMSE {results['RMSE'].median():.3f}, "
+          f"MAPE {results['MAPE'].median():.3f}, R2 {results['R2'].median():.3f}")
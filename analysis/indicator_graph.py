@@ -0,0 +1,236 @@
+import math
+
+from utils.lazy_import import lazy_module
+
+ta = lazy_module('pandas_ta')  # imported on first indicator calculation
+
+SEED_TOLERANCE = 1e-6  # weight of the seed value left in an EMA/RMA after its warm-up
+
+
+def converge(alpha):
+    """Bars after which an exponential average with factor `alpha` has forgotten its seed"""
+    return math.ceil(math.log(SEED_TOLERANCE) / math.log(1 - alpha))
+
+
+class IndicatorFrame:
+    """
+    One evaluation of the graph over a price frame.
+
+    Moving averages are memoized by (kind, source column, length), so nodes
+    that share an intermediate - SMA_20 and BB_middle, EMA_12/EMA_26 and MACD
+    with the default settings - compute it once per evaluation.
+    """
+
+    def __init__(self, df, params):
+        self.df = df
+        self.params = params
+        self._memo = {}
+
+    def _cached(self, kind, column, length, compute):
+        key = (kind, column, length)
+        if key not in self._memo:
+            self._memo[key] = compute(self.df[column], length=length)
+        return self._memo[key]
+
+    def sma(self, column, length):
+        return self._cached('sma', column, length, ta.sma)
+
+    def ema(self, column, length):
+        return self._cached('ema', column, length, ta.ema)
+
+
+class IndicatorNode:
+    def __init__(self, name, compute, depends, columns, order, warmup):
+        self.name = name
+        self.compute = compute  # IndicatorFrame -> {column: values}; omitted columns are not set
+        self.depends = tuple(depends)
+        self.columns = tuple(columns)
+        self.order = order
+        self.warmup = warmup  # params -> leading bars needed before its own values are exact
+
+
+class IndicatorGraph:
+    """
+    Registry of indicator nodes and the columns they produce.
+
+    A node names the nodes whose columns it reads (`depends`); evaluate()
+    computes only the requested nodes and their dependencies, each once, in
+    registration order, so the output columns keep a stable order. Requests
+    may name nodes ('MACD'), output columns ('MACD_signal') or groups ('SMA').
+
+    Nodes also declare their warm-up, so warmup() tells how many leading bars
+    a tail of the history needs for the requested values to match a
+    full-history computation (to SEED_TOLERANCE for exponential averages).
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.groups = {}
+        self._owners = {}  # output column -> node name
+
+    def register(self, name, depends=(), columns=None, warmup=None):
+        """Decorator adding `compute(frame)` as node `name`; dependencies must already be registered"""
+        def decorator(compute):
+            missing = [dep for dep in depends if dep not in self.nodes and dep not in self.groups]
+            if missing:
+                raise ValueError(f"Indicator {name} depends on unknown indicators: {missing}")
+            self.nodes[name] = IndicatorNode(name, compute, self._expand(depends), columns or (name,),
+                                             len(self.nodes), warmup or (lambda params: 0))
+            for column in (name, *self.nodes[name].columns):
+                self._owners[column] = name
+            return compute
+        return decorator
+
+    def group(self, name, members):
+        self.groups[name] = tuple(members)
+
+    def _expand(self, names):
+        expanded = []
+        for name in names:
+            expanded.extend(self.groups.get(name, (name,)))
+        return expanded
+
+    def resolve(self, indicators=None):
+        """Nodes needed for `indicators` (every node when None), dependencies first"""
+        if indicators is None:
+            return sorted(self.nodes.values(), key=lambda node: node.order)
+        needed, pending = set(), self._expand(indicators)
+        while pending:
+            requested = pending.pop()
+            name = self._owners.get(requested)
+            if name is None:
+                raise ValueError(f"Unknown indicator: {requested}")
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.nodes[name].depends)
+        return sorted((self.nodes[name] for name in needed), key=lambda node: node.order)
+
+    def warmup(self, params, indicators=None):
+        """Leading bars needed by the requested indicators: the longest warm-up chain through dependencies"""
+        chains = {}
+        for node in self.resolve(indicators):
+            inherited = max((chains[self._owners[dep]] for dep in node.depends), default=0)
+            chains[node.name] = inherited + node.warmup(params)
+        return max(chains.values(), default=0)
+
+    def evaluate(self, df, params, indicators=None):
+        """Add the columns of the requested indicators to `df` (in place) and return it"""
+        frame = IndicatorFrame(df, params)
+        for node in self.resolve(indicators):
+            for column, values in (node.compute(frame) or {}).items():
+                df[column] = values
+        return df
+
+
+INDICATORS = IndicatorGraph()
+register_indicator = INDICATORS.register  # plug-ins: @register_indicator('NAME', depends=(...), columns=(...))
+
+
+def _pick(result, names):
+    """{column: result[name]} when every pandas_ta output column is present"""
+    if result is None or result.empty or not all(name in result.columns for name in names.values()):
+        return {}
+    return {column: result[name] for column, name in names.items()}
+
+
+# ---- Oscillators ----
+@register_indicator('RSI', warmup=lambda p: p['rsi_length'] + converge(1 / p['rsi_length']))
+def _rsi(frame):
+    return {'RSI': ta.rsi(frame.df['close'], length=frame.params['rsi_length'])}
+
+
+@register_indicator('MACD', columns=('MACD', 'MACD_signal', 'MACD_histogram'),
+                    warmup=lambda p: (max(p['macd_fast'], p['macd_slow']) + p['macd_signal']
+                                      + converge(2 / (max(p['macd_fast'], p['macd_slow']) + 1))
+                                      + converge(2 / (p['macd_signal'] + 1))))
+def _macd(frame):
+    # Same recurrence as ta.macd, on the memoized EMAs it shares with the EMA nodes
+    fast, slow, signal = frame.params['macd_fast'], frame.params['macd_slow'], frame.params['macd_signal']
+    fast, slow = min(fast, slow), max(fast, slow)
+    close = frame.df['close']
+    if len(close) < slow + signal - 1:
+        return {}
+    macd = frame.ema('close', fast) - frame.ema('close', slow)
+    signal_line = ta.ema(macd.loc[macd.first_valid_index():], length=signal)
+    return {'MACD': macd, 'MACD_signal': signal_line, 'MACD_histogram': macd - signal_line}
+
+
+@register_indicator('STOCH', columns=('STOCH_K', 'STOCH_D'),
+                    warmup=lambda p: p['stoch_k'] + p['stoch_smooth_k'] + p['stoch_d'])
+def _stoch(frame):
+    p, df = frame.params, frame.df
+    stoch = ta.stoch(df['high'], df['low'], df['close'], k=p['stoch_k'], d=p['stoch_d'], smooth_k=p['stoch_smooth_k'])
+    suffix = f"{p['stoch_k']}_{p['stoch_d']}_{p['stoch_smooth_k']}"
+    return (_pick(stoch, {'STOCH_K': f'STOCHk_{suffix}', 'STOCH_D': f'STOCHd_{suffix}'})
+            or _pick(stoch, {'STOCH_K': 'STOCHk', 'STOCH_D': 'STOCHd'}))
+
+
+@register_indicator('ADX', columns=('ADX', 'ADX_POS', 'ADX_NEG'),
+                    warmup=lambda p: 2 * (p['adx_length'] + converge(1 / p['adx_length'])))  # RMA of an RMA
+def _adx(frame):
+    length, df = frame.params['adx_length'], frame.df
+    adx = ta.adx(df['high'], df['low'], df['close'], length=length)
+    return (_pick(adx, {'ADX': f'ADX_{length}', 'ADX_POS': f'DMP_{length}', 'ADX_NEG': f'DMN_{length}'})
+            or _pick(adx, {'ADX': 'ADX', 'ADX_POS': 'DMP', 'ADX_NEG': 'DMN'}))
+
+
+@register_indicator('CCI', warmup=lambda p: p['cci_length'])
+def _cci(frame):
+    df = frame.df
+    cci = ta.cci(df['high'], df['low'], df['close'], length=frame.params['cci_length'])
+    return {'CCI': cci} if cci is not None else {}
+
+
+# ---- Moving averages ----
+@register_indicator('SMA_20', warmup=lambda p: p['sma_fast'])
+def _sma_fast(frame):
+    return {'SMA_20': frame.sma('close', frame.params['sma_fast'])}
+
+
+@register_indicator('SMA_50', warmup=lambda p: p['sma_mid'])
+def _sma_mid(frame):
+    return {'SMA_50': frame.sma('close', frame.params['sma_mid'])}
+
+
+@register_indicator('SMA_200', warmup=lambda p: p['sma_slow'])
+def _sma_slow(frame):
+    return {'SMA_200': frame.sma('close', frame.params['sma_slow'])}
+
+
+@register_indicator('EMA_12', warmup=lambda p: p['ema_fast'] + converge(2 / (p['ema_fast'] + 1)))
+def _ema_fast(frame):
+    return {'EMA_12': frame.ema('close', frame.params['ema_fast'])}
+
+
+@register_indicator('EMA_26', warmup=lambda p: p['ema_slow'] + converge(2 / (p['ema_slow'] + 1)))
+def _ema_slow(frame):
+    return {'EMA_26': frame.ema('close', frame.params['ema_slow'])}
+
+
+@register_indicator('WMA_20', warmup=lambda p: p['wma_length'])
+def _wma(frame):
+    wma = ta.wma(frame.df['close'], length=frame.params['wma_length'])
+    return {'WMA_20': wma} if wma is not None else {}
+
+
+@register_indicator('BBANDS', columns=('BB_upper', 'BB_middle', 'BB_lower'), warmup=lambda p: p['bb_length'])
+def _bbands(frame):
+    # Same bands as ta.bbands (sample std), around the memoized SMA it shares with SMA_20
+    length, width = frame.params['bb_length'], frame.params['bb_std']
+    middle = frame.sma('close', length)
+    std = ta.stdev(frame.df['close'], length=length, ddof=1)
+    if middle is None or std is None:
+        return {}
+    return {'BB_upper': middle + width * std, 'BB_middle': middle, 'BB_lower': middle - width * std}
+
+
+@register_indicator('VMA_20', warmup=lambda p: p['vma_length'])
+def _vma(frame):
+    if 'volume' not in frame.df.columns:
+        return {}
+    vma = frame.sma('volume', frame.params['vma_length'])
+    return {'VMA_20': vma} if vma is not None else {}
+
+
+INDICATORS.group('SMA', ('SMA_20', 'SMA_50', 'SMA_200'))
+INDICATORS.group('EMA', ('EMA_12', 'EMA_26'))
@@ -0,0 +1,422 @@
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from config import (MAX_CRYPTOCURRENCIES, INTRADAY_CAPACITY, INTRADAY_INTERVAL,
+                    INTRADAY_POLL_SECONDS, INTRADAY_RATE_LIMIT_DELAY)
+from analysis.technical_analyzer import compute_signals
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+HIGH, LOW, CLOSE = 1, 2, 3
+
+
+class IntradayStore:
+    """
+    Per-coin ring buffers of the last `capacity` intraday bars.
+
+    One preallocated float32 block holds OHLCV for every coin, so memory is
+    fixed at max_coins x capacity x 5 x 4 bytes plus int64 bar times (about
+    40 MB for 1000 coins x 1440 minutes). Pages are zero-filled and only
+    committed by the OS once a coin's rows are written.
+    """
+
+    def __init__(self, capacity=INTRADAY_CAPACITY, max_coins=MAX_CRYPTOCURRENCIES):
+        self.capacity = capacity
+        self.max_coins = max_coins
+        self.times = np.zeros((max_coins, capacity), dtype=np.int64)
+        self.bars = np.zeros((max_coins, capacity, len(FIELDS)), dtype=np.float32)
+        self.counts = np.zeros(max_coins, dtype=np.int64)  # bars ever written per row
+        self.rows = {}  # crypto_id -> row
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.bars.nbytes
+
+    def _row(self, crypto_id):
+        row = self.rows.get(crypto_id)
+        if row is None:
+            if len(self.rows) >= self.max_coins:
+                raise OverflowError(f"Intraday store is full ({self.max_coins} coins)")
+            row = self.rows[crypto_id] = len(self.rows)
+        return row
+
+    def append(self, crypto_id, bar):
+        """
+        Write a bar; returns 'new', 'update' (same time as the last bar, which is
+        overwritten) or None for a bar older than the last one.
+        """
+        values = [np.nan if bar.get(field) is None else bar[field] for field in FIELDS]
+        with self._lock:
+            row = self._row(crypto_id)
+            count = self.counts[row]
+            if count:
+                last_slot = (count - 1) % self.capacity
+                last_time = self.times[row, last_slot]
+                if bar['time'] < last_time:
+                    return None
+                if bar['time'] == last_time:
+                    self.bars[row, last_slot] = values
+                    return 'update'
+            slot = count % self.capacity
+            self.times[row, slot] = bar['time']
+            self.bars[row, slot] = values
+            self.counts[row] = count + 1
+            return 'new'
+
+    def tail(self, crypto_id, n=None):
+        """(times, bars) of the last `n` bars in time order, as copies"""
+        with self._lock:
+            row = self.rows.get(crypto_id)
+            if row is None:
+                return np.empty(0, dtype=np.int64), np.empty((0, len(FIELDS)), dtype=np.float32)
+            count = int(self.counts[row])
+            n = min(n or self.capacity, count, self.capacity)
+            slots = np.arange(count - n, count) % self.capacity
+            return self.times[row, slots], self.bars[row, slots]
+
+    def last_time(self, crypto_id):
+        with self._lock:
+            row = self.rows.get(crypto_id)
+            if row is None or not self.counts[row]:
+                return None
+            return int(self.times[row, (self.counts[row] - 1) % self.capacity])
+
+    def frame(self, crypto_id, n=None):
+        """DataFrame with date + OHLCV (float64), ready for TechnicalAnalyzer"""
+        times, bars = self.tail(crypto_id, n)
+        df = pd.DataFrame(bars.astype(float), columns=list(FIELDS))
+        df.insert(0, 'date', pd.to_datetime(times, unit='s'))
+        return df
+
+
+class IncrementalIndicators:
+    """
+    Streaming versions of the indicators compute_signals votes on.
+
+    Recursive indicators (EMA, MACD, RSI) carry O(1) state from bar to bar and
+    follow pandas_ta's recurrences (SMA-seeded EMAs, Wilder smoothing for RSI);
+    windowed ones (Stochastic %K, Bollinger Bands) are recomputed from the last
+    few bars. The state before the newest bar is kept so a still-forming bar
+    can be replaced.
+    """
+
+    def __init__(self, params):
+        self.params = params
+        self.ema_lengths = sorted({params['ema_fast'], params['ema_slow'], params['macd_fast'], params['macd_slow']})
+        self.window = max(params['stoch_k'] + params['stoch_smooth_k'] - 1, params['bb_length'])
+        self.state = {'n': 0, 'seed_sum': 0.0, 'prev_close': None, 'avg_gain': None, 'avg_loss': None,
+                      'ema': {}, 'macd_n': 0, 'macd_sum': 0.0, 'macd_signal': None}
+        self._before_last = None
+
+    def update(self, tail, replace_last=False):
+        """Advance by the newest bar; `tail` holds at least the last `window` OHLCV rows"""
+        if replace_last and self._before_last is not None:
+            self.state = self._before_last
+        self._before_last = {**self.state, 'ema': dict(self.state['ema'])}
+
+        p, s = self.params, self.state
+        tail = np.asarray(tail, dtype=float)
+        close = tail[-1, CLOSE]
+        s['n'] += 1
+        n = s['n']
+        row = {'close': close}
+
+        # EMAs seeded with the SMA of their first `length` closes
+        if n <= self.ema_lengths[-1]:
+            s['seed_sum'] += close
+        ema = s['ema']
+        for length in self.ema_lengths:
+            if n == length:
+                ema[length] = s['seed_sum'] / length
+            elif n > length:
+                ema[length] += 2 / (length + 1) * (close - ema[length])
+        row['EMA_12'] = ema.get(p['ema_fast'], np.nan)
+        row['EMA_26'] = ema.get(p['ema_slow'], np.nan)
+
+        # MACD and its SMA-seeded signal line
+        if n >= max(p['macd_fast'], p['macd_slow']):
+            macd = ema[p['macd_fast']] - ema[p['macd_slow']]
+            s['macd_n'] += 1
+            if s['macd_n'] <= p['macd_signal']:
+                s['macd_sum'] += macd
+            if s['macd_n'] == p['macd_signal']:
+                s['macd_signal'] = s['macd_sum'] / p['macd_signal']
+            elif s['macd_n'] > p['macd_signal']:
+                s['macd_signal'] += 2 / (p['macd_signal'] + 1) * (macd - s['macd_signal'])
+            row['MACD'] = macd
+            if s['macd_signal'] is not None:
+                row['MACD_signal'] = s['macd_signal']
+                row['MACD_histogram'] = macd - s['macd_signal']
+
+        # RSI with Wilder smoothing of gains and losses
+        if s['prev_close'] is not None:
+            change = close - s['prev_close']
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if s['avg_gain'] is None:
+                s['avg_gain'], s['avg_loss'] = gain, loss
+            else:
+                s['avg_gain'] += (gain - s['avg_gain']) / p['rsi_length']
+                s['avg_loss'] += (loss - s['avg_loss']) / p['rsi_length']
+            total = s['avg_gain'] + s['avg_loss']
+            row['RSI'] = 100 * s['avg_gain'] / total if total > 0 else np.nan
+        s['prev_close'] = close
+
+        # Stochastic %K (smoothed) from the last k + smooth_k - 1 bars
+        k, smooth = p['stoch_k'], p['stoch_smooth_k']
+        if n >= k + smooth - 1:
+            bars = tail[-(k + smooth - 1):]
+            highest = np.lib.stride_tricks.sliding_window_view(bars[:, HIGH], k).max(axis=1)
+            lowest = np.lib.stride_tricks.sliding_window_view(bars[:, LOW], k).min(axis=1)
+            spread = highest - lowest
+            spread[spread == 0] += sys.float_info.epsilon
+            row['STOCH_K'] = float(np.mean(100 * (bars[k - 1:, CLOSE] - lowest) / spread))
+
+        # Bollinger Bands
+        if n >= p['bb_length']:
+            closes = tail[-p['bb_length']:, CLOSE]
+            middle, std = closes.mean(), closes.std(ddof=1)
+            row['BB_upper'] = middle + p['bb_std'] * std
+            row['BB_middle'] = middle
+            row['BB_lower'] = middle - p['bb_std'] * std
+
+        return row
+
+
+class _CoinState:
+    __slots__ = ('indicators', 'prev_row', 'last_row', 'signal', 'strength', 'updated')
+
+    def __init__(self, indicators):
+        self.indicators = indicators
+        self.prev_row = {}
+        self.last_row = {}
+        self.signal = None
+        self.strength = 0
+        self.updated = None
+
+
+class IntradayEngine:
+    """
+    Intraday mode: polls minute/hour bars into an IntradayStore, updates each
+    coin's indicators incrementally and publishes 'intraday_signal' events on
+    the broadcaster whenever a coin's BUY/SELL/HOLD signal changes.
+    """
+
+    def __init__(self, analyzer, broadcaster, feed, store=None, poll_seconds=INTRADAY_POLL_SECONDS,
+                 ingest_every=50):
+        self.analyzer = analyzer
+        self.broadcaster = broadcaster
+        self.feed = feed
+        self.store = store or IntradayStore()
+        self.poll_seconds = poll_seconds
+        self.ingest_every = ingest_every  # coins fetched per ingest batch while polling
+        self.coins = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _coin(self, crypto_id):
+        coin = self.coins.get(crypto_id)
+        if coin is None:
+            coin = self.coins[crypto_id] = _CoinState(IncrementalIndicators(self.analyzer.params_for(crypto_id)))
+        return coin
+
+    def ingest(self, batch):
+        """
+        Apply {crypto_id: [bar, ...]} and publish signal changes; returns the events sent.
+
+        Signals are voted by compute_signals over every coin's new rows at once:
+        each coin contributes its row before the first new bar followed by the
+        new rows, and that leading row's own vote is discarded.
+        """
+        segments = {}  # params key -> [(crypto_id, rows), ...]
+        with self._lock:
+            for crypto_id, bars in batch.items():
+                coin = self._coin(crypto_id)
+                window = coin.indicators.window
+                rows = None
+                for bar in sorted(bars, key=lambda b: b['time']):
+                    if not bar.get('close') or bar['close'] <= 0:
+                        continue  # placeholder bars before a coin trades
+                    status = self.store.append(crypto_id, bar)
+                    if status is None:
+                        continue
+                    replace = status == 'update'
+                    if rows is None:
+                        rows = [coin.prev_row if replace else coin.last_row]
+                    elif replace and len(rows) > 1:
+                        rows.pop()
+                    row = coin.indicators.update(self.store.tail(crypto_id, window)[1], replace)
+                    rows.append({**row, 'time': bar['time']})
+                if rows:
+                    coin.prev_row, coin.last_row = rows[-2], rows[-1]
+                    key = tuple(sorted(coin.indicators.params.items()))
+                    segments.setdefault(key, []).append((crypto_id, rows))
+
+            events = []
+            for key, coin_rows in segments.items():
+                frame = pd.DataFrame([row for _, rows in coin_rows for row in rows])
+                signal, strength = compute_signals(frame, dict(key))
+                end = 0
+                for crypto_id, rows in coin_rows:
+                    end += len(rows)
+                    event = self._set_signal(crypto_id, str(signal[end - 1]), int(strength[end - 1]))
+                    if event:
+                        events.append(event)
+
+        for event in events:
+            self.broadcaster.publish('intraday_signal', event, topic=event['crypto_id'])
+        return events
+
+    def _set_signal(self, crypto_id, signal, strength):
+        coin = self.coins[crypto_id]
+        previous = coin.signal
+        coin.signal, coin.strength = signal, strength
+        coin.updated = coin.last_row['time']
+        if previous is None or previous == signal:
+            return None
+        return {'crypto_id': crypto_id, 'previous_signal': previous, **self._latest(coin)}
+
+    @staticmethod
+    def _latest(coin):
+        row = coin.last_row
+        return {
+            'time': datetime.fromtimestamp(row['time'], timezone.utc).isoformat(),
+            'signal': coin.signal,
+            'signal_strength': coin.strength,
+            'price': row['close'],
+            'indicators': {name: round(float(value), 4) for name, value in row.items()
+                           if name not in ('time', 'close') and not np.isnan(value)}
+        }
+
+    def snapshot(self, crypto_id, points=120):
+        """Latest signal/indicators and the last `points` bars of a coin, or None if unknown"""
+        with self._lock:
+            coin = self.coins.get(crypto_id)
+            if coin is None or not coin.last_row:
+                return None
+            latest = self._latest(coin)
+        df = self.store.frame(crypto_id, points)
+        df['date'] = df['date'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        return {'crypto_id': crypto_id, **latest, 'bars': df.to_dict('records')}
+
+    # ---- Polling ----
+    def poll_once(self, coins):
+        """Fetch new bars for {crypto_id: symbol} and ingest them in batches"""
+        events, batch = [], {}
+        for crypto_id, symbol in coins.items():
+            if self._stop.is_set():
+                break
+            try:
+                bars = self.feed.fetch(crypto_id, symbol, self.store.last_time(crypto_id))
+            except Exception as e:
+                self.logger.warning(f"Intraday fetch failed for {crypto_id}: {e}")
+                continue
+            if bars:
+                batch[crypto_id] = bars
+            if len(batch) >= self.ingest_every:
+                events += self.ingest(batch)
+                batch = {}
+        return events + self.ingest(batch)
+
+    def _run(self, coins):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                events = self.poll_once(coins)
+                self.logger.info(f"Intraday poll of {len(coins)} coins: {len(events)} signal changes "
+                                 f"in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                self.logger.error(f"Intraday poll failed: {e}")
+            self._stop.wait(max(0.0, self.poll_seconds - (time.monotonic() - started)))
+
+    def start(self, coins):
+        """Poll {crypto_id: symbol} every poll_seconds on a daemon thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(coins,), name='intraday-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+# ---- Bar sources ----
+class CryptoCompareIntradayFeed:
+    """histominute/histohour bars from CryptoCompare, fetching only what is missing"""
+
+    def __init__(self, strategy=None, interval=INTRADAY_INTERVAL, capacity=INTRADAY_CAPACITY):
+        from filters.strategies.crypto_compare_strategy import CryptoCompareStrategy
+        self.strategy = strategy or CryptoCompareStrategy(rate_limit_delay=INTRADAY_RATE_LIMIT_DELAY)
+        self.interval = interval
+        self.capacity = capacity
+        self.bar_seconds = 60 if interval == 'minute' else 3600
+
+    def fetch(self, crypto_id, symbol, since=None):
+        limit = self.capacity if since is None else int(time.time() - since) // self.bar_seconds + 1
+        limit = min(limit, self.strategy.MAX_HISTODAY_LIMIT)
+        return self.strategy.fetch_intraday_bars(symbol, self.interval, limit, since)
+
+
+class ReplayFeed:
+    """
+    Offline stand-in for the API: replays each coin's stored daily candles as
+    consecutive bars. The first fetch returns `warmup` bars, later ones
+    `bars_per_poll` each. Histories are read once and kept as arrays.
+    """
+
+    def __init__(self, csv_manager, bars_per_poll=1, warmup=INTRADAY_CAPACITY):
+        self.csv_manager = csv_manager
+        self.bars_per_poll = bars_per_poll
+        self.warmup = warmup
+        self._series = {}  # crypto_id -> (times, float32 OHLCV)
+        self._cursors = {}
+
+    def _load(self, crypto_id):
+        if crypto_id not in self._series:
+            df = pd.DataFrame(self.csv_manager.load_historical_records(crypto_id))
+            if df.empty or 'close' not in df.columns:
+                self._series[crypto_id] = (np.empty(0, dtype=np.int64), np.empty((0, len(FIELDS))))
+            else:
+                times = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[s]').astype(np.int64)
+                bars = df.reindex(columns=list(FIELDS)).apply(pd.to_numeric, errors='coerce')
+                self._series[crypto_id] = (times, bars.to_numpy(dtype=np.float32))
+        return self._series[crypto_id]
+
+    def fetch(self, crypto_id, symbol=None, since=None):
+        times, bars = self._load(crypto_id)
+        start = self._cursors.get(crypto_id)
+        end = min(len(times), self.warmup if start is None else start + self.bars_per_poll)
+        self._cursors[crypto_id] = end
+        return [{'time': int(times[i]), **dict(zip(FIELDS, bars[i].tolist()))} for i in range(start or 0, end)]
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+    from utils.event_broadcaster import EventBroadcaster
+    from analysis.technical_analyzer import TechnicalAnalyzer
+
+    # Replay stored candles through the intraday path: python -m analysis.intraday_engine [polls]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    csv_manager = CSVManager()
+    coins = {crypto_id: crypto_id for crypto_id in csv_manager.historical_ids()}
+    engine = IntradayEngine(TechnicalAnalyzer(), EventBroadcaster(), ReplayFeed(csv_manager, warmup=300))
+
+    started = time.perf_counter()
+    engine.poll_once(coins)
+    print(f"Warm-up of {len(coins)} coins: {time.perf_counter() - started:.2f}s, "
+          f"store {engine.store.nbytes / 1e6:.1f} MB")
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for _ in range(polls):
+        started = time.perf_counter()
+        events = engine.poll_once(coins)
+        print(f"Poll: {len(events)} signal changes in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config import MODELS_DIR, GLOBAL_LSTM_PATH, LSTM_MODEL_MAX_AGE_DAYS
+from analysis.lstm_predictor import prepare_dataset, inverse_close, forecast
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyLSTM:
+    """
+    NumPy forward pass of the exported Keras LSTM/Dense stack.
+
+    Follows Keras' defaults: gate order i, f, c, o with sigmoid recurrent
+    activation and tanh cell activation; Dense layers are linear.
+    """
+
+    def __init__(self, layer_types, weights):
+        self.layers = list(zip(layer_types, weights))
+
+    @classmethod
+    def load(cls, path, crypto_id=None):
+        """Load an exported model; for a global model pick the row of `crypto_id`"""
+        with np.load(path) as data:
+            layer_types = [str(t) for t in data['layer_types']]
+            weights = []
+            for i in range(len(layer_types)):
+                names = sorted((k for k in data.files if k.startswith(f"layer{i}_")),
+                               key=lambda k: int(k.rsplit('_', 1)[1]))
+                weights.append([data[k] for k in names])
+
+            if 'coin_ids' in data.files:
+                matches = np.flatnonzero(data['coin_ids'] == crypto_id)
+                if not len(matches):
+                    return None
+                row = int(matches[0])
+                # Coin embedding is folded into the bias of the first Dense layer
+                weights[int(data['coin_bias_layer'])][1] = data['coin_bias'][row]
+                model = cls(layer_types, weights)
+                model.scaler_min = data['scaler_min'][row]
+                model.scaler_scale = data['scaler_scale'][row]
+                model.metrics = data['metrics'][row].tolist()
+            else:
+                model = cls(layer_types, weights)
+                model.scaler_min = data['scaler_min']
+                model.scaler_scale = data['scaler_scale']
+                model.metrics = data['metrics'].tolist()
+            model.lookback = int(data['lookback'])
+            model.trained_at = str(data['trained_at'])
+        return model
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent_kernel, bias):
+        batch, steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+        # Input projections for every timestep at once; only the recurrence is sequential
+        projected = x @ kernel + bias
+        h = np.zeros((batch, units))
+        c = np.zeros((batch, units))
+        outputs = np.empty((batch, steps, units))
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            outputs[:, t] = h
+        return outputs
+
+    def predict(self, x):
+        out = np.asarray(x, dtype=float)
+        for layer_type, weights in self.layers:
+            if layer_type == 'lstm':
+                out = self._lstm(out, *weights)
+            else:
+                if out.ndim == 3:
+                    out = out[:, -1]  # last LSTM state (return_sequences=False)
+                kernel, bias = weights
+                out = out @ kernel + bias
+        return out
+
+
+class LSTMInference:
+    """Serves forecasts from exported LSTM weights in the web process"""
+
+    def __init__(self, models_dir=MODELS_DIR, global_path=GLOBAL_LSTM_PATH, max_age_days=LSTM_MODEL_MAX_AGE_DAYS):
+        self.models_dir = models_dir
+        self.global_path = global_path
+        self.max_age_days = max_age_days
+        self.logger = logging.getLogger(__name__)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model_path(self, crypto_id):
+        return os.path.join(self.models_dir, f"{crypto_id}_lstm.npz")
+
+    def _fresh_mtime(self, path):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if (datetime.now().timestamp() - mtime) > self.max_age_days * 86400:
+            return None
+        return mtime
+
+    def load(self, crypto_id):
+        """
+        Model for a coin: its own exported weights, else the global multi-coin model.
+        Returns None if neither exists or both are older than max_age_days.
+        """
+        for path in (self.model_path(crypto_id), self.global_path):
+            mtime = self._fresh_mtime(path)
+            if mtime is None:
+                continue
+
+            with self._lock:
+                cached = self._models.get(crypto_id)
+                if cached and cached[0] == (path, mtime):
+                    return cached[1]
+            try:
+                model = NumpyLSTM.load(path, crypto_id)
+            except Exception as e:
+                self.logger.error(f"Could not load exported LSTM {path} for {crypto_id}: {e}")
+                continue
+            if model is None:
+                continue
+            with self._lock:
+                self._models[crypto_id] = ((path, mtime), model)
+            return model
+        return None
+
+    def predict(self, crypto_id, historical_data):
+        """Forecast from the latest data with saved weights; None if no usable model"""
+        model = self.load(crypto_id)
+        if model is None:
+            return None
+
+        dataset = prepare_dataset(historical_data)
+        if len(dataset) < model.lookback:
+            return None
+        scaled = dataset * model.scaler_scale + model.scaler_min
+        future_preds = forecast(model.predict, scaled, model.lookback)
+        rmse, mape, r2 = model.metrics
+
+        return {
+            'crypto_id': crypto_id,
+            'metrics': {
+                'RMSE': rmse,
+                'MAPE': mape,
+                'R2': r2
+            },
+            'future_prices': inverse_close(future_preds, model.scaler_min, model.scaler_scale).tolist(),
+            'trained_at': model.trained_at
+        }
@@ -1,36 +1,67 @@
+import os
+from datetime import datetime
+
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_percentage_error
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
-from tensorflow.keras.optimizers import Adam
 import math
 
+FEATURES = ['open', 'high', 'low', 'close', 'volume']
+CLOSE_INDEX = 3  # predicting 'Close' price (4th column)
+FORECAST_DAYS = 7
+
+
+def prepare_dataset(historical_data):
+    """OHLCV matrix used for training and inference"""
+    df = pd.DataFrame(historical_data)
+
+    # Stored prices are already validated by DataQualityFilter; only volume can be missing
+    df = df.dropna(subset=['volume'])
+    return df[FEATURES].to_numpy(dtype=float)
+
+
+def inverse_close(values, scaler_min, scaler_scale):
+    """Undo MinMax scaling of the 'Close' column"""
+    return (np.asarray(values, dtype=float).reshape(-1) - scaler_min[CLOSE_INDEX]) / scaler_scale[CLOSE_INDEX]
+
+
+def forecast(predict_fn, scaled, lookback, days=FORECAST_DAYS):
+    """Roll the model forward, feeding each predicted close back into the window"""
+    seq = scaled[-lookback:].copy()
+    future_preds = []
+    for _ in range(days):
+        pred = float(np.asarray(predict_fn(seq.reshape(1, lookback, seq.shape[1]))).reshape(-1)[0])
+        future_preds.append(pred)
+
+        new_row = seq[-1].copy()
+        new_row[CLOSE_INDEX] = pred  # update 'Close'
+        seq = np.vstack([seq[1:], new_row])
+    return np.array(future_preds)
+
 
 class LSTMPredictor:
-    def __init__(self, lookback=30):
+    def __init__(self, lookback=30, export_path=None):
         self.lookback = lookback
-        self.scaler = MinMaxScaler(feature_range=(0, 1))
+        self.export_path = export_path
+        self.scaler = None
 
     def _create_sequences(self, data):
         X, y = [], []
         for i in range(self.lookback, len(data)):
             X.append(data[i - self.lookback:i])  # multivariate sequence
-            y.append(data[i, 3])  # predicting 'Close' price (4th column)
+            y.append(data[i, CLOSE_INDEX])
         return np.array(X), np.array(y)
 
     def train_and_predict(self, historical_data):
         """Train LSTM on OHLCV data and predict future closing prices"""
-        df = pd.DataFrame(historical_data)
-
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        df = df.dropna(subset=['open', 'high', 'low', 'close', 'volume'])
-
-        # Use all OHLCV
-        dataset = df[['open', 'high', 'low', 'close', 'volume']].values
+        # TensorFlow and sklearn are only needed for training, so import them here
+        from sklearn.preprocessing import MinMaxScaler
+        from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_percentage_error
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense
+        from tensorflow.keras.optimizers import Adam
+
+        dataset = prepare_dataset(historical_data)
+        self.scaler = MinMaxScaler(feature_range=(0, 1))
         scaled = self.scaler.fit_transform(dataset)
 
         # Train/test split
@@ -53,13 +84,10 @@ class LSTMPredictor:
         model.compile(optimizer=Adam(0.001), loss='mean_squared_error')
         model.fit(X_train, y_train, epochs=20, batch_size=16, verbose=0)
 
-        # Predict on test
-        predictions = model.predict(X_test)
-        # inverse scale only the 'Close' column
-        close_scaler = MinMaxScaler(feature_range=(0, 1))
-        close_scaler.min_, close_scaler.scale_ = self.scaler.min_[3], self.scaler.scale_[3]
-        predictions = close_scaler.inverse_transform(predictions.reshape(-1, 1))
-        real = close_scaler.inverse_transform(y_test.reshape(-1, 1))
+        # Predict on test, inverse scale only the 'Close' column
+        scaler_min, scaler_scale = self.scaler.min_, self.scaler.scale_
+        predictions = inverse_close(model.predict(X_test, verbose=0), scaler_min, scaler_scale)
+        real = inverse_close(y_test, scaler_min, scaler_scale)
 
         # Metrics
         rmse = math.sqrt(mean_squared_error(real, predictions))
@@ -67,22 +95,36 @@ class LSTMPredictor:
         r2 = r2_score(real, predictions)
 
         # Future forecast (next 7 days)
-        last_sequence = scaled[-self.lookback:]
-        future_preds = []
-        seq = last_sequence.copy()
-        for _ in range(7):
-            pred = model.predict(seq.reshape(1, self.lookback, X_train.shape[2]), verbose=0)
-            future_preds.append(pred[0, 0])
-
-            new_row = seq[-1].copy()
-            new_row[3] = pred  # update 'Close'
-            seq = np.vstack([seq[1:], new_row])
-
-        future_prices = close_scaler.inverse_transform(np.array(future_preds).reshape(-1, 1)).flatten()
+        future_preds = forecast(lambda seq: model(seq, training=False), scaled, self.lookback)
+        future_prices = inverse_close(future_preds, scaler_min, scaler_scale)
 
-        return {
+        results = {
             "rmse": round(rmse, 3),
             "mape": round(mape, 3),
             "r2": round(r2, 3),
             "future_predictions": future_prices.tolist()
         }
+        if self.export_path:
+            self.export(model, results)
+        return results
+
+    def export(self, model, results):
+        """Save weights and scaling so NumpyLSTM can serve predictions without TensorFlow"""
+        arrays = {}
+        layer_types = []
+        for layer in model.layers:
+            for j, weights in enumerate(layer.get_weights()):
+                arrays[f"layer{len(layer_types)}_{j}"] = weights
+            layer_types.append(type(layer).__name__.lower())
+
+        os.makedirs(os.path.dirname(self.export_path) or '.', exist_ok=True)
+        tmp_path = self.export_path + '.tmp.npz'
+        np.savez(tmp_path,
+                 layer_types=np.array(layer_types),
+                 scaler_min=self.scaler.min_,
+                 scaler_scale=self.scaler.scale_,
+                 lookback=self.lookback,
+                 metrics=np.array([results['rmse'], results['mape'], results['r2']]),
+                 trained_at=datetime.now().isoformat(timespec='seconds'),
+                 **arrays)
+        os.replace(tmp_path, self.export_path)
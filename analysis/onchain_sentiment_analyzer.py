@@ -1,5 +1,8 @@
 import random
-from textblob import TextBlob
+
+from utils.lazy_import import lazy_module
+
+textblob = lazy_module('textblob')  # NLTK corpora load on first analysis
 
 class OnChainSentimentAnalyzer:
     def __init__(self):
@@ -27,7 +30,7 @@ class OnChainSentimentAnalyzer:
             "Institutional investors are showing strong interest again."
         ]
 
-        sentiments = [TextBlob(post).sentiment.polarity for post in sample_posts]
+        sentiments = [textblob.TextBlob(post).sentiment.polarity for post in sample_posts]
         avg_sentiment = sum(sentiments) / len(sentiments)
 
         # Sentiment interpretation
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import SWEEP_DIR, INDICATOR_PARAMS_FILE, BACKTEST_FEE_BPS, HISTORICAL_DIR, CSV_ENCODING
+from analysis.technical_analyzer import DEFAULT_PARAMS, GLOBAL_SCOPE, compute_signals
+from analysis.indicator_graph import ta
+from analysis.backtester import positions_from_signals, strategy_returns, performance
+
+# Only parameters that change signals are worth sweeping
+DEFAULT_SPACE = {
+    'rsi_length': [7, 14, 21],
+    'rsi_buy': [25, 30, 35],
+    'rsi_sell': [65, 70, 75],
+    'macd_fast': [8, 12],
+    'macd_slow': [21, 26],
+    'stoch_k': [9, 14],
+    'stoch_buy': [15, 20, 25],
+    'stoch_sell': [75, 80, 85],
+    'bb_length': [10, 20, 30],
+    'bb_std': [1.5, 2.0, 2.5],
+    'ema_fast': [8, 12, 20],
+    'ema_slow': [26, 50]
+}
+METRICS = ['is_sharpe', 'is_return', 'oos_sharpe', 'oos_return', 'oos_max_drawdown', 'trades']
+
+
+def combo_id(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class IndicatorCache:
+    """
+    Per-coin memo of indicator series so every combination reuses shared work.
+
+    Moving averages and standard deviations of any length come from one pair of
+    cumulative sums; pandas_ta indicators are computed once per distinct setting.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.close = df['close'].astype(float)
+        # Shift by the first close so the sum of squares keeps its precision
+        centred = self.close.to_numpy() - self.close.iloc[0]
+        self._sum = np.concatenate(([0.0], np.cumsum(centred)))
+        self._sum_sq = np.concatenate(([0.0], np.cumsum(centred ** 2)))
+        self._offset = self.close.iloc[0]
+        self._memo = {}
+
+    def _get(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def _window_sums(self, length):
+        sums = np.full(len(self.close), np.nan)
+        sums_sq = np.full(len(self.close), np.nan)
+        sums[length - 1:] = self._sum[length:] - self._sum[:-length]
+        sums_sq[length - 1:] = self._sum_sq[length:] - self._sum_sq[:-length]
+        return sums, sums_sq
+
+    def sma(self, length):
+        def compute():
+            sums, _ = self._window_sums(length)
+            return pd.Series(sums / length + self._offset, index=self.close.index)
+        return self._get(('sma', length), compute)
+
+    def std(self, length):
+        """Rolling sample standard deviation (ddof=1, as pandas_ta bbands)"""
+        def compute():
+            sums, sums_sq = self._window_sums(length)
+            variance = (sums_sq - sums ** 2 / length) / (length - 1)
+            return pd.Series(np.sqrt(np.maximum(variance, 0.0)), index=self.close.index)
+        return self._get(('std', length), compute)
+
+    def bbands(self, length, std):
+        middle, deviation = self.sma(length), self.std(length)
+        return middle - std * deviation, middle + std * deviation
+
+    def rsi(self, length):
+        return self._get(('rsi', length), lambda: ta.rsi(self.close, length=length))
+
+    def ema(self, length):
+        return self._get(('ema', length), lambda: ta.ema(self.close, length=length))
+
+    def macd(self, fast, slow, signal):
+        def compute():
+            macd = ta.macd(self.close, fast=fast, slow=slow, signal=signal)
+            return macd.iloc[:, 0], macd.iloc[:, 2]  # MACD, MACDs
+        return self._get(('macd', fast, slow, signal), compute)
+
+    def stoch_k(self, k, d, smooth_k):
+        def compute():
+            stoch = ta.stoch(self.df['high'], self.df['low'], self.close, k=k, d=d, smooth_k=smooth_k)
+            return stoch.iloc[:, 0]
+        return self._get(('stoch', k, d, smooth_k), compute)
+
+    def signal_inputs(self, p):
+        """The columns compute_signals() reads, for parameter set `p`"""
+        macd, macd_signal = self.macd(p['macd_fast'], p['macd_slow'], p['macd_signal'])
+        bb_lower, bb_upper = self.bbands(p['bb_length'], p['bb_std'])
+        return {
+            'close': self.close,
+            'RSI': self.rsi(p['rsi_length']),
+            'MACD': macd,
+            'MACD_signal': macd_signal,
+            'STOCH_K': self.stoch_k(p['stoch_k'], p['stoch_d'], p['stoch_smooth_k']),
+            'BB_lower': bb_lower,
+            'BB_upper': bb_upper,
+            'EMA_12': self.ema(p['ema_fast']),
+            'EMA_26': self.ema(p['ema_slow'])
+        }
+
+
+class ParameterSweep:
+    """
+    Grid or random search over TechnicalAnalyzer settings across all coins.
+
+    Each coin is evaluated on its first 70% (in-sample, used for ranking) and
+    last 30% (out-of-sample, reported). Coins run on a process pool; per-coin
+    results are cached on disk by file identity and settings, so repeated or
+    extended sweeps only evaluate new combinations.
+    """
+
+    def __init__(self, csv_manager, space=None, mode='random', samples=100, seed=42,
+                 fee_bps=BACKTEST_FEE_BPS, min_rows=365, max_workers=None, sweep_dir=SWEEP_DIR):
+        self.csv_manager = csv_manager
+        self.space = space or DEFAULT_SPACE
+        self.mode = mode
+        self.samples = samples
+        self.seed = seed
+        self.fee_bps = fee_bps
+        self.min_rows = min_rows
+        self.max_workers = max_workers
+        self.sweep_dir = sweep_dir
+        self.logger = logging.getLogger(__name__)
+
+    # ---- Search space ----
+    @staticmethod
+    def _valid(p):
+        return (p['rsi_buy'] < p['rsi_sell'] and p['stoch_buy'] < p['stoch_sell']
+                and p['ema_fast'] < p['ema_slow'] and p['macd_fast'] < p['macd_slow'])
+
+    def combinations(self):
+        """Full parameter dicts to evaluate; the defaults are always included as a baseline"""
+        names = list(self.space)
+        sizes = [len(self.space[name]) for name in names]
+        total = int(np.prod(sizes))
+        if self.mode == 'grid':
+            indices = range(total)
+        else:
+            rng = np.random.default_rng(self.seed)
+            indices = rng.choice(total, size=min(self.samples, total), replace=False)
+
+        combos = {combo_id(DEFAULT_PARAMS): dict(DEFAULT_PARAMS)}
+        for index in indices:
+            # Decode the mixed-radix index so random search never materializes the grid
+            choice = {}
+            for name, size in zip(reversed(names), reversed(sizes)):
+                index, position = divmod(int(index), size)
+                choice[name] = self.space[name][position]
+            params = {**DEFAULT_PARAMS, **choice}
+            if self._valid(params):
+                combos.setdefault(combo_id(params), params)
+        return combos
+
+    # ---- Evaluation ----
+    def evaluate_coin(self, crypto_id, combos):
+        """{combo_id: metrics} for one coin, reusing cached results"""
+        path = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        fingerprint = f"{stat.st_mtime_ns}:{stat.st_size}:{self.fee_bps}:{self.min_rows}"
+        cache_path = os.path.join(self.sweep_dir, 'cache', f"{crypto_id}.json")
+        cached = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('fingerprint') == fingerprint:
+                cached = stored['results']
+
+        missing = [key for key in combos if key not in cached]
+        if missing:
+            cached.update(self._evaluate(path, {key: combos[key] for key in missing}))
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fingerprint, 'results': cached}, f)
+            os.replace(tmp_path, cache_path)
+        return {key: cached[key] for key in combos if cached.get(key)}
+
+    def _evaluate(self, path, combos):
+        try:
+            df = pd.read_csv(path, usecols=['date', 'high', 'low', 'close'], encoding=CSV_ENCODING)
+        except ValueError:
+            return {key: None for key in combos}  # not a candle file
+        df = df.dropna(subset=['close'])
+        if len(df) < self.min_rows:
+            return {key: None for key in combos}
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date', ignore_index=True)
+
+        bar_days = max(float(df['date'].diff().dt.days.median()), 1.0)
+        periods_per_year = 365 / bar_days
+        close = df['close'].to_numpy(dtype=float)
+        split = int(len(df) * 0.7)
+        cache = IndicatorCache(df)
+
+        results = {}
+        for key, params in combos.items():
+            signal, _ = compute_signals(cache.signal_inputs(params), params)
+            returns, held, asset_returns = strategy_returns(close, positions_from_signals(signal), self.fee_bps)
+            in_sample = performance(returns[:split], held[:split], asset_returns[:split], periods_per_year)
+            out_sample = performance(returns[split:], held[split:], asset_returns[split:], periods_per_year)
+            results[key] = [in_sample['sharpe'], in_sample['total_return'], out_sample['sharpe'],
+                            out_sample['total_return'], out_sample['max_drawdown'], out_sample['trades']]
+        return results
+
+    def run(self, coin_ids=None):
+        """Evaluate every combination on every coin; returns (combos, long results DataFrame)"""
+        coin_ids = coin_ids or self.csv_manager.historical_ids()
+        combos = self.combinations()
+        started = time.perf_counter()
+        rows = []
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            tasks = executor.map(_sweep_worker, coin_ids, [self._settings()] * len(coin_ids),
+                                 [combos] * len(coin_ids), chunksize=4)
+            for crypto_id, result in zip(coin_ids, tasks):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Sweep failed for {crypto_id}: {result}")
+                    continue
+                rows.extend([crypto_id, key, *metrics] for key, metrics in result.items())
+
+        results = pd.DataFrame(rows, columns=['crypto_id', 'combo_id', *METRICS])
+        self.logger.info(f"Evaluated {len(combos)} combinations on {results['crypto_id'].nunique()} coins "
+                         f"in {time.perf_counter() - started:.1f}s")
+        return combos, results
+
+    def _settings(self):
+        return {'fee_bps': self.fee_bps, 'min_rows': self.min_rows, 'sweep_dir': self.sweep_dir}
+
+    # ---- Output ----
+    def leaderboard(self, combos, results):
+        """Combinations ranked by median in-sample Sharpe across coins"""
+        board = results.groupby('combo_id')[METRICS].median()
+        board['coins'] = results.groupby('combo_id').size()
+        board = board.sort_values('is_sharpe', ascending=False)
+        params = pd.DataFrame.from_dict(combos, orient='index')[list(self.space)]
+        return board.join(params).reset_index()
+
+    def best_params_table(self, combos, results, per_coin=False):
+        """Compact configuration table: one global row, plus one row per coin if requested"""
+        board = self.leaderboard(combos, results)
+        rows = [{'scope': GLOBAL_SCOPE, **{name: combos[board.at[0, 'combo_id']][name] for name in self.space},
+                 'is_sharpe': board.at[0, 'is_sharpe'], 'oos_sharpe': board.at[0, 'oos_sharpe']}]
+        if per_coin:
+            best = results.loc[results.groupby('crypto_id')['is_sharpe'].idxmax()]
+            for row in best.itertuples():
+                rows.append({'scope': row.crypto_id, **{name: combos[row.combo_id][name] for name in self.space},
+                             'is_sharpe': row.is_sharpe, 'oos_sharpe': row.oos_sharpe})
+        return pd.DataFrame(rows)
+
+    def save(self, board, table, params_file=INDICATOR_PARAMS_FILE):
+        os.makedirs(self.sweep_dir, exist_ok=True)
+        board.to_csv(os.path.join(self.sweep_dir, 'sweep_leaderboard.csv'), index=False)
+        table.to_csv(params_file, index=False, encoding=CSV_ENCODING)
+        self.logger.info(f"Indicator configuration written to {params_file} ({len(table)} rows)")
+
+
+# ---- Process pool worker ----
+def _sweep_worker(crypto_id, settings, combos):
+    try:
+        return ParameterSweep(None, **settings).evaluate_coin(crypto_id, combos)
+    except Exception as e:
+        return e
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    samples = int(sys.argv[sys.argv.index('--samples') + 1]) if '--samples' in sys.argv else 100
+    sweep = ParameterSweep(CSVManager(), mode='grid' if '--grid' in sys.argv else 'random', samples=samples)
+
+    combos, results = sweep.run()
+    board = sweep.leaderboard(combos, results)
+    table = sweep.best_params_table(combos, results, per_coin='--per-coin' in sys.argv)
+    if '--dry-run' not in sys.argv:
+        sweep.save(board, table)
+
+    baseline = board[board['combo_id'] == combo_id(DEFAULT_PARAMS)]
+    print(board.head(10).to_string(index=False))
+    print(f"\nDefault settings: in-sample Sharpe {baseline['is_sharpe'].iloc[0]:.2f}, "
+          f"out-of-sample Sharpe {baseline['oos_sharpe'].iloc[0]:.2f} "
+          f"(rank {baseline.index[0] + 1}/{len(board)})")
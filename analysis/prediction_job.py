@@ -0,0 +1,31 @@
+import logging
+from functools import partial
+
+from utils.csv_manager import CSVManager
+from analysis.lstm_predictor import LSTMPredictor
+from analysis.lstm_inference import LSTMInference
+from analysis.strategies.lstm_strategy import LSTMAnalysisStrategy
+
+
+class CSVDataProvider:
+    """Minimal data provider for analysis strategies running outside the web process"""
+
+    def __init__(self, csv_manager=None):
+        self.csv_manager = csv_manager or CSVManager()
+
+    def _get_crypto_historical_data(self, crypto_id):
+        return self.csv_manager.load_historical_records(crypto_id)
+
+
+def run_lstm_prediction(crypto_id):
+    """Job entry point: train, predict and export weights for one coin in a pool worker"""
+    export_path = LSTMInference().model_path(crypto_id)
+    strategy = LSTMAnalysisStrategy(
+        predictor_class=partial(LSTMPredictor, export_path=export_path),
+        data_provider=CSVDataProvider(),
+        logger=logging.getLogger(__name__)
+    )
+    result = strategy.analyze(crypto_id)
+    if 'error' in result:
+        raise ValueError(result['error'])
+    return result
@@ -0,0 +1,323 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import (HISTORICAL_DIR, RISK_DIR, RISK_WINDOW, RISK_MIN_OBSERVATIONS, RISK_VAR_LEVEL, RISK_BENCHMARK,
+                    RISK_REFRESH_SECONDS, CSV_ENCODING)
+
+PERIODS_PER_YEAR = 365  # crypto trades every day
+METRICS = ('vol_close', 'vol_parkinson', 'vol_garman_klass', 'max_drawdown', 'var', 'cvar', 'beta')
+
+
+def _windows(values, window, last):
+    """The last `last` trailing windows of a days x coins array, as (last, coins, window); NaN-padded"""
+    rows = last + window - 1
+    if len(values) < rows:
+        padding = np.full((rows - len(values), *values.shape[1:]), np.nan)
+        values = np.concatenate([padding, values])
+    return sliding_window_view(values[-rows:], window, axis=0)
+
+
+def bar_returns(close, present=None):
+    """
+    Log return of every bar since the previous bar, with the days it spans.
+
+    `close` is a days x coins array on a daily calendar (NaN where a coin has
+    no bar); `present` restricts which bars count (default: every close).
+    Stored histories mix daily and 4-day candles, so returns are taken between
+    consecutive stored bars rather than consecutive calendar days. Returns
+    (returns, gaps) arrays shaped like `close`, NaN where no return is defined.
+    """
+    close = np.asarray(close, dtype=float)
+    present = ~np.isnan(close) if present is None else present & ~np.isnan(close)
+    rows = np.broadcast_to(np.arange(len(close))[:, None], close.shape)
+    latest = np.maximum.accumulate(np.where(present, rows, -1), axis=0)
+    previous = np.vstack([np.full((1, close.shape[1]), -1), latest[:-1]])
+    valid = present & (previous >= 0)
+    previous_close = np.take_along_axis(close, np.clip(previous, 0, None), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(valid, np.log(close / previous_close), np.nan)
+    return returns, np.where(valid, rows - previous, np.nan)
+
+
+def rolling_risk(open_, high, low, close, benchmark_close, window=RISK_WINDOW, level=RISK_VAR_LEVEL,
+                 last=1, min_observations=RISK_MIN_OBSERVATIONS):
+    """
+    Risk of the trailing `window` days ending at each of the last `last` rows.
+
+    Prices are days x coins arrays on a daily calendar (NaN where a coin has
+    no bar); benchmark_close is a days vector on the same calendar, or a days
+    x coins array when each column has its own calendar. Returns are taken
+    between consecutive stored bars (see bar_returns) and scaled to one day,
+    so daily and 4-day candles contribute comparable values; rows before the
+    last `window + last` only supply the previous bar of the first returns.
+    Every metric is computed for all coins and windows at once over
+    (last, coins, window) views, so memory grows with last * coins * window:
+    ask for a long history of one coin or the latest window of every coin,
+    not both.
+
+    Returns {metric: last x coins array}, NaN where a window has fewer than
+    `min_observations` returns:
+      vol_close, vol_parkinson, vol_garman_klass - annualized volatility
+        from closes, high/low ranges and full OHLC bars
+      max_drawdown - largest peak-to-trough fall of the close (a fraction)
+      var, cvar    - historical value at risk / expected shortfall of a daily
+        simple return at `level`, as positive losses
+      beta         - covariance with the benchmark's returns over its variance,
+        on the intervals between bars both have
+      observations, beta_observations - returns in the window, and intervals
+        shared with the benchmark (beta needs `min_observations` of them)
+    """
+    close = np.asarray(close, dtype=float)
+    open_, high, low = (np.asarray(a, dtype=float) for a in (open_, high, low))
+    benchmark_close = np.asarray(benchmark_close, dtype=float)
+    if benchmark_close.ndim == 1:
+        benchmark_close = np.broadcast_to(benchmark_close[:, None], close.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN windows
+        returns, gaps = bar_returns(close)
+        daily = returns / np.sqrt(gaps)
+        range_term = np.log(high / low) ** 2 / gaps
+        body_term = np.log(close / open_) ** 2 / gaps
+
+        r = _windows(daily, window, last)
+        observations = np.sum(~np.isnan(r), axis=-1)
+        annualize = math.sqrt(PERIODS_PER_YEAR)
+        result = {
+            'vol_close': np.nanstd(r, axis=-1, ddof=1) * annualize,
+            'vol_parkinson': np.sqrt(np.nanmean(_windows(range_term, window, last), axis=-1)
+                                     / (4 * math.log(2))) * annualize,
+            'vol_garman_klass': np.sqrt(np.clip(np.nanmean(
+                _windows(0.5 * range_term - (2 * math.log(2) - 1) * body_term, window, last), axis=-1),
+                0.0, None)) * annualize,
+        }
+
+        closes = _windows(close, window + 1, last)
+        peaks = np.fmax.accumulate(closes, axis=-1)
+        result['max_drawdown'] = -np.nanmin(closes / peaks - 1, axis=-1)
+
+        simple = np.expm1(r)
+        quantile = np.nanquantile(simple, 1 - level, axis=-1)
+        result['var'] = -quantile
+        result['cvar'] = -np.nanmean(np.where(simple <= quantile[..., None], simple, np.nan), axis=-1)
+
+        # Both series over the same intervals: between the bars the coin and the benchmark both have
+        both = ~np.isnan(close) & ~np.isnan(benchmark_close)
+        x = _windows(bar_returns(close, both)[0], window, last)
+        y = _windows(bar_returns(benchmark_close, both)[0], window, last)
+        dx = x - np.nanmean(x, axis=-1, keepdims=True)
+        dy = y - np.nanmean(y, axis=-1, keepdims=True)
+        beta_observations = np.sum(~np.isnan(x), axis=-1)
+        beta = np.nanmean(dx * dy, axis=-1) / np.nanmean(dy * dy, axis=-1)
+        beta[beta_observations < min_observations] = np.nan
+        result['beta'] = beta
+
+    for metric in METRICS:
+        result[metric][observations < min_observations] = np.nan
+    result['observations'] = observations
+    result['beta_observations'] = beta_observations
+    return result
+
+
+class RiskAnalyzer:
+    """
+    Volatility, drawdown, VaR/CVaR and beta of every stored coin.
+
+    build() lines every candle history up on a daily calendar ending at the
+    coin's own last bar and computes all coins in one vectorized pass, plus
+    each coin's current and worst drawdown over its whole history. A null
+    beta comes with beta_observations, the intervals the coin shares with the
+    benchmark in the window (fewer than RISK_MIN_OBSERVATIONS). The table is saved under
+    RISK_DIR with the change-feed position it reflects, so web workers load
+    it instead of recomputing; refresh() rebuilds it once candles were saved
+    since (the benchmark moves with every ingest, so betas of unchanged coins
+    change too). Rolling series of one coin are computed on request and
+    cached until the next refresh.
+    """
+
+    def __init__(self, csv_manager, window=RISK_WINDOW, level=RISK_VAR_LEVEL, benchmark=RISK_BENCHMARK,
+                 directory=RISK_DIR, refresh_interval=RISK_REFRESH_SECONDS):
+        self.csv_manager = csv_manager
+        self.window = window
+        self.level = level
+        self.benchmark = benchmark
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.logger = logging.getLogger(__name__)
+        self._table = None
+        self._as_of = None
+        self._position = 0
+        self._checked_at = 0.0
+        self._series = {}  # (crypto_id, points) -> rolling records, cleared when the table changes
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # ---- Panel ----
+    def _prices(self, crypto_id):
+        """Daily OHLC of a coin indexed by date, or None without candles"""
+        path = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+        try:
+            # Only the price columns, parsed straight to floats (no per-row records)
+            df = pd.read_csv(path, usecols=['date', 'open', 'high', 'low', 'close'], encoding=CSV_ENCODING)
+        except (OSError, ValueError):
+            return None  # missing, or an exchange snapshot rather than candles
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date']).drop_duplicates('date', keep='last').set_index('date').sort_index()
+        df = df.apply(pd.to_numeric, errors='coerce')
+        return df if df['close'].notna().any() else None
+
+    def _risk(self, prices, benchmark, ends, days, last):
+        """rolling_risk of coins whose calendars end at their own `ends` and span `days` days each"""
+        offsets = pd.to_timedelta(np.arange(-days + 1, 1), unit='D')
+        calendars = [end + offsets for end in ends]
+        panel = {field: np.column_stack([df[field].reindex(calendar).to_numpy(dtype=float)
+                                         for df, calendar in zip(prices, calendars)])
+                 for field in ('open', 'high', 'low', 'close')}
+        benchmark_close = np.column_stack([
+            benchmark['close'].reindex(calendar).to_numpy(dtype=float) if benchmark is not None
+            else np.full(days, np.nan) for calendar in calendars])
+        return rolling_risk(panel['open'], panel['high'], panel['low'], panel['close'],
+                            benchmark_close, self.window, self.level, last=last)
+
+    # ---- Table ----
+    def build(self):
+        """Recompute every coin's latest risk metrics"""
+        with self._lock:
+            started = time.perf_counter()
+            position = self.csv_manager.changes.position()
+            prices = {}
+            for crypto_id in self.csv_manager.historical_ids():
+                df = self._prices(crypto_id)
+                if df is not None:
+                    prices[crypto_id] = df
+            if self.benchmark not in prices:
+                self.logger.warning(f"Benchmark {self.benchmark} has no candles; beta is not computed")
+
+            ids = list(prices)
+            if ids:
+                as_of = max(df.index.max() for df in prices.values())
+                # Every coin's window ends at its own last bar; the days before it only
+                # supply the previous bar of the first returns (bars can be days apart)
+                ends = [prices[cid].index.max() for cid in ids]
+                result = self._risk([prices[cid] for cid in ids], prices.get(self.benchmark), ends,
+                                    2 * self.window + 1, last=1)
+                table = pd.DataFrame({metric: values[-1] for metric, values in result.items()}, index=ids)
+                table.insert(0, 'date', [end.strftime('%Y-%m-%d') for end in ends])
+                closes = [prices[cid]['close'].dropna() for cid in ids]
+                drawdowns = [close / close.cummax() - 1 for close in closes]
+                table['drawdown'] = [-dd.iloc[-1] for dd in drawdowns]
+                table['max_drawdown_history'] = [-dd.min() for dd in drawdowns]
+            else:
+                as_of, table = None, pd.DataFrame(columns=['date', *METRICS, 'observations', 'beta_observations'])
+
+            self._save(table.rename_axis('crypto_id'), as_of, position)
+            self._swap(table.rename_axis('crypto_id'), as_of, position)
+            self._checked_at = time.monotonic()
+        self.logger.info(f"Risk table built: {len(ids)} coins in {time.perf_counter() - started:.1f}s")
+        return len(ids)
+
+    def _save(self, table, as_of, position):
+        os.makedirs(self.directory, exist_ok=True)
+        self.csv_manager._write_csv(table.reset_index(), self._path('latest.csv'))
+        tmp = self._path('state.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'position': position, 'as_of': as_of.strftime('%Y-%m-%d') if as_of is not None else None,
+                       'window': self.window, 'level': self.level, 'benchmark': self.benchmark}, f)
+        os.replace(tmp, self._path('state.json'))
+
+    def _swap(self, table, as_of, position):
+        self._table, self._as_of, self._position = table, as_of, position
+        self._series = {}
+
+    def _load(self):
+        try:
+            with open(self._path('state.json'), encoding='utf-8') as f:
+                state = json.load(f)
+            table = pd.read_csv(self._path('latest.csv'), encoding=CSV_ENCODING, index_col='crypto_id')
+        except (OSError, ValueError, KeyError):
+            return False
+        if (state.get('window'), state.get('level'), state.get('benchmark')) != (self.window, self.level,
+                                                                                 self.benchmark):
+            return False  # built with other settings
+        self._swap(table, pd.Timestamp(state['as_of']) if state.get('as_of') else None, state['position'])
+        return True
+
+    def refresh(self):
+        """Rebuild the table if candles were saved since it was built; returns True when rebuilt"""
+        with self._lock:
+            loaded = self._table is not None or self._load()
+            self._checked_at = time.monotonic()
+            changed = loaded and bool(self.csv_manager.changes.changed_ids(self._position, kinds=('historical',))[0])
+        if loaded and not changed:
+            return False
+        self.build()
+        return True
+
+    def table(self):
+        """The latest risk table, refreshed at most every `refresh_interval` seconds"""
+        if self._table is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            self.refresh()
+        return self._table
+
+    # ---- Queries ----
+    def series(self, crypto_id, points=RISK_WINDOW):
+        """Rolling risk metrics of a coin over its last `points` days, as records (cached)"""
+        key = (crypto_id, points)
+        if key not in self._series:
+            prices = self._prices(crypto_id)
+            if prices is None:
+                return []
+            benchmark = prices if crypto_id == self.benchmark else self._prices(self.benchmark)
+            end = prices.index.max()
+            days = (end - prices.index.min()).days + 1
+            last = min(points, days)
+            result = self._risk([prices], benchmark, [end], days, last=last)
+            dates = pd.date_range(end=end, periods=last, freq='D')
+            frame = pd.DataFrame({metric: values[:, 0] for metric, values in result.items()}, index=dates)
+            frame = frame[frame['observations'] > 0]
+            records = frame.rename_axis('date').reset_index()
+            records['date'] = records['date'].dt.strftime('%Y-%m-%d')
+            if len(self._series) >= 256:
+                self._series.clear()
+            self._series[key] = records.astype(object).where(records.notna(), None).to_dict('records')
+        return self._series[key]
+
+    def report(self, crypto_id, points=RISK_WINDOW):
+        """Latest metrics and rolling series of a coin, or None if it has no candles"""
+        table = self.table()
+        if crypto_id not in table.index:
+            return None
+        row = table.loc[crypto_id]
+        return {
+            'crypto_id': crypto_id,
+            'as_of': row['date'],
+            'window_days': self.window,
+            'var_level': self.level,
+            'benchmark': self.benchmark,
+            'metrics': {key: (None if pd.isna(value) else value) for key, value in row.drop('date').items()},
+            'rolling': self.series(crypto_id, points)
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    analyzer = RiskAnalyzer(CSVManager())
+    analyzer.build()
+    table = analyzer.table()
+    ids = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    print(table.loc[[cid for cid in ids if cid in table.index]] if ids
+          else table.sort_values('vol_close', ascending=False).head(20).to_string())
@@ -0,0 +1,349 @@
+import json
+import logging
+import operator
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from config import SCREENER_DIR, SCREENER_REFRESH_SECONDS, CSV_ENCODING
+
+
+class QueryError(ValueError):
+    """A screener expression that cannot be parsed or names an unknown column"""
+
+
+# ---- Expression language ----
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><=|>=|==|!=|<|>|=|[-+*/()])
+)""", re.VERBOSE)
+
+_COMPARE = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+            '==': operator.eq, '=': operator.eq, '!=': operator.ne}
+_ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+_KEYWORDS = ('and', 'or', 'not')
+
+
+def _tokenize(text):
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Unexpected input at position {position}: {text[position:position + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.lower() in _KEYWORDS:
+            kind, value = 'op', value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class ScreenQuery:
+    """
+    A compiled screener condition, e.g.
+
+        RSI < 30 and close > SMA_200 and ADX > 25
+        signal == 'BUY' and (STOCH_K < 20 or close < 0.98 * BB_lower)
+
+    Grammar: comparisons (< <= > >= == !=) of arithmetic terms (+ - * /) over
+    column names, numbers and quoted strings, combined with and / or / not and
+    parentheses. Column names are case-insensitive. The query compiles to a
+    function of the table that returns a boolean mask, so evaluation is a few
+    vectorized column operations however many coins the table holds. A comparison
+    involving a missing value is unknown rather than false, and stays unknown
+    under `not`, so missing values never match.
+    """
+
+    def __init__(self, text, columns):
+        self.text = text
+        self._columns = {column.lower(): column for column in columns}
+        self.referenced = []  # column names in order of appearance
+        self._tokens = _tokenize(text)
+        self._pos = 0
+        if not self._tokens:
+            raise QueryError("Empty query")
+        self._evaluate = self._or()
+        if self._pos != len(self._tokens):
+            raise QueryError(f"Unexpected {self._tokens[self._pos][1]!r}")
+
+    def mask(self, table):
+        try:
+            result = self._evaluate(table)
+        except TypeError as e:
+            raise QueryError(f"Incompatible values in query: {e}") from e
+        if not isinstance(result, pd.Series):
+            result = pd.Series(bool(result), index=table.index)
+        if result.dtype == 'boolean':
+            result = result.fillna(False).astype(bool)  # unknown comparisons do not match
+        if result.dtype != bool:
+            raise QueryError("The query is not a condition (compare values with < > == ...)")
+        return result
+
+    # ---- Parser ----
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _accept(self, *ops):
+        kind, value = self._peek()
+        if kind == 'op' and value in ops:
+            self._pos += 1
+            return value
+        return None
+
+    def _or(self):
+        left = self._and()
+        while self._accept('or'):
+            left = self._combine(operator.or_, left, self._and())
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._accept('and'):
+            left = self._combine(operator.and_, left, self._not())
+        return left
+
+    def _not(self):
+        if self._accept('not'):
+            inner = self._not()
+            return lambda table: ~inner(table)
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._sum()
+        op = self._accept(*_COMPARE)
+        if op is None:
+            return left
+        return self._compare(_COMPARE[op], left, self._sum())
+
+    def _sum(self):
+        left = self._term()
+        while (op := self._accept('+', '-')):
+            left = self._combine(_ARITHMETIC[op], left, self._term())
+        return left
+
+    def _term(self):
+        left = self._factor()
+        while (op := self._accept('*', '/')):
+            left = self._combine(_ARITHMETIC[op], left, self._factor())
+        return left
+
+    def _factor(self):
+        if self._accept('-'):
+            inner = self._factor()
+            return lambda table: -inner(table)
+        if self._accept('('):
+            inner = self._or()
+            if not self._accept(')'):
+                raise QueryError("Missing ')'")
+            return inner
+
+        kind, value = self._peek()
+        self._pos += 1
+        if kind == 'number':
+            number = float(value)
+            return lambda table: number
+        if kind == 'string':
+            string = value[1:-1]
+            return lambda table: string
+        if kind == 'name':
+            column = self._columns.get(value.lower())
+            if column is None:
+                raise QueryError(f"Unknown column: {value}")
+            if column not in self.referenced:
+                self.referenced.append(column)
+            return lambda table: table[column]
+        raise QueryError(f"Unexpected {value!r}" if value else "Incomplete query")
+
+    @staticmethod
+    def _combine(function, left, right):
+        return lambda table: function(left(table), right(table))
+
+    @staticmethod
+    def _compare(function, left, right):
+        """Like _combine, but NA (nullable boolean) where either side is missing"""
+        def compare(table):
+            a, b = left(table), right(table)
+            result = function(a, b)
+            if not isinstance(result, pd.Series):
+                return result
+            return result.astype('boolean').mask(pd.isna(a) | pd.isna(b))
+        return compare
+
+
+# ---- Latest indicator table ----
+class Screener:
+    """
+    Screens coins against a table of their latest indicator values.
+
+    The table holds one row per coin: the last bar's prices, indicators and
+    signal (computed over the tail of the history only), joined with the
+    latest market metrics. It is saved under SCREENER_DIR with the change-feed
+    position it reflects; refresh() recomputes just the coins saved since, so
+    the refresh after a pipeline run costs as many analyses as coins updated.
+    """
+
+    def __init__(self, analyzer, csv_manager, directory=SCREENER_DIR, refresh_interval=SCREENER_REFRESH_SECONDS):
+        self.analyzer = analyzer
+        self.csv_manager = csv_manager
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.logger = logging.getLogger(__name__)
+        self._table = None  # indicator rows joined with market metrics, replaced as a whole
+        self._indicators = None
+        self._position = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _latest_row(self, crypto_id):
+        records = self.csv_manager.load_historical_records(crypto_id)
+        if not records or 'close' not in records[-1]:
+            return None
+        df = self.analyzer.calculate_indicators(records, 'daily', crypto_id, tail=1)
+        if df.empty:
+            return None
+        row = df.iloc[-1].to_dict()
+        row['date'] = pd.Timestamp(row['date']).strftime('%Y-%m-%d')
+        return row
+
+    def _compute(self, crypto_ids):
+        rows = {}
+        for crypto_id in crypto_ids:
+            try:
+                row = self._latest_row(crypto_id)
+            except Exception as e:
+                self.logger.error(f"Screener row for {crypto_id} failed: {e}")
+                continue
+            if row is not None:
+                rows[crypto_id] = row
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def _save(self, indicators, position):
+        """Persist the indicator rows with the change-feed position they reflect"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.csv_manager._write_csv(indicators.rename_axis('crypto_id').reset_index(), self._path('latest.csv'))
+        tmp = self._path('state.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'position': position}, f)
+        os.replace(tmp, self._path('state.json'))
+
+    def _swap(self, indicators, position):
+        """Join the latest market metrics and make the result the queried table"""
+        table = indicators
+        market = pd.DataFrame(self.csv_manager.metrics_table.load())
+        if not market.empty:
+            market = market.set_index('crypto_id')
+            table = indicators.join(market[market.columns.difference(indicators.columns)])
+        self._indicators, self._table, self._position = indicators, table, position
+
+    def _load(self):
+        try:
+            with open(self._path('state.json'), encoding='utf-8') as f:
+                position = json.load(f)['position']
+            indicators = pd.read_csv(self._path('latest.csv'), encoding=CSV_ENCODING, index_col='crypto_id')
+        except (OSError, ValueError, KeyError):
+            return False
+        self._swap(indicators, position)
+        return True
+
+    def build(self):
+        """Recompute every stored coin"""
+        with self._lock:
+            started = time.perf_counter()
+            position = self.csv_manager.changes.position()
+            indicators = self._compute(self.csv_manager.historical_ids())
+            self._save(indicators, position)
+            self._swap(indicators, position)
+            self._checked_at = time.monotonic()
+        self.logger.info(f"Screener table built: {len(indicators)} coins in {time.perf_counter() - started:.1f}s")
+        return len(indicators)
+
+    def refresh(self):
+        """Recompute the coins whose data changed since the table was saved; returns their count"""
+        with self._lock:
+            loaded = self._indicators is not None or self._load()
+        if not loaded:
+            return self.build()
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+            changed, position = self.csv_manager.changes.changed_ids(self._position, kinds=('historical', 'metrics'))
+            if position == self._position:
+                return 0
+            updated = self._compute(sorted(changed))
+            indicators = self._indicators.drop(index=[c for c in changed if c in self._indicators.index])
+            if len(updated):
+                indicators = pd.concat([indicators, updated]).sort_index()
+            self._save(indicators, position)
+            self._swap(indicators, position)
+        if changed:
+            self.logger.info(f"Screener table refreshed for {len(changed)} changed coins")
+        return len(changed)
+
+    def table(self):
+        """The current table, refreshed at most every `refresh_interval` seconds"""
+        if self._table is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            self.refresh()
+        return self._table
+
+    # ---- Query ----
+    def screen(self, query, sort=None, descending=True, limit=50):
+        """
+        Coins matching `query`, optionally sorted by a column, cut to `limit`.
+
+        Returns {'matched', 'total', 'columns', 'rows'}; rows carry crypto_id,
+        date, close, signal and every column the query or sort refers to.
+        """
+        table = self.table()
+        compiled = ScreenQuery(query, table.columns)
+        mask = compiled.mask(table)
+        matches = table[mask.to_numpy()]
+
+        columns = ['date', 'close', 'signal', *[c for c in compiled.referenced if c not in ('date', 'close', 'signal')]]
+        if sort:
+            sort_column = {column.lower(): column for column in table.columns}.get(sort.lower())
+            if sort_column is None:
+                raise QueryError(f"Unknown sort column: {sort}")
+            if sort_column not in columns:
+                columns.append(sort_column)
+            values = pd.to_numeric(matches[sort_column], errors='coerce')
+            top = values.nlargest(limit) if descending else values.nsmallest(limit)
+            matches = matches.loc[top.index]
+        else:
+            matches = matches.iloc[:limit]
+
+        rows = matches[[c for c in columns if c in matches.columns]]
+        rows = rows.astype(object).where(rows.notna(), None).rename_axis('crypto_id').reset_index()
+        return {'matched': int(mask.sum()), 'total': len(table), 'columns': columns,
+                'rows': rows.to_dict('records')}
+
+
+if __name__ == "__main__":
+    import argparse
+    from analysis.technical_analyzer import TechnicalAnalyzer
+    from utils.csv_manager import CSVManager
+
+    parser = argparse.ArgumentParser(description="Screen stored coins by their latest indicator values")
+    parser.add_argument('query', nargs='?', help="e.g. \"RSI < 30 and close > SMA_200\" (omit to rebuild the table)")
+    parser.add_argument('--sort', help="column to sort matches by (descending)")
+    parser.add_argument('--ascending', action='store_true')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    screener = Screener(TechnicalAnalyzer(), CSVManager())
+    if args.query is None:
+        screener.build()
+    else:
+        result = screener.screen(args.query, args.sort, not args.ascending, args.limit)
+        print(f"{result['matched']} of {result['total']} coins match")
+        print(pd.DataFrame(result['rows']).to_string(index=False))
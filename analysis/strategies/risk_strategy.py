@@ -0,0 +1,17 @@
+from analysis.strategies.base import AnalysisStrategy
+from config import RISK_WINDOW
+
+
+class RiskAnalysisStrategy(AnalysisStrategy):
+    """Strategy for volatility, drawdown, VaR/CVaR and beta of a cryptocurrency"""
+    def __init__(self, analyzer, logger, points=RISK_WINDOW):
+        self.analyzer = analyzer
+        self.logger = logger
+        self.points = points  # days of rolling metrics returned with the latest values
+
+    def analyze(self, crypto_id, points=None):
+        try:
+            return self.analyzer.report(crypto_id, points or self.points)
+        except Exception as e:
+            self.logger.error(f"Risk analysis error for {crypto_id}: {e}")
+            return {'error': str(e)}
@@ -1,51 +1,72 @@
 from analysis.strategies.base import AnalysisStrategy
+from config import ANALYSIS_TAIL_POINTS, ROLLUP_TIMEFRAMES
 
 
 class TechnicalAnalysisStrategy(AnalysisStrategy):
     """Strategy for performing technical analysis on a cryptocurrency"""
-    def __init__(self, analyzer, data_provider, logger):
+    COUNT_KEYS = ('total_signals', 'buy_signals', 'sell_signals', 'hold_signals')
+
+    def __init__(self, analyzer, data_provider, logger, tail=ANALYSIS_TAIL_POINTS):
         self.analyzer = analyzer
         self.data_provider = data_provider
         self.logger = logger
+        self.tail = tail  # bars returned; only they and their indicator warm-up are computed
+        self._history_counts = {}  # (crypto_id, time_frame) -> (stored version, whole-history counts)
 
     def analyze(self, crypto_id, time_frame='daily'):
-        import pandas as pd
-
-        # 1. Get historical data
-        df_data = self.data_provider._get_crypto_historical_data(crypto_id)
-        if not df_data or len(df_data) < 50:
+        # 1. Get historical data (ready-made bars for higher time frames)
+        resampled = time_frame in ROLLUP_TIMEFRAMES
+        if resampled:
+            df_data = self.data_provider._get_crypto_rollup_data(crypto_id, time_frame)
+        else:
+            df_data = self.data_provider._get_crypto_historical_data(crypto_id)
+        if not df_data or (not resampled and len(df_data) < 50):
             self.logger.warning(f"Insufficient data for technical analysis of {crypto_id}")
             return None
 
-        df = pd.DataFrame(df_data)
-
         # 2. Ensure required columns exist
         required_cols = ['date', 'open', 'high', 'low', 'close']
         for col in required_cols:
-            if col not in df.columns:
+            if col not in df_data[-1]:
                 self.logger.error(f"Missing required column {col} for {crypto_id}")
                 return None
 
-        # 3. Clean data
-        df = df[(df[['open', 'high', 'low', 'close']] != 0).any(axis=1)]
-        df = df.dropna(subset=['open', 'high', 'low', 'close'])
-
-        # 4. Perform indicators calculation
-        analysis_df = self.analyzer.calculate_indicators(df, time_frame)
+        # 3. Perform indicators calculation over the tail of the history
+        analysis_df = self.analyzer.calculate_indicators(df_data, time_frame, crypto_id, tail=self.tail,
+                                                         resampled=resampled)
         if analysis_df is None or analysis_df.empty:
             self.logger.error(f"Technical analysis failed for {crypto_id}")
             return None
 
-        # 5. Convert to dict for template
+        # 4. Convert to dict for template; data_points and the summary counts cover the whole
+        #    history as before, the tail_* fields only the returned bars
         analysis_dict = analysis_df.to_dict('records')
         summary = self.analyzer.get_analysis_summary(analysis_df)
+        tail_counts = {key: summary[key] for key in self.COUNT_KEYS}
+        history = self._history_summary(crypto_id, time_frame, df_data, resampled)
+        summary.update(history)
         indicators_summary = self.data_provider._get_indicators_summary(analysis_df)
 
         return {
             'crypto_id': crypto_id,
             'time_frame': time_frame,
-            'data_points': len(analysis_dict),
-            'analysis_data': analysis_dict[-100:],  # last 100 points
+            'data_points': history['total_signals'],
+            'history_points': len(df_data),
+            'tail_points': len(analysis_dict),
+            'tail_signals': tail_counts,
+            'analysis_data': analysis_dict,
             'summary': summary,
             'indicators_summary': indicators_summary
         }
+
+    def _history_summary(self, crypto_id, time_frame, df_data, resampled):
+        """Signal counts over the whole history, recomputed only when the stored bars change"""
+        version = (len(df_data), df_data[-1]['date'], df_data[-1]['close'])
+        cached = self._history_counts.get((crypto_id, time_frame))
+        if cached and cached[0] == version:
+            return cached[1]
+        full_df = self.analyzer.calculate_indicators(df_data, time_frame, crypto_id, resampled=resampled)
+        summary = self.analyzer.get_analysis_summary(full_df)
+        counts = {key: summary[key] for key in self.COUNT_KEYS}
+        self._history_counts[(crypto_id, time_frame)] = (version, counts)
+        return counts
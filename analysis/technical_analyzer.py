@@ -1,16 +1,145 @@
+import os
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 import logging
 
+from analysis.indicator_graph import INDICATORS, register_indicator
+from config import INDICATOR_PARAMS_FILE, CSV_ENCODING, ROLLUP_TIMEFRAMES
+from utils.rollup_store import rollup
+
+# Indicator lengths and signal thresholds. Output columns keep their default
+# names (SMA_20, EMA_12, ...) whatever the configured lengths are.
+DEFAULT_PARAMS = {
+    'rsi_length': 14, 'rsi_buy': 30, 'rsi_sell': 70,
+    'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9,
+    'stoch_k': 14, 'stoch_d': 3, 'stoch_smooth_k': 3, 'stoch_buy': 20, 'stoch_sell': 80,
+    'adx_length': 14, 'cci_length': 20,
+    'sma_fast': 20, 'sma_mid': 50, 'sma_slow': 200,
+    'ema_fast': 12, 'ema_slow': 26,
+    'wma_length': 20, 'bb_length': 20, 'bb_std': 2.0, 'vma_length': 20
+}
+GLOBAL_SCOPE = '*'
+
+TIME_FRAME_DAYS = {'daily': 1, '3d': 3, 'weekly': 7, 'monthly': 31, 'quarterly': 92}  # upper bound of days per bar
+
+# Indicators read by get_analysis_summary (and its latest signal)
+SUMMARY_INDICATORS = ('signal', 'RSI', 'MACD', 'STOCH', 'ADX', 'CCI', 'SMA_20', 'SMA_50', 'EMA', 'BBANDS')
+
+
+def load_params_table(path=INDICATOR_PARAMS_FILE):
+    """{scope: params} from a parameter table written by ParameterSweep; scope is a crypto_id or '*'"""
+    if not os.path.exists(path):
+        return {}
+    table = pd.read_csv(path, encoding=CSV_ENCODING, dtype={'scope': str})
+    columns = [col for col in table.columns if col in DEFAULT_PARAMS]
+    params = {}
+    for row in table.to_dict('records'):
+        params[row['scope']] = {col: type(DEFAULT_PARAMS[col])(row[col]) for col in columns if not pd.isna(row[col])}
+    return params
+
+
+def compute_signals(df, params):
+    """
+    BUY/SELL/HOLD votes from indicator columns; returns (signal, strength) arrays.
+
+    `df` is a DataFrame or a dict of aligned Series. Comparisons against NaN are
+    False, so rows with missing indicator values cast no vote.
+    """
+    n = len(df['close'])
+    buy_signals = np.zeros(n, dtype=int)
+    sell_signals = np.zeros(n, dtype=int)
+
+    def crossover(fast, slow):
+        above = (df[fast] > df[slow]) & (df[fast].shift() <= df[slow].shift())
+        below = (df[fast] < df[slow]) & (df[fast].shift() >= df[slow].shift())
+        return above.to_numpy(), below.to_numpy()
+
+    # RSI signals (30/70 levels by default)
+    if 'RSI' in df:
+        buy_signals += (df['RSI'] < params['rsi_buy']).to_numpy()
+        sell_signals += (df['RSI'] > params['rsi_sell']).to_numpy()
+
+    # MACD signals
+    if 'MACD' in df and 'MACD_signal' in df:
+        above, below = crossover('MACD', 'MACD_signal')
+        buy_signals += above
+        sell_signals += below
+
+    # Stochastic signals (20/80 levels by default)
+    if 'STOCH_K' in df:
+        buy_signals += (df['STOCH_K'] < params['stoch_buy']).to_numpy()
+        sell_signals += (df['STOCH_K'] > params['stoch_sell']).to_numpy()
+
+    # Bollinger Bands signals
+    if 'BB_lower' in df and 'BB_upper' in df:
+        valid = df['close'].notna() & df['BB_lower'].notna() & df['BB_upper'].notna()
+        below_band = valid & (df['close'] < df['BB_lower'])
+        buy_signals += below_band.to_numpy()
+        sell_signals += (valid & ~below_band & (df['close'] > df['BB_upper'])).to_numpy()
+
+    # Moving Average Crossover (EMA12/EMA26 by default)
+    if 'EMA_12' in df and 'EMA_26' in df:
+        above, below = crossover('EMA_12', 'EMA_26')
+        buy_signals += above
+        sell_signals += below
+
+    # Determine final signal (first row stays HOLD)
+    buy_signals[0] = sell_signals[0] = 0
+    signal = np.select([buy_signals > sell_signals, sell_signals > buy_signals], ['BUY', 'SELL'], default='HOLD')
+    return signal, np.abs(buy_signals - sell_signals)
+
+
+@register_indicator('signal', depends=('RSI', 'MACD', 'STOCH', 'BBANDS', 'EMA'), columns=('signal', 'signal_strength'),
+                    warmup=lambda p: 1)  # crossovers compare with the previous bar
+def _signal(frame):
+    if len(frame.df) < 2:
+        return {'signal': 'HOLD', 'signal_strength': 0}
+    signal, strength = compute_signals(frame.df, frame.params)
+    return {'signal': signal, 'signal_strength': strength}
+
 
 class TechnicalAnalyzer:
-    def __init__(self):
+    def __init__(self, params=None, params_file=INDICATOR_PARAMS_FILE):
+        """`params` overrides DEFAULT_PARAMS; otherwise the table in `params_file` is used if present"""
         self.logger = logging.getLogger(__name__)
+        self.params_table = {GLOBAL_SCOPE: params} if params is not None else load_params_table(params_file)
+
+    def params_for(self, crypto_id=None):
+        """Effective parameters: defaults, then the global row, then the coin's own row"""
+        return {**DEFAULT_PARAMS,
+                **self.params_table.get(GLOBAL_SCOPE, {}),
+                **self.params_table.get(crypto_id, {})}
 
-    def calculate_indicators(self, historical_data, time_frame='daily'):
+    def calculate_indicators(self, historical_data, time_frame='daily', crypto_id=None, indicators=None,
+                             tail=None, resampled=False):
         """
         Calculate technical indicators for cryptocurrency data
+
+        `indicators` names the indicators, columns or groups to compute (see
+        analysis.indicator_graph); only those and their dependencies are
+        evaluated. None computes every indicator and the signals.
+
+        With `tail`, only the last `tail` bars are returned, computed from just
+        those bars plus the warm-up the requested indicators need, so the cost
+        does not grow with the history. `historical_data` must then be in date
+        order, as stored.
+
+        `resampled` marks `historical_data` as bars of `time_frame` already
+        (from the RollupStore) rather than daily rows.
         """
+        params = self.params_for(crypto_id)
+        resample = time_frame in ROLLUP_TIMEFRAMES and not resampled
+
+        truncated = False
+        if tail is not None:
+            # One spare bar: the oldest resampled bar may be cut off mid-period
+            bar_days = TIME_FRAME_DAYS.get(time_frame, 1) if resample else 1
+            rows = (tail + INDICATORS.warmup(params, indicators) + 1) * bar_days
+            truncated = len(historical_data) > rows
+            if truncated:
+                historical_data = historical_data[-rows:] if isinstance(historical_data, list) \
+                    else historical_data.iloc[-rows:]
+
         # Convert input to DataFrame
         if isinstance(historical_data, list):
             df = pd.DataFrame(historical_data)
@@ -32,155 +161,25 @@ class TechnicalAnalyzer:
         df = df.dropna(subset=['close'])
 
         # Resample based on timeframe BEFORE indicator calculation
-        if time_frame == 'weekly':
-            df = df.resample('W', on='date').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna().reset_index()
-
-        elif time_frame == 'monthly':
-            df = df.resample('M', on='date').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna().reset_index()
+        if resample:
+            df = rollup(df, ROLLUP_TIMEFRAMES[time_frame])
+            if truncated:
+                df = df.iloc[1:]
 
         #  If too few points, stop early
         if len(df) < 50:
             self.logger.warning(f"Insufficient data points for {time_frame}: {len(df)}")
             return df
 
-        # Calculate all indicators
-        df = self._calculate_all_indicators(df)
+        # Calculate the requested indicators; the 'signal' node adds the BUY/SELL/HOLD columns
+        df = self._calculate_all_indicators(df, params, indicators)
+        return df.iloc[-tail:] if tail is not None else df
 
-        #  Generate signals
-        df = self._generate_signals(df)
-
-        return df
+    def _calculate_all_indicators(self, df, params=None, indicators=None):
+        """Calculate the requested indicators (all 10 families when None) through the indicator graph"""
+        return INDICATORS.evaluate(df, params or self.params_for(), indicators)
 
-    def _calculate_all_indicators(self, df):
-        """Calculate all 10 technical indicators"""
-
-        # OSCILLATORS (5 indicators)
-
-        # 1. RSI (Relative Strength Index)
-        df['RSI'] = ta.rsi(df['close'], length=14)
-
-        # 2. MACD (Moving Average Convergence Divergence)
-        macd = ta.macd(df['close'])
-        if macd is not None and not macd.empty:
-            # Check column names that pandas_ta returns
-            macd_columns = macd.columns.tolist()
-            if 'MACD_12_26_9' in macd_columns:
-                df['MACD'] = macd['MACD_12_26_9']
-                df['MACD_signal'] = macd['MACDs_12_26_9']
-                df['MACD_histogram'] = macd['MACDh_12_26_9']
-            elif 'MACD' in macd_columns:
-                df['MACD'] = macd['MACD']
-                df['MACD_signal'] = macd['MACDs']
-                df['MACD_histogram'] = macd['MACDh']
-
-        # 3. Stochastic Oscillator
-        stoch = ta.stoch(df['high'], df['low'], df['close'])
-        if stoch is not None and not stoch.empty:
-            stoch_columns = stoch.columns.tolist()
-            if 'STOCHk_14_3_3' in stoch_columns:
-                df['STOCH_K'] = stoch['STOCHk_14_3_3']
-                df['STOCH_D'] = stoch['STOCHd_14_3_3']
-            elif 'STOCHk' in stoch_columns:
-                df['STOCH_K'] = stoch['STOCHk']
-                df['STOCH_D'] = stoch['STOCHd']
-
-        # 4. ADX (Average Directional Index)
-        adx = ta.adx(df['high'], df['low'], df['close'])
-        if adx is not None and not adx.empty:
-            adx_columns = adx.columns.tolist()
-            if 'ADX_14' in adx_columns:
-                df['ADX'] = adx['ADX_14']
-                df['ADX_POS'] = adx['DMP_14']
-                df['ADX_NEG'] = adx['DMN_14']
-            elif 'ADX' in adx_columns:
-                df['ADX'] = adx['ADX']
-                df['ADX_POS'] = adx['DMP']
-                df['ADX_NEG'] = adx['DMN']
-
-        # 5. CCI (Commodity Channel Index)
-        cci_result = ta.cci(df['high'], df['low'], df['close'], length=20)
-        if cci_result is not None:
-            df['CCI'] = cci_result
-
-        # MOVING AVERAGES (5 indicators)
-
-        # 6. SMA (Simple Moving Average)
-        df['SMA_20'] = ta.sma(df['close'], length=20)
-        df['SMA_50'] = ta.sma(df['close'], length=50)
-        df['SMA_200'] = ta.sma(df['close'], length=200)
-
-        # 7. EMA (Exponential Moving Average)
-        df['EMA_12'] = ta.ema(df['close'], length=12)
-        df['EMA_26'] = ta.ema(df['close'], length=26)
-
-        # 8. WMA (Weighted Moving Average)
-        wma_result = ta.wma(df['close'], length=20)
-        if wma_result is not None:
-            df['WMA_20'] = wma_result
-
-        # 9. Bollinger Bands - FIXED VERSION
-        bb = ta.bbands(df['close'], length=20, std=2)
-        if bb is not None and not bb.empty:
-            # Check for different column naming patterns
-            bb_columns = bb.columns.tolist()
-
-            # Try different possible column names
-            upper_col = None
-            middle_col = None
-            lower_col = None
-
-            # Common patterns in pandas_ta
-            possible_upper = ['BBU_20_2.0', 'BBU_20_2', 'BBU', 'BB_UPPER']
-            possible_middle = ['BBM_20_2.0', 'BBM_20_2', 'BBM', 'BB_MIDDLE']
-            possible_lower = ['BBL_20_2.0', 'BBL_20_2', 'BBL', 'BB_LOWER']
-
-            for col in possible_upper:
-                if col in bb_columns:
-                    upper_col = col
-                    break
-
-            for col in possible_middle:
-                if col in bb_columns:
-                    middle_col = col
-                    break
-
-            for col in possible_lower:
-                if col in bb_columns:
-                    lower_col = col
-                    break
-
-            # If still not found, use first 3 columns
-            if not upper_col and len(bb_columns) >= 3:
-                upper_col = bb_columns[0]
-                middle_col = bb_columns[1]
-                lower_col = bb_columns[2]
-
-            if upper_col:
-                df['BB_upper'] = bb[upper_col]
-                df['BB_middle'] = bb[middle_col] if middle_col else bb[bb_columns[1]]
-                df['BB_lower'] = bb[lower_col] if lower_col else bb[bb_columns[2]]
-
-        # 10. Volume Moving Average
-        if 'volume' in df.columns:
-            vma_result = ta.sma(df['volume'], length=20)
-            if vma_result is not None:
-                df['VMA_20'] = vma_result
-
-        return df
-
-    def _generate_signals(self, df):
+    def _generate_signals(self, df, params=None):
         """Generate buy/sell/hold signals based on indicators"""
 
         # Initialize signals as 'HOLD'
@@ -190,110 +189,14 @@ class TechnicalAnalyzer:
         if len(df) < 2:
             return df
 
-        signals = []
-
-        for i in range(1, len(df)):
-            buy_signals = 0
-            sell_signals = 0
-
-            # RSI signals (30/70 levels)
-            if 'RSI' in df.columns and not pd.isna(df.iloc[i]['RSI']):
-                if df.iloc[i]['RSI'] < 30:
-                    buy_signals += 1
-                elif df.iloc[i]['RSI'] > 70:
-                    sell_signals += 1
-
-            # MACD signals
-            if all(col in df.columns for col in ['MACD', 'MACD_signal']):
-                if (not pd.isna(df.iloc[i]['MACD']) and
-                        not pd.isna(df.iloc[i]['MACD_signal'])):
-                    if (df.iloc[i]['MACD'] > df.iloc[i]['MACD_signal'] and
-                            df.iloc[i - 1]['MACD'] <= df.iloc[i - 1]['MACD_signal']):
-                        buy_signals += 1
-                    elif (df.iloc[i]['MACD'] < df.iloc[i]['MACD_signal'] and
-                          df.iloc[i - 1]['MACD'] >= df.iloc[i - 1]['MACD_signal']):
-                        sell_signals += 1
-
-            # Stochastic signals (20/80 levels)
-            if 'STOCH_K' in df.columns and not pd.isna(df.iloc[i]['STOCH_K']):
-                if df.iloc[i]['STOCH_K'] < 20:
-                    buy_signals += 1
-                elif df.iloc[i]['STOCH_K'] > 80:
-                    sell_signals += 1
-
-            # Bollinger Bands signals
-            if all(col in df.columns for col in ['close', 'BB_lower', 'BB_upper']):
-                if (not pd.isna(df.iloc[i]['close']) and
-                        not pd.isna(df.iloc[i]['BB_lower']) and
-                        not pd.isna(df.iloc[i]['BB_upper'])):
-                    if df.iloc[i]['close'] < df.iloc[i]['BB_lower']:
-                        buy_signals += 1
-                    elif df.iloc[i]['close'] > df.iloc[i]['BB_upper']:
-                        sell_signals += 1
-
-            # Moving Average Crossover (EMA12/EMA26)
-            if all(col in df.columns for col in ['EMA_12', 'EMA_26']):
-                if (not pd.isna(df.iloc[i]['EMA_12']) and
-                        not pd.isna(df.iloc[i]['EMA_26'])):
-                    if (df.iloc[i]['EMA_12'] > df.iloc[i]['EMA_26'] and
-                            df.iloc[i - 1]['EMA_12'] <= df.iloc[i - 1]['EMA_26']):
-                        buy_signals += 1
-                    elif (df.iloc[i]['EMA_12'] < df.iloc[i]['EMA_26'] and
-                          df.iloc[i - 1]['EMA_12'] >= df.iloc[i - 1]['EMA_26']):
-                        sell_signals += 1
-
-            # Determine final signal
-            if buy_signals > sell_signals:
-                signal = 'BUY'
-                strength = buy_signals - sell_signals
-            elif sell_signals > buy_signals:
-                signal = 'SELL'
-                strength = sell_signals - buy_signals
-            else:
-                signal = 'HOLD'
-                strength = 0
-
-            signals.append(signal)
-            df.at[df.index[i], 'signal_strength'] = strength
-
-        # Add signals to dataframe (skip first row)
-        if signals:
-            df.loc[df.index[1:], 'signal'] = signals
-            df.loc[df.index[0], 'signal'] = 'HOLD'
-
+        df['signal'], df['signal_strength'] = compute_signals(df, params or self.params_for())
         return df
 
     def _resample_time_frame(self, df, time_frame):
-        """Resample data to weekly or monthly timeframe"""
-        if time_frame == 'weekly':
-            # Resample to weekly data (last observation of the week)
-            resampled = df.set_index('date').resample('W-FRI').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-
-            # Recalculate indicators on weekly data
-            resampled.reset_index(inplace=True)
-            return self._calculate_all_indicators(resampled)
-
-        elif time_frame == 'monthly':
-            # Resample to monthly data
-            resampled = df.set_index('date').resample('M').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-
-            # Recalculate indicators on monthly data
-            resampled.reset_index(inplace=True)
-            return self._calculate_all_indicators(resampled)
-
-        return df
+        """Resample data to a higher timeframe (same buckets as the RollupStore) and recalculate indicators"""
+        if time_frame not in ROLLUP_TIMEFRAMES:
+            return df
+        return self._calculate_all_indicators(rollup(df, ROLLUP_TIMEFRAMES[time_frame]))
 
     def get_analysis_summary(self, df):
         """Get summary statistics of technical analysis"""
@@ -0,0 +1,79 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from config import HISTORICAL_DIR, SYMBOLS_DIR, CSV_ENCODING
+
+
+class BenchmarkDataset:
+    """A directory laid out like the project root (data/historical, data/symbols, ...)"""
+
+    def __init__(self, name, root, representative_id):
+        self.name = name
+        self.root = os.path.abspath(root)
+        self.representative_id = representative_id
+
+    def historical_path(self, crypto_id):
+        return os.path.join(self.root, HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+
+    def load_representative(self):
+        return pd.read_csv(self.historical_path(self.representative_id), encoding=CSV_ENCODING)
+
+
+def bundled_dataset(project_root, representative_id='solana'):
+    """The historical files shipped in data/historical"""
+    return BenchmarkDataset('bundled', project_root, representative_id)
+
+
+def synthetic_dataset(target_root, source_root, scale=10, seed=42):
+    """
+    Build a dataset `scale` times the bundled one.
+
+    The store holds `scale` x as many coins (for store-wide benchmarks such as CSV
+    load and search), and the representative coin has a series `scale` x as long
+    as a full bundled history of 2000 days (for per-series benchmarks). Prices follow
+    seeded geometric random walks, so every run sees identical data.
+    """
+    rng = np.random.default_rng(seed)
+    historical_dir = os.path.join(target_root, HISTORICAL_DIR)
+    symbols_dir = os.path.join(target_root, SYMBOLS_DIR)
+    shutil.rmtree(target_root, ignore_errors=True)
+    os.makedirs(historical_dir)
+    os.makedirs(symbols_dir)
+
+    source_files = [f for f in os.listdir(os.path.join(source_root, HISTORICAL_DIR))
+                    if f.endswith('_historical.csv')]
+    coin_count = len(source_files) * scale
+    typical_length = 2000
+
+    symbols = []
+    for i in range(coin_count):
+        crypto_id = f"synthetic-{i:05d}"
+        _random_walk(rng, typical_length).to_csv(
+            os.path.join(historical_dir, f"{crypto_id}_historical.csv"), index=False, encoding=CSV_ENCODING)
+        symbols.append({'id': crypto_id, 'symbol': f"SYN{i}", 'name': f"Synthetic {i}",
+                        'market_cap_rank': i + 1, 'current_price': 1.0})
+
+    _random_walk(rng, typical_length * scale).to_csv(
+        os.path.join(historical_dir, "synthetic-long_historical.csv"), index=False, encoding=CSV_ENCODING)
+    symbols.append({'id': 'synthetic-long', 'symbol': 'SYNLONG', 'name': 'Synthetic Long',
+                    'market_cap_rank': coin_count + 1, 'current_price': 1.0})
+
+    pd.DataFrame(symbols).to_csv(os.path.join(symbols_dir, "crypto_symbols_00000000_000000.csv"),
+                                 index=False, encoding=CSV_ENCODING)
+    return BenchmarkDataset(f'synthetic{scale}x', target_root, 'synthetic-long')
+
+
+def _random_walk(rng, length):
+    dates = pd.date_range(end='2025-12-31', periods=length, freq='D')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, length)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.02, length))
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + spread),
+        'low': np.minimum(open_, close) * (1 - spread),
+        'close': close,
+        'volume': rng.lognormal(12, 1, length)
+    })
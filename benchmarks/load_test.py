@@ -0,0 +1,140 @@
+"""
+HTTP load test for the production server (serve.py).
+
+    python -m benchmarks.load_test                               # 1, 2, 4 ... cpu_count workers
+    python -m benchmarks.load_test --workers 1 4 --clients 16 --duration 20
+    python -m benchmarks.load_test --url http://localhost:5000   # an already running server
+
+For each worker count serve.py is started on a spare port, then concurrent
+keep-alive clients request /api/analysis/<id> across the stored coins for
+`duration` seconds. Throughput, latency percentiles and scaling efficiency
+(throughput / (workers x single-worker throughput)) are reported.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+
+from utils.csv_manager import CSVManager
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(host, port, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request('GET', '/api/cryptos')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def start_server(workers, threads):
+    port = _free_port()
+    env = {**os.environ, 'CRYPTO_INTRADAY': '0'}
+    process = subprocess.Popen([sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}',
+                                '--workers', str(workers), '--threads', str(threads)],
+                               cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not _wait_ready('127.0.0.1', port):
+        process.kill()
+        raise RuntimeError(f"serve.py with {workers} workers did not start")
+    return process, f'http://127.0.0.1:{port}'
+
+
+def drive(url, paths, clients, duration, warmup=2.0):
+    """Run `clients` keep-alive request loops; returns (requests/s, latencies in s, errors)"""
+    target = urlparse(url)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+        i = offset
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            try:
+                conn.request('GET', paths[i % len(paths)])
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+                ok = False
+            i += clients
+            if started >= start_at:
+                with lock:
+                    if ok:
+                        latencies.append(time.monotonic() - started)
+                    else:
+                        errors[0] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / duration, np.array(latencies), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/analysis across worker counts")
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k <= cpus], cpus})
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--threads', type=int, default=2, help="request threads per worker")
+    parser.add_argument('--clients', type=int, default=None, help="concurrent clients (default 4 x workers)")
+    parser.add_argument('--duration', type=float, default=15.0, help="measured seconds per run")
+    parser.add_argument('--coins', type=int, default=50, help="distinct coins requested")
+    parser.add_argument('--url', help="test this running server instead of starting serve.py")
+    args = parser.parse_args()
+
+    paths = [f'/api/analysis/{crypto_id}' for crypto_id in CSVManager().historical_ids()[:args.coins]]
+    print(f"{cpus} CPUs, {len(paths)} coins, {args.duration:.0f}s per run\n")
+    print(f"{'workers':>8} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'scaling':>8}")
+
+    runs = [None] if args.url else args.workers
+    baseline = None
+    for workers in runs:
+        clients = args.clients or 4 * (workers or 1)
+        process = None
+        url = args.url
+        if url is None:
+            process, url = start_server(workers, args.threads)
+        try:
+            throughput, latencies, errors = drive(url, paths, clients, args.duration)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        p50, p95 = (np.percentile(latencies, [50, 95]) * 1000) if len(latencies) else (float('nan'),) * 2
+        if baseline is None and workers:
+            baseline = throughput / workers
+        scaling = f"{throughput / (workers * baseline):.0%}" if workers and baseline else '-'
+        print(f"{workers or '-':>8} {clients:>8} {throughput:>8.1f} {p50:>8.0f} {p95:>8.0f} {errors:>7} {scaling:>8}")
+
+
+if __name__ == "__main__":
+    main()
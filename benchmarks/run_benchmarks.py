@@ -0,0 +1,295 @@
+"""
+Benchmark suite for the ingest and analysis hot paths.
+
+    python -m benchmarks.run_benchmarks                      # bundled + synthetic 10x data
+    python -m benchmarks.run_benchmarks --only indicators    # benchmarks whose name contains 'indicators'
+    python -m benchmarks.run_benchmarks --compare OLD.json NEW.json
+
+Each run is written to benchmarks/results/<commit>.json so runs from different
+commits can be compared. Benchmarks whose optional dependency (pandas_ta,
+TensorFlow) is missing are recorded as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datasets import bundled_dataset, synthetic_dataset
+from config import HISTORICAL_DIR, CSV_ENCODING
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+REGRESSION_THRESHOLD = 1.10  # new/old median ratio reported as a regression
+
+BENCHMARKS = []
+WORK_DIRS = []  # scratch directories made by benchmark setups, removed when the suite ends
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def work_dir(prefix):
+    """A scratch directory for a benchmark's files, removed after the run"""
+    path = tempfile.mkdtemp(prefix=prefix)
+    WORK_DIRS.append(path)
+    return path
+
+
+def benchmark(name, repeat=5):
+    """
+    Register a benchmark. The decorated function receives the dataset, does its
+    untimed setup and returns the callable that is timed.
+    """
+    def decorator(setup):
+        BENCHMARKS.append({'name': name, 'setup': setup, 'repeat': repeat})
+        return setup
+    return decorator
+
+
+def _technical_analyzer():
+    try:
+        import pandas_ta  # noqa: F401  (TechnicalAnalyzer imports it lazily)
+        from analysis.technical_analyzer import TechnicalAnalyzer
+    except ImportError as e:
+        raise SkipBenchmark(f"pandas_ta not available: {e}")
+    return TechnicalAnalyzer()
+
+
+def _web_processor():
+    try:
+        import web_prototype
+    except ImportError as e:
+        raise SkipBenchmark(f"web_prototype not importable: {e}")
+    return web_prototype.processor
+
+
+# ---- Ingest ----
+@benchmark('csv_load_all', repeat=3)
+def bench_csv_load_all(dataset):
+    directory = os.path.join(dataset.root, HISTORICAL_DIR)
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('_historical.csv')]
+    return lambda: [pd.read_csv(f, encoding=CSV_ENCODING) for f in files]
+
+
+@benchmark('csv_load_one')
+def bench_csv_load_one(dataset):
+    path = dataset.historical_path(dataset.representative_id)
+    return lambda: pd.read_csv(path, encoding=CSV_ENCODING)
+
+
+@benchmark('save_csv_merge')
+def bench_save_csv_merge(dataset):
+    from utils.csv_manager import CSVManager
+
+    csv_manager = CSVManager()
+    existing = dataset.load_representative()
+    # A typical daily update: the last 30 days re-downloaded plus one new day
+    last = pd.Timestamp(existing['date'].iloc[-1])
+    new_rows = existing.tail(30).to_dict('records') + [
+        dict(existing.iloc[-1].to_dict(), date=(last + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))]
+    target = os.path.join(work_dir('bench_merge_'), 'merge_historical.csv')
+
+    def run():
+        existing.to_csv(target, index=False, encoding=CSV_ENCODING)
+        csv_manager._save_csv(new_rows, target, key='date')
+    return run
+
+
+# ---- Analysis ----
+def _indicator_benchmark(time_frame):
+    def setup(dataset):
+        analyzer = _technical_analyzer()
+        df = dataset.load_representative()
+        return lambda: analyzer.calculate_indicators(df, time_frame)
+    return setup
+
+
+for _time_frame in ('daily', 'weekly', 'monthly'):
+    benchmark(f'calculate_indicators_{_time_frame}')(_indicator_benchmark(_time_frame))
+
+
+@benchmark('generate_signals')
+def bench_generate_signals(dataset):
+    analyzer = _technical_analyzer()
+    df = analyzer.calculate_indicators(dataset.load_representative(), 'daily')
+    df = df.drop(columns=['signal', 'signal_strength'], errors='ignore')
+    return lambda: analyzer._generate_signals(df.copy())
+
+
+@benchmark('backtest_coin')
+def bench_backtest_coin(dataset):
+    _technical_analyzer()
+    from analysis.backtester import Backtester
+    backtester = Backtester()
+    records = dataset.load_representative().to_dict('records')
+    return lambda: backtester.backtest_coin(dataset.representative_id, records)
+
+
+@benchmark('convert_numpy_types')
+def bench_convert_numpy_types(dataset):
+    processor = _web_processor()
+    analyzer = _technical_analyzer()
+    df = analyzer.calculate_indicators(dataset.load_representative(), 'daily')
+    payload = {'analysis_data': df.to_dict('records'), 'summary': analyzer.get_analysis_summary(df)}
+    return lambda: processor._convert_numpy_types(payload)
+
+
+@benchmark('search_crypto_data', repeat=3)
+def bench_search_crypto_data(dataset):
+    processor = _web_processor()
+    term = 'syn1' if dataset.name.startswith('synthetic') else 'bit'
+    return lambda: processor.search_crypto_data(term)
+
+
+@benchmark('lstm_train_step', repeat=1)
+def bench_lstm_train_step(dataset):
+    try:
+        from analysis.lstm_predictor import LSTMPredictor
+        import tensorflow  # noqa: F401
+    except ImportError as e:
+        raise SkipBenchmark(f"TensorFlow not available: {e}")
+    records = dataset.load_representative().to_dict('records')
+    return lambda: LSTMPredictor().train_and_predict(records)
+
+
+# ---- Runner ----
+def run_suite(datasets, only=None):
+    results = []
+    for dataset in datasets:
+        previous_dir = os.getcwd()
+        os.chdir(dataset.root)  # config paths are relative to the project root
+        try:
+            for bench in BENCHMARKS:
+                if only and only not in bench['name']:
+                    continue
+                results.append(_run_one(bench, dataset))
+        finally:
+            os.chdir(previous_dir)
+    return results
+
+
+def _run_one(bench, dataset):
+    entry = {'name': bench['name'], 'dataset': dataset.name}
+    try:
+        run = bench['setup'](dataset)
+        run()  # warm-up, also surfaces errors before timing
+        timings = []
+        for _ in range(bench['repeat']):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+    except SkipBenchmark as e:
+        entry['skipped'] = str(e)
+        print(f"  {dataset.name:>14} {bench['name']:<32} skipped ({e})")
+        return entry
+    except Exception as e:
+        entry['error'] = f"{type(e).__name__}: {e}"
+        print(f"  {dataset.name:>14} {bench['name']:<32} failed ({entry['error']})")
+        return entry
+
+    entry.update({
+        'repeat': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0
+    })
+    print(f"  {dataset.name:>14} {bench['name']:<32} median {entry['median'] * 1000:10.2f} ms")
+    return entry
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def save_results(results, output=None):
+    commit = _git_commit()
+    document = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'results': results
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    return output
+
+
+def compare(old_file, new_file, threshold=REGRESSION_THRESHOLD):
+    """Print new/old median ratios; returns the number of regressions"""
+    with open(old_file, encoding='utf-8') as f:
+        old = {(r['name'], r['dataset']): r for r in json.load(f)['results'] if 'median' in r}
+    with open(new_file, encoding='utf-8') as f:
+        new = {(r['name'], r['dataset']): r for r in json.load(f)['results'] if 'median' in r}
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]['median'] / old[key]['median'] if old[key]['median'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = 'REGRESSION'
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = 'improved'
+        print(f"  {key[1]:>14} {key[0]:<32} {old[key]['median'] * 1000:10.2f} ms -> "
+              f"{new[key]['median'] * 1000:10.2f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='run only benchmarks whose name contains this text')
+    parser.add_argument('--scale', type=int, default=10, help='size of the synthetic dataset (default 10x)')
+    parser.add_argument('--no-synthetic', action='store_true', help='only benchmark the bundled data')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    datasets = [bundled_dataset(PROJECT_ROOT)]
+    synthetic_root = None
+    if not args.no_synthetic:
+        synthetic_root = tempfile.mkdtemp(prefix='bench_synthetic_')
+        print(f"Generating synthetic {args.scale}x dataset in {synthetic_root} ...")
+        datasets.append(synthetic_dataset(synthetic_root, PROJECT_ROOT, scale=args.scale))
+
+    try:
+        results = run_suite(datasets, args.only)
+    finally:
+        for path in [synthetic_root, *WORK_DIRS]:
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
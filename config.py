@@ -9,6 +9,20 @@ DATA_DIR = "data"
 SYMBOLS_DIR = os.path.join(DATA_DIR, "symbols")
 HISTORICAL_DIR = os.path.join(DATA_DIR, "historical")
 METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+QUALITY_DIR = os.path.join(DATA_DIR, "quality")
+MODELS_DIR = os.path.join(DATA_DIR, "models")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshot")  # memory-mapped candle store shared by web workers
+ROLLUP_DIR = os.path.join(DATA_DIR, "rollups")  # materialized higher-timeframe bars, kept in step with historical
+MARKET_DIR = os.path.join(DATA_DIR, "market")  # daily metrics partitions, <date>.csv with a row per coin
+SCREENER_DIR = os.path.join(DATA_DIR, "screener")  # latest indicator values per coin for /api/screen
+CHANGE_FEED_FILE = os.path.join(DATA_DIR, "changes.jsonl")  # append-only log of saved coins and date ranges
+
+# Higher-timeframe bars kept in ROLLUP_DIR: analysis time_frame -> pandas rule (fixed rules count from the epoch)
+ROLLUP_TIMEFRAMES = {'3d': '3D', 'weekly': 'W', 'monthly': 'ME', 'quarterly': 'QE'}
+
+# Metric columns kept in the MARKET_DIR partitions (after crypto_id)
+MARKET_COLUMNS = ('price', 'volume_24h', 'high_24h', 'low_24h', 'price_change_24h', 'price_change_percentage_24h',
+                  'market_cap', 'rank')
 
 # Application Settings
 MAX_CRYPTOCURRENCIES = 1000
@@ -19,6 +33,86 @@ END_DATE = datetime.now().strftime('%Y-%m-%d')
 # Request Settings
 REQUEST_TIMEOUT = 30
 RATE_LIMIT_DELAY = 7
+COINGECKO_RATE_LIMIT_DELAY = 2.5  # free tier allows roughly 30 calls per minute
+COINGECKO_MAX_DAYS = 365  # history the public CoinGecko API serves
+FETCH_HEDGE_DELAY = 15  # seconds the preferred provider gets before the next one is asked as well
+CIRCUIT_BREAKER_FAILURES = 5  # consecutive provider errors before it is skipped
+CIRCUIT_BREAKER_COOLDOWN = 300  # seconds before a tripped provider is retried
+
+# Update Scheduling
+SCHEDULER_STATE_FILE = os.path.join(DATA_DIR, "scheduler_state.json")
+PRIORITY_TOP_N = 100  # coins by market cap rank that are always refreshed first
+UPDATE_MAX_REQUESTS = None  # per-run API request budget, None for unlimited
+UPDATE_MAX_SECONDS = None  # per-run time budget, None for unlimited
+BACKFILL_MAX_DAYS = 2000  # widest date window one back-fill request may cover
+BACKFILL_RETRY_DAYS = 7  # days before a gap no provider could fill is requested again
+
+# Profiling
+PROFILING_ENABLED = os.environ.get("CRYPTO_PROFILING", "0") == "1"  # instrument classes and routes with spans
+
+# Serving
+READ_CACHE_SIZE = 256  # parsed CSV files kept in memory by CSVManager
+STATUS_CACHE_TTL = 60  # seconds between data directory rescans for /status
+ANALYSIS_TAIL_POINTS = 100  # bars returned by /api/analysis, computed from the tail of the history
+ANALYSIS_PUSH_INTERVAL = 5  # seconds between data checks for coins watched over /api/events
+SCREENER_REFRESH_SECONDS = 60  # how often queries check the change feed for coins to recompute
+SERVE_BIND = os.environ.get("CRYPTO_BIND", "0.0.0.0:5000")
+SERVE_WORKERS = int(os.environ.get("CRYPTO_WORKERS", os.cpu_count() or 1))  # pre-forked processes (gunicorn)
+SERVE_THREADS = int(os.environ.get("CRYPTO_THREADS", 8))  # request threads per worker
+# Pages push updates over /api/events only when enabled (default: with intraday mode). Every open
+# stream holds one of the worker's SERVE_THREADS request threads until the tab closes, so at most
+# EVENT_STREAMS_PER_WORKER streams are accepted and the other threads stay free for requests.
+PUSH_ENABLED = os.environ.get("CRYPTO_PUSH", os.environ.get("CRYPTO_INTRADAY", "0")) == "1"
+EVENT_STREAMS_PER_WORKER = int(os.environ.get("CRYPTO_EVENT_STREAMS", max(1, SERVE_THREADS // 2)))
+
+# Background Jobs
+JOBS_DB = os.path.join(DATA_DIR, "jobs.db")
+JOB_WORKERS = 2  # process pool size for LSTM training jobs
+JOB_RESULT_TTL = 3600  # seconds a finished job result is kept and reused
+JOB_LEASE_SECONDS = 60  # a running job whose worker has not renewed its lease this long is failed
+ALERTS_DB = os.path.join(DATA_DIR, "alerts.db")  # alert rules, per-rule coin state and the outbox of fired alerts
+ALERT_BATCH_SIZE = 500  # coins per SQLite state lookup when evaluating alert rules
+LSTM_MODEL_MAX_AGE_DAYS = 7  # exported weights older than this trigger a retraining job
+GLOBAL_LSTM_PATH = os.path.join(MODELS_DIR, "global_lstm.npz")  # shared multi-coin model export
+GLOBAL_LSTM_DIR = os.path.join(MODELS_DIR, "global")  # checkpoints and per-coin metrics
+GLOBAL_LSTM_EPOCHS = 10
+GLOBAL_LSTM_EMBEDDING_DIM = 8  # 0 disables the coin embedding
+GLOBAL_LSTM_BATCH_SIZE = 256
+GLOBAL_LSTM_TRAIN = os.environ.get("CRYPTO_TRAIN_GLOBAL", "0") == "1"  # retrain it as the last pipeline stage
+
+# Backtesting & Parameter Sweeps
+INDICATOR_PARAMS_FILE = os.path.join(DATA_DIR, "indicator_params.csv")  # TechnicalAnalyzer settings table
+SWEEP_DIR = os.path.join(DATA_DIR, "sweeps")  # sweep results and per-coin result cache
+BACKTEST_DIR = os.path.join(DATA_DIR, "backtests")
+BACKTEST_TRAIN_DAYS = 365  # in-sample span before each walk-forward test window (covers SMA_200 warm-up)
+BACKTEST_TEST_DAYS = 90  # length of each out-of-sample window
+BACKTEST_FEE_BPS = 10  # cost per unit of position change, in basis points
+BACKTEST_CANDIDATES = 30  # sampled sweep parameter sets refit on each walk-forward in-sample window
+
+# Correlation
+CORRELATION_DIR = os.path.join(DATA_DIR, "correlation")
+CORRELATION_WINDOW = 90  # days of daily returns in the correlation window
+CORRELATION_MIN_OVERLAP = 30  # common return days required before a pair gets a value
+CORRELATION_MAX_GAP = 4  # days between bars whose return is still spread over them (4-day candles)
+CORRELATION_CLUSTER_DISTANCE = 0.3  # linkage cut, sqrt((1 - corr) / 2); 0.3 ~ correlation 0.82
+CORRELATION_REFRESH_SECONDS = 300  # how often the web process checks the store for new days
+
+# Risk
+RISK_DIR = os.path.join(DATA_DIR, "risk")  # latest risk metrics of every coin, served by /api/risk
+RISK_WINDOW = 90  # days of daily returns in each volatility / VaR / beta window
+RISK_MIN_OBSERVATIONS = 20  # returns a window needs before its metrics are reported
+RISK_VAR_LEVEL = 0.95  # confidence of historical VaR and CVaR
+RISK_BENCHMARK = "bitcoin"  # beta is measured against this coin's daily returns
+RISK_REFRESH_SECONDS = 300  # how often the web process checks the change feed for new candles
+
+# Intraday
+INTRADAY_ENABLED = os.environ.get("CRYPTO_INTRADAY", "0") == "1"  # poll intraday bars in the web process
+INTRADAY_SOURCE = os.environ.get("CRYPTO_INTRADAY_SOURCE", "cryptocompare")  # or 'replay' for stored candles
+INTRADAY_INTERVAL = 'minute'  # 'minute' (histominute) or 'hour' (histohour)
+INTRADAY_CAPACITY = 1440  # bars kept in memory per coin (one day of minutes)
+INTRADAY_TOP_N = 100  # coins polled, by market cap rank
+INTRADAY_POLL_SECONDS = 60
+INTRADAY_RATE_LIMIT_DELAY = 0.25  # seconds between intraday API calls
 
 # CSV Configuration
 CSV_ENCODING = 'utf-8'
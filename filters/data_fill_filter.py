@@ -4,13 +4,23 @@ from config import RATE_LIMIT_DELAY
 
 
 class DataFillFilter:
-    def __init__(self, csv_manager, data_fetch_strategy):
+    # download_historical_data + download_current_metrics
+    REQUESTS_PER_COIN = 2
+
+    def __init__(self, csv_manager, data_fetch_strategy, update_scheduler=None, rate_limit_delay=RATE_LIMIT_DELAY,
+                 quality_filter=None):
         """
         :param csv_manager: object responsible for saving data
         :param data_fetch_strategy: instance of a class implementing DataFetchStrategy
+        :param update_scheduler: optional UpdateSchedulerStrategy that orders and budgets the run
+        :param rate_limit_delay: pause between coins; 0 when the fetch strategy paces itself
+        :param quality_filter: optional DataQualityFilter that cleans candles before they are saved
         """
         self.csv_manager = csv_manager
         self.fetch_strategy = data_fetch_strategy  # the Strategy pattern here
+        self.update_scheduler = update_scheduler
+        self.rate_limit_delay = rate_limit_delay
+        self.quality_filter = quality_filter
         self.logger = logging.getLogger(__name__)
 
     def process(self, crypto_date_info):
@@ -20,10 +30,18 @@ class DataFillFilter:
         processed_count = 0
         success_count = 0
 
+        if self.update_scheduler:
+            crypto_date_info = self.update_scheduler.schedule(crypto_date_info)
+
         for crypto_info in crypto_date_info:
             if crypto_info['needs_update']:
+                if self.update_scheduler and self.update_scheduler.budget_exhausted():
+                    self.logger.info("Update budget exhausted, remaining coins deferred to the next run")
+                    break
+
                 crypto = crypto_info['crypto']
                 last_date = crypto_info['last_date']
+                succeeded = False
 
                 try:
                     self.logger.info(f"Processing {crypto['id']} - {crypto['name']}")
@@ -37,6 +55,11 @@ class DataFillFilter:
                         crypto['symbol']
                     )
 
+                    if historical_data and self.quality_filter:
+                        historical_data, _ = self.quality_filter.validate(
+                            crypto['id'], historical_data, last_date
+                        )
+
                     # Save results
                     if historical_data:
                         self.csv_manager.save_historical_data(crypto['id'], historical_data)
@@ -46,12 +69,22 @@ class DataFillFilter:
                         self.csv_manager.save_daily_metrics(crypto['id'], current_metrics)
 
                     success_count += 1
+                    succeeded = bool(historical_data or current_metrics)
 
                 except Exception as e:
                     self.logger.error(f"Error processing {crypto['id']}: {e}")
 
+                if self.update_scheduler:
+                    self.update_scheduler.record_result(crypto['id'], succeeded, self.REQUESTS_PER_COIN)
+
                 processed_count += 1
-                time.sleep(RATE_LIMIT_DELAY)
+                if self.rate_limit_delay:
+                    time.sleep(self.rate_limit_delay)
+
+        if self.update_scheduler:
+            self.update_scheduler.finish_run()
+        if self.quality_filter:
+            self.quality_filter.save_report()
 
         self.logger.info(f"Data fill completed: {success_count} successful")
         return {'processed_count': processed_count, 'success_count': success_count}
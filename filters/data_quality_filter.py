@@ -0,0 +1,135 @@
+import logging
+import os
+import pandas as pd
+from config import HISTORICAL_DIR, CSV_ENCODING
+from utils.metrics import PIPELINE_STAGE_ITEMS
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+class DataQualityFilter:
+    """
+    Validates candles between DataFillFilter and CSVManager so only clean rows are stored.
+
+    - drops placeholder candles (all prices zero/missing) and rows with missing prices
+    - flags OHLC inconsistencies (high < low, open/close outside [low, high])
+    - detects missing days inside the series
+    Every validated coin adds a row to the run's quality report.
+    """
+
+    def __init__(self, csv_manager):
+        self.csv_manager = csv_manager
+        self.logger = logging.getLogger(__name__)
+        self.report = []
+
+    def validate(self, crypto_id, records, last_date=None):
+        """Return (clean records, report row) for one coin's batch of candles"""
+        df = pd.DataFrame(records)
+        if df.empty or not set(PRICE_COLUMNS).issubset(df.columns):
+            return records, None
+
+        df, report = self._clean_frame(df, last_date)
+        PIPELINE_STAGE_ITEMS.inc('quality', amount=report['rows_in'])
+        report = {'crypto_id': crypto_id, **report}
+        self.report.append(report)
+
+        if report['inconsistent_rows']:
+            self.logger.warning(f"{crypto_id}: {report['inconsistent_rows']} candles with inconsistent OHLC")
+        if report['gap_days']:
+            self.logger.warning(f"{crypto_id}: {report['gap_days']} missing days in {report['gap_ranges']}")
+
+        return df.to_dict('records'), report
+
+    def _clean_frame(self, df, last_date=None):
+        """Vectorized cleaning of one coin's candles"""
+        df = df.copy()
+        df['date'] = df['date'].astype(str)
+        df = df.sort_values('date').drop_duplicates(subset=['date'], keep='last')
+        for col in PRICE_COLUMNS + ['volume']:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        prices = df[PRICE_COLUMNS]
+        placeholder = (prices.fillna(0) == 0).all(axis=1)
+        leading = int(placeholder.cummin().sum())
+        missing_prices = prices.isna().any(axis=1) & ~placeholder
+
+        df = df[~(placeholder | missing_prices)]
+        missing_volume = int(df['volume'].isna().sum()) if 'volume' in df.columns else 0
+
+        inconsistent = ((df['high'] < df['low']) |
+                        (df['close'] > df['high']) | (df['close'] < df['low']) |
+                        (df['open'] > df['high']) | (df['open'] < df['low']))
+
+        gap_ranges, gap_days = self._find_gaps(df['date'], last_date)
+
+        report = {
+            'rows_in': len(prices),
+            'rows_out': len(df),
+            'leading_placeholders': leading,
+            'other_placeholders': int(placeholder.sum()) - leading,
+            'missing_price_rows': int(missing_prices.sum()),
+            'missing_volume_rows': missing_volume,
+            'inconsistent_rows': int(inconsistent.sum()),
+            'gap_days': gap_days,
+            'gap_ranges': ';'.join(f"{start}:{end}" for start, end in gap_ranges)
+        }
+        return df, report
+
+    @staticmethod
+    def _find_gaps(dates, last_date=None):
+        """Return ([(first missing day, last missing day)], number of missing days)"""
+        days = pd.to_datetime(dates)
+        if last_date:
+            days = pd.concat([pd.Series([pd.Timestamp(last_date)]), days.reset_index(drop=True)])
+        days = days.reset_index(drop=True)
+        if len(days) < 2:
+            return [], 0
+
+        step = days.diff().dt.days
+        gap_ends = step > 1
+        starts = days.shift(1)[gap_ends] + pd.Timedelta(days=1)
+        ends = days[gap_ends] - pd.Timedelta(days=1)
+        ranges = [(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in zip(starts, ends)]
+        return ranges, int((step[gap_ends] - 1).sum())
+
+    def save_report(self):
+        """Write the quality report collected during this run and start a new one"""
+        if not self.report:
+            return None
+        filename = self.csv_manager.save_quality_report(self.report)
+        self.report = []
+        return filename
+
+    def clean_store(self):
+        """One-off migration: validate and rewrite every stored historical file"""
+        cleaned = 0
+        for file in sorted(os.listdir(HISTORICAL_DIR)):
+            if not file.endswith('_historical.csv'):
+                continue
+            crypto_id = file[:-len('_historical.csv')]
+            try:
+                df = pd.read_csv(os.path.join(HISTORICAL_DIR, file), encoding=CSV_ENCODING)
+            except Exception as e:
+                self.logger.error(f"Error reading {file}: {e}")
+                continue
+            if df.empty or not set(PRICE_COLUMNS).issubset(df.columns):
+                continue
+
+            clean_df, report = self._clean_frame(df)
+            self.report.append({'crypto_id': crypto_id, **report})
+
+            if report['rows_out'] != report['rows_in']:
+                self.csv_manager.write_historical_data(crypto_id, clean_df)
+                cleaned += 1
+
+        self.logger.info(f"Quality migration rewrote {cleaned} historical files")
+        return self.save_report()
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report_file = DataQualityFilter(CSVManager()).clean_store()
+    print(f"Quality report: {report_file}")
@@ -0,0 +1,220 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from config import (HISTORICAL_DIR, QUALITY_DIR, CSV_ENCODING, START_DATE, BACKFILL_MAX_DAYS,
+                    BACKFILL_RETRY_DAYS, RATE_LIMIT_DELAY, COINGECKO_RATE_LIMIT_DELAY)
+
+
+class GapFillFilter:
+    """
+    Finds missing days inside the stored historical series and back-fills them in bulk.
+
+    scan() builds one date-presence bitmap (coins x days) over the tracked range and
+    extracts every run of missing days with a single vectorized pass. plan() merges
+    each coin's runs into as few fetch windows as the provider allows per request.
+
+    Some gaps cannot be filled: legacy multi-day candles leave the days between
+    bars empty, and deleted placeholder days have no real candle anywhere. A gap
+    that a request returned nothing for is recorded in UNFILLABLE_FILE and left
+    out of the scan for `retry_days`, so every run does not request it again.
+    """
+
+    UNFILLABLE_FILE = os.path.join(QUALITY_DIR, 'unfillable_gaps.csv')
+
+    def __init__(self, csv_manager, data_fetch_strategy=None, quality_filter=None,
+                 max_window_days=BACKFILL_MAX_DAYS, retry_days=BACKFILL_RETRY_DAYS):
+        self.csv_manager = csv_manager
+        self.fetch_strategy = data_fetch_strategy
+        self.quality_filter = quality_filter
+        self.max_window_days = max_window_days
+        self.retry_days = retry_days
+        self.logger = logging.getLogger(__name__)
+
+    # ---- Unfillable gaps ----
+    def _load_unfillable(self):
+        """Recorded unfillable gaps (crypto_id, start_date, end_date, tried) still within retry_days"""
+        columns = ['crypto_id', 'start_date', 'end_date', 'tried']
+        try:
+            recorded = pd.read_csv(self.UNFILLABLE_FILE, dtype=str, encoding=CSV_ENCODING)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return pd.DataFrame(columns=columns)
+        cutoff = (pd.Timestamp.now().normalize() - pd.Timedelta(days=self.retry_days)).strftime('%Y-%m-%d')
+        return recorded.loc[recorded['tried'] > cutoff, columns]
+
+    def _record_unfillable(self, gaps):
+        """Remember gaps a request returned nothing for"""
+        if gaps.empty:
+            return
+        tried = gaps[['crypto_id', 'start_date', 'end_date']].assign(tried=pd.Timestamp.now().strftime('%Y-%m-%d'))
+        recorded = pd.concat([self._load_unfillable(), tried]).drop_duplicates(
+            subset=['crypto_id', 'start_date', 'end_date'], keep='last')
+        self.csv_manager._write_csv(recorded, self.UNFILLABLE_FILE)
+
+    # ---- Scan ----
+    def _load_dates(self):
+        """Return {crypto_id: sorted day numbers (days since epoch)} for every historical file"""
+        dates = {}
+        for file in sorted(os.listdir(HISTORICAL_DIR)):
+            if not file.endswith('_historical.csv'):
+                continue
+            path = os.path.join(HISTORICAL_DIR, file)
+            try:
+                column = pd.read_csv(path, usecols=['date', 'close'], encoding=CSV_ENCODING)['date']
+            except Exception:
+                # Not a candle file, e.g. exchange snapshots stored next to the candles
+                continue
+            days = pd.to_datetime(column, errors='coerce').dropna()
+            if not days.empty:
+                dates[file[:-len('_historical.csv')]] = np.unique(
+                    days.to_numpy().astype('datetime64[D]').astype(np.int64))
+        return dates
+
+    def scan(self):
+        """Return a DataFrame of missing ranges: crypto_id, start_date, end_date, days"""
+        dates = self._load_dates()
+        columns = ['crypto_id', 'start_date', 'end_date', 'days']
+        if not dates:
+            return pd.DataFrame(columns=columns)
+
+        tracked_start = np.datetime64(START_DATE, 'D').astype(np.int64)
+        first_day = max(min(int(d[0]) for d in dates.values()), tracked_start)
+        last_day = max(int(d[-1]) for d in dates.values())
+        coin_ids = list(dates)
+
+        # Date-presence bitmap: one row per coin, one column per tracked day
+        present = np.zeros((len(coin_ids), last_day - first_day + 1), dtype=bool)
+        rows = np.repeat(np.arange(len(coin_ids)), [len(d) for d in dates.values()])
+        days = np.concatenate(list(dates.values())) - first_day
+        in_range = days >= 0
+        present[rows[in_range], days[in_range]] = True
+
+        # Only days between a coin's first and last stored candle count as missing
+        has_data = present.any(axis=1)
+        first = np.where(has_data, present.argmax(axis=1), present.shape[1])
+        last = np.where(has_data, present.shape[1] - 1 - present[:, ::-1].argmax(axis=1), -1)
+        day_index = np.arange(present.shape[1])
+        missing = (~present) & (day_index >= first[:, None]) & (day_index <= last[:, None])
+
+        # Gaps recently found unfillable are not requested again until retry_days pass
+        row_of = {crypto_id: row for row, crypto_id in enumerate(coin_ids)}
+        unfillable = self._load_unfillable()
+        for crypto_id, start, end in zip(unfillable['crypto_id'], unfillable['start_date'], unfillable['end_date']):
+            if crypto_id in row_of:
+                start = max(int(np.datetime64(start, 'D').astype(np.int64)) - first_day, 0)
+                end = int(np.datetime64(end, 'D').astype(np.int64)) - first_day
+                missing[row_of[crypto_id], start:end + 1] = False
+
+        # Run boundaries of the missing mask, for all coins at once
+        padded = np.zeros((missing.shape[0], missing.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = missing
+        edges = np.diff(padded, axis=1)
+        start_rows, start_cols = np.nonzero(edges == 1)
+        _, end_cols = np.nonzero(edges == -1)
+
+        gaps = pd.DataFrame({
+            'crypto_id': np.asarray(coin_ids, dtype=object)[start_rows],
+            'start_date': (start_cols + first_day).astype('datetime64[D]').astype(str),
+            'end_date': (end_cols - 1 + first_day).astype('datetime64[D]').astype(str),
+            'days': end_cols - start_cols
+        }, columns=columns)
+
+        self.logger.info(f"Gap scan: {len(gaps)} ranges, {int(gaps['days'].sum())} missing days "
+                         f"across {gaps['crypto_id'].nunique()}/{len(coin_ids)} coins")
+        return gaps
+
+    def plan(self, gaps):
+        """Merge each coin's gaps into fetch windows spanning at most max_window_days"""
+        windows = []
+        for crypto_id, coin_gaps in gaps.groupby('crypto_id', sort=False):
+            window = None
+            for start, end in zip(coin_gaps['start_date'], coin_gaps['end_date']):
+                if window and (pd.Timestamp(end) - pd.Timestamp(window['start_date'])).days < self.max_window_days:
+                    window['end_date'] = end
+                    window['gaps'] += 1
+                    continue
+                window = {'crypto_id': crypto_id, 'start_date': start, 'end_date': end, 'gaps': 1}
+                windows.append(window)
+        return windows
+
+    # ---- Back-fill ----
+    def process(self, input_data=None):
+        """Scan the store and back-fill every gap with bulk range requests"""
+        gaps = self.scan()
+        if gaps.empty:
+            return {'gap_ranges': 0, 'requests': 0, 'filled_days': 0}
+
+        self.csv_manager.save_quality_report(gaps.to_dict('records'), name='gap_report',
+                                             key=['crypto_id', 'start_date'])
+        symbols = {s['id']: s['symbol'] for s in self.csv_manager.load_symbols()}
+        windows = self.plan(gaps)
+
+        filled_days = 0
+        unfilled = []
+        for window in windows:
+            crypto_id = window['crypto_id']
+            symbol = symbols.get(crypto_id)
+            if not symbol:
+                self.logger.warning(f"No symbol known for {crypto_id}, skipping back-fill")
+                continue
+
+            missing = gaps[(gaps['crypto_id'] == crypto_id) & (gaps['start_date'] >= window['start_date'])
+                           & (gaps['end_date'] <= window['end_date'])]
+            missing_dates = set()
+            for start, end in zip(missing['start_date'], missing['end_date']):
+                missing_dates.update(pd.date_range(start, end).strftime('%Y-%m-%d'))
+
+            records = self.fetch_strategy.download_historical_range(
+                symbol, window['start_date'], window['end_date']
+            )
+            records = [r for r in records if r['date'] in missing_dates]
+            if records and self.quality_filter:
+                # The day before the window is the stored candle the first gap starts after
+                last_date = (pd.Timestamp(window['start_date']) - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+                records, _ = self.quality_filter.validate(crypto_id, records, last_date)
+            if records:
+                self.csv_manager.save_historical_data(crypto_id, records)
+                filled_days += len(records)
+
+            # Gaps without a single returned day; partly filled ones are rescanned next run
+            filled = pd.to_datetime([r['date'] for r in records]) if records else pd.DatetimeIndex([])
+            starts, ends = pd.to_datetime(missing['start_date']), pd.to_datetime(missing['end_date'])
+            untouched = [not ((filled >= s) & (filled <= e)).any() for s, e in zip(starts, ends)]
+            unfilled.append(missing[untouched])
+
+        if unfilled:
+            self._record_unfillable(pd.concat(unfilled))
+        if self.quality_filter:
+            self.quality_filter.save_report()
+
+        self.logger.info(f"Back-fill completed: {filled_days} days filled with {len(windows)} requests")
+        return {'gap_ranges': len(gaps), 'requests': len(windows), 'filled_days': filled_days}
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    gap_filter = GapFillFilter(CSVManager())
+
+    if '--fill' not in sys.argv:
+        started = time.perf_counter()
+        found = gap_filter.scan()
+        print(found.to_string(index=False))
+        print(f"{len(found)} ranges in {len(gap_filter.plan(found))} fetch windows "
+              f"(scan took {time.perf_counter() - started:.2f}s); run with --fill to back-fill")
+    else:
+        from filters.data_quality_filter import DataQualityFilter
+        from filters.strategies.crypto_compare_strategy import CryptoCompareStrategy
+        from filters.strategies.coingecko_strategy import CoinGeckoStrategy
+        from filters.strategies.composite_fetch_strategy import CompositeFetchStrategy, FetchProvider
+
+        gap_filter.fetch_strategy = CompositeFetchStrategy([
+            FetchProvider('CryptoCompare', CryptoCompareStrategy(rate_limit_delay=0), RATE_LIMIT_DELAY),
+            FetchProvider('CoinGecko', CoinGeckoStrategy(gap_filter.csv_manager, rate_limit_delay=0),
+                          COINGECKO_RATE_LIMIT_DELAY)
+        ])
+        gap_filter.quality_filter = DataQualityFilter(gap_filter.csv_manager)
+        print(gap_filter.process())
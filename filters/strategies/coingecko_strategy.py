@@ -0,0 +1,168 @@
+import requests
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from config import COINGECKO_API_URL, COINGECKO_RATE_LIMIT_DELAY, COINGECKO_MAX_DAYS, REQUEST_TIMEOUT
+from filters.strategies.data_fetch_strategy import DataFetchStrategy
+
+
+class CoinGeckoStrategy(DataFetchStrategy):
+    """
+    Concrete strategy that fetches daily data from CoinGecko's market_chart endpoint.
+
+    market_chart only returns price points, so candles are derived from them:
+    see _build_candles.
+    CoinGecko addresses coins by id rather than symbol; the mapping is taken from
+    the latest symbols file unless one is passed in.
+    """
+
+    def __init__(self, csv_manager=None, symbol_map=None, rate_limit_delay=COINGECKO_RATE_LIMIT_DELAY):
+        self.csv_manager = csv_manager
+        self.symbol_map = symbol_map
+        self.rate_limit_delay = rate_limit_delay
+        self.logger = logging.getLogger(__name__)
+
+    def _coin_id(self, symbol):
+        if self.symbol_map is None:
+            symbols = self.csv_manager.load_symbols() if self.csv_manager else []
+            self.symbol_map = {s['symbol'].upper(): s['id'] for s in symbols}
+        return self.symbol_map.get(symbol.upper())
+
+    def download_historical_data(self, symbol, last_date):
+        """Download daily historical data from CoinGecko"""
+        try:
+            return self.fetch_historical_data(symbol, last_date)
+        except Exception as e:
+            self.logger.error(f"Error fetching CoinGecko data for {symbol}: {e}")
+            return []
+
+    def fetch_historical_data(self, symbol, last_date):
+        """Like download_historical_data, but network and API errors are raised"""
+        coin_id = self._coin_id(symbol)
+        if not coin_id:
+            self.logger.warning(f"No CoinGecko id known for {symbol}")
+            return []
+
+        days = COINGECKO_MAX_DAYS  # new coins get what the public API serves; older history fails the call
+        if last_date:
+            # One extra day so the first new candle still gets its open from the previous close
+            days = min((datetime.now() - datetime.strptime(last_date, '%Y-%m-%d')).days + 1, COINGECKO_MAX_DAYS)
+
+        url = f"{COINGECKO_API_URL}/coins/{coin_id}/market_chart"
+        params = {"vs_currency": "usd", "days": days, "interval": "daily"}
+
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+
+        formatted = [candle for candle in self._build_candles(data)
+                     if not last_date or candle["date"] > last_date]
+
+        if self.rate_limit_delay:
+            time.sleep(self.rate_limit_delay)
+        return formatted
+
+    def download_historical_range(self, symbol, start_date, end_date):
+        """Download daily candles for start_date..end_date from CoinGecko"""
+        try:
+            return self.fetch_historical_range(symbol, start_date, end_date)
+        except Exception as e:
+            self.logger.error(f"Error fetching CoinGecko range for {symbol}: {e}")
+            return []
+
+    def fetch_historical_range(self, symbol, start_date, end_date):
+        """Like download_historical_range, but network and API errors are raised"""
+        coin_id = self._coin_id(symbol)
+        if not coin_id:
+            self.logger.warning(f"No CoinGecko id known for {symbol}")
+            return []
+
+        # Start one day early so the first candle gets its open from the previous close
+        start = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=timezone.utc) - timedelta(days=1)
+        end = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+        start = max(start, datetime.now(timezone.utc) - timedelta(days=COINGECKO_MAX_DAYS - 1))
+        if start >= end:
+            return []  # older than the public API serves
+
+        url = f"{COINGECKO_API_URL}/coins/{coin_id}/market_chart/range"
+        params = {"vs_currency": "usd", "from": int(start.timestamp()), "to": int(end.timestamp())}
+
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        formatted = [candle for candle in self._build_candles(response.json())
+                     if start_date <= candle["date"] <= end_date]
+
+        if self.rate_limit_delay:
+            time.sleep(self.rate_limit_delay)
+        return formatted
+
+    def _build_candles(self, data):
+        """
+        Aggregate market_chart price points into daily candles.
+
+        Each day opens at the previous day's last price, closes at its own last
+        price and spans every point in between (short ranges are hourly, longer
+        ones have one point per day plus the live price for today).
+        """
+        volumes = {}
+        for timestamp, volume in data.get("total_volumes", []):
+            volumes[self._day(timestamp)] = volume
+
+        points_by_day = {}
+        for timestamp, price in data.get("prices", []):
+            points_by_day.setdefault(self._day(timestamp), []).append(price)
+
+        candles = []
+        previous_close = None
+        for date, points in points_by_day.items():
+            open_price = previous_close if previous_close is not None else points[0]
+            close = points[-1]
+            candles.append({
+                "date": date,
+                "open": open_price,
+                "high": max(open_price, *points),
+                "low": min(open_price, *points),
+                "close": close,
+                # total_volumes is quoted in USD; store base-currency volume like CryptoCompare
+                "volume": volumes.get(date, 0) / close if close else 0
+            })
+            previous_close = close
+        return candles
+
+    def download_current_metrics(self, symbol):
+        """Download current market data (CoinGecko)"""
+        try:
+            return self.fetch_current_metrics(symbol)
+        except Exception as e:
+            self.logger.error(f"Error fetching CoinGecko metrics for {symbol}: {e}")
+            return None
+
+    def fetch_current_metrics(self, symbol):
+        """Like download_current_metrics, but network and API errors are raised"""
+        coin_id = self._coin_id(symbol)
+        if not coin_id:
+            return None
+
+        url = f"{COINGECKO_API_URL}/coins/markets"
+        params = {"vs_currency": "usd", "ids": coin_id}
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        data = response.json()
+        if not data:
+            return None
+        coin_info = data[0]
+
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "price": coin_info.get("current_price"),
+            "volume_24h": coin_info.get("total_volume"),
+            "high_24h": coin_info.get("high_24h"),
+            "low_24h": coin_info.get("low_24h"),
+            "market_cap": coin_info.get("market_cap")
+        }
+
+    @staticmethod
+    def _day(timestamp_ms):
+        return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
@@ -0,0 +1,109 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import REQUEST_TIMEOUT, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_COOLDOWN, FETCH_HEDGE_DELAY
+from filters.strategies.data_fetch_strategy import DataFetchStrategy, is_placeholder_candle
+from utils.rate_limiter import RateLimiter, CircuitBreaker
+from utils.profiler import SpanProfiler, propagate_context
+
+
+class FetchProvider:
+    """A DataFetchStrategy together with its own rate-limit budget and circuit breaker"""
+
+    def __init__(self, name, strategy, min_interval,
+                 failure_threshold=CIRCUIT_BREAKER_FAILURES, cooldown=CIRCUIT_BREAKER_COOLDOWN):
+        self.name = name
+        self.strategy = strategy
+        self.rate_limiter = RateLimiter(min_interval)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, cooldown)
+
+    def call(self, method_name, *args):
+        """Call one of the strategy's raising fetch_* methods inside the provider's budget"""
+        self.rate_limiter.acquire()
+        try:
+            with SpanProfiler().span(f"{self.name}.{method_name}"):
+                result = getattr(self.strategy, method_name)(*args)
+        except Exception:
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return result
+
+
+class CompositeFetchStrategy(DataFetchStrategy):
+    """
+    Hedged requests across providers listed in order of preference.
+
+    The preferred provider is asked first; the next one is asked as well when it
+    fails, or when nothing usable has arrived after `hedge_delay` seconds. The
+    first valid response wins and the remaining calls are cancelled (if not yet
+    started) or ignored. Providers are listed best first: CryptoCompare returns
+    real OHLC candles, while CoinGecko's are synthesized (open = previous close,
+    high/low only bound open and close), so a healthy preferred provider keeps
+    the lower-ranked ones from being called at all.
+
+    A historical response is valid once its placeholder (all-zero) candles are dropped
+    and something is left, so a provider that only knows zeros for a coin falls back
+    to the next one. Providers whose circuit breaker is open are skipped.
+    """
+
+    def __init__(self, providers, timeout=REQUEST_TIMEOUT * 2, hedge_delay=FETCH_HEDGE_DELAY):
+        self.providers = providers
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.executor = ThreadPoolExecutor(max_workers=max(len(providers), 1),
+                                           thread_name_prefix='fetch-provider')
+        self.logger = logging.getLogger(__name__)
+
+    def download_historical_data(self, symbol, last_date):
+        result = self._first_valid('fetch_historical_data', (symbol, last_date), self._clean_historical)
+        return result or []
+
+    def download_historical_range(self, symbol, start_date, end_date):
+        result = self._first_valid('fetch_historical_range', (symbol, start_date, end_date),
+                                   self._clean_historical)
+        return result or []
+
+    def download_current_metrics(self, symbol):
+        return self._first_valid('fetch_current_metrics', (symbol,), lambda metrics: metrics or None)
+
+    @staticmethod
+    def _clean_historical(records):
+        return [record for record in records or [] if not is_placeholder_candle(record)]
+
+    def _first_valid(self, method_name, args, validate):
+        available = [p for p in self.providers if p.circuit_breaker.allow_request()]
+        if not available:
+            self.logger.warning(f"All providers are unavailable (circuit open) for {args[0]}")
+            return None
+
+        deadline = time.monotonic() + self.timeout
+        waiting = list(available)
+        pending = {}  # future -> provider
+        try:
+            while waiting or pending:
+                if waiting:
+                    provider = waiting.pop(0)
+                    pending[self.executor.submit(propagate_context(provider.call), method_name, *args)] = provider
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=min(remaining, self.hedge_delay) if waiting else remaining,
+                               return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: available.index(pending[f])):
+                    provider = pending.pop(future)
+                    try:
+                        result = validate(future.result())
+                    except Exception as e:
+                        self.logger.warning(f"{provider.name} failed for {args[0]}: {e}")
+                        continue
+                    if result:
+                        self.logger.info(f"Using {provider.name} response for {args[0]}")
+                        return result
+                    self.logger.info(f"{provider.name} returned no usable data for {args[0]}")
+        finally:
+            for future in pending:
+                future.cancel()  # calls already running finish in the background and are ignored
+        if pending:
+            self.logger.warning(f"{', '.join(p.name for p in pending.values())} timed out for {args[0]}")
+        return None
@@ -1,70 +1,165 @@
 import requests
 import logging
 import time
-from datetime import datetime
-from config import RATE_LIMIT_DELAY
+from datetime import datetime, timedelta, timezone
+from config import RATE_LIMIT_DELAY, REQUEST_TIMEOUT
 from filters.strategies.data_fetch_strategy import DataFetchStrategy
 
 
 class CryptoCompareStrategy(DataFetchStrategy):
-    def __init__(self):
+    MAX_HISTODAY_LIMIT = 2000
+
+    def __init__(self, rate_limit_delay=RATE_LIMIT_DELAY, page_delay=RATE_LIMIT_DELAY):
+        self.rate_limit_delay = rate_limit_delay
+        self.page_delay = page_delay  # between the requests of one paged call, which no caller paces
         self.logger = logging.getLogger(__name__)
 
     def download_historical_data(self, symbol, last_date):
         """Download long-term historical data from CryptoCompare"""
         try:
+            return self.fetch_historical_data(symbol, last_date)
+        except Exception as e:
+            self.logger.error(f"Error fetching CryptoCompare data for {symbol}: {e}")
+            return []
+
+    def fetch_historical_data(self, symbol, last_date):
+        """Like download_historical_data, but network and API errors are raised"""
+        url = "https://min-api.cryptocompare.com/data/v2/histoday"
+        params = {"fsym": symbol.upper(), "tsym": "USD", "limit": self.MAX_HISTODAY_LIMIT}
+
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+
+        if data.get("Response") != "Success":
+            self.logger.warning(f"No historical data for {symbol}")
+            return []
+
+        formatted = []
+        for record in data["Data"]["Data"]:
+            date = datetime.utcfromtimestamp(record["time"]).strftime("%Y-%m-%d")
+            if last_date and date <= last_date:
+                continue
+            formatted.append({
+                "date": date,
+                "open": record["open"],
+                "high": record["high"],
+                "low": record["low"],
+                "close": record["close"],
+                "volume": record["volumefrom"]
+            })
+
+        if self.rate_limit_delay:
+            time.sleep(self.rate_limit_delay)
+        return formatted
+
+    def download_historical_range(self, symbol, start_date, end_date):
+        """Download daily candles for start_date..end_date from CryptoCompare"""
+        try:
+            return self.fetch_historical_range(symbol, start_date, end_date)
+        except Exception as e:
+            self.logger.error(f"Error fetching CryptoCompare range for {symbol}: {e}")
+            return []
+
+    def fetch_historical_range(self, symbol, start_date, end_date):
+        """Like download_historical_range, but network and API errors are raised"""
+        end = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        days = (end - datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)).days
+
+        formatted = []
+        # histoday returns at most MAX_HISTODAY_LIMIT + 1 candles ending at toTs
+        while days >= 0:
+            limit = min(days, self.MAX_HISTODAY_LIMIT)
             url = "https://min-api.cryptocompare.com/data/v2/histoday"
-            params = {"fsym": symbol.upper(), "tsym": "USD", "limit": 2000}
+            params = {"fsym": symbol.upper(), "tsym": "USD", "limit": limit, "toTs": int(end.timestamp())}
 
-            response = requests.get(url, params=params, timeout=30)
+            response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             data = response.json()
 
             if data.get("Response") != "Success":
-                self.logger.warning(f"No historical data for {symbol}")
-                return []
+                self.logger.warning(f"No historical data for {symbol} before {end:%Y-%m-%d}")
+                break
 
-            formatted = []
             for record in data["Data"]["Data"]:
                 date = datetime.utcfromtimestamp(record["time"]).strftime("%Y-%m-%d")
-                if last_date and date <= last_date:
-                    continue
-                formatted.append({
-                    "date": date,
-                    "open": record["open"],
-                    "high": record["high"],
-                    "low": record["low"],
-                    "close": record["close"],
-                    "volume": record["volumefrom"]
-                })
-
-            time.sleep(RATE_LIMIT_DELAY)
-            return formatted
+                if start_date <= date <= end_date:
+                    formatted.append({
+                        "date": date,
+                        "open": record["open"],
+                        "high": record["high"],
+                        "low": record["low"],
+                        "close": record["close"],
+                        "volume": record["volumefrom"]
+                    })
 
-        except Exception as e:
-            self.logger.error(f"Error fetching CryptoCompare data for {symbol}: {e}")
+            end -= timedelta(days=limit + 1)
+            days -= limit + 1
+            if days >= 0 and self.page_delay:
+                time.sleep(self.page_delay)
+
+        if self.rate_limit_delay:
+            time.sleep(self.rate_limit_delay)
+        return sorted(formatted, key=lambda record: record["date"])
+
+    def fetch_intraday_bars(self, symbol, interval='minute', limit=MAX_HISTODAY_LIMIT, since=None):
+        """
+        Minute or hour candles (histominute/histohour) as {'time': epoch seconds, ohlcv}.
+
+        Bars at or after `since` are returned, so the still-forming last bar is
+        re-delivered until it closes. Network and API errors are raised.
+        """
+        url = f"https://min-api.cryptocompare.com/data/v2/histo{interval}"
+        params = {"fsym": symbol.upper(), "tsym": "USD", "limit": limit}
+
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+
+        if data.get("Response") != "Success":
+            self.logger.warning(f"No {interval} data for {symbol}")
             return []
 
+        bars = [{
+            "time": record["time"],
+            "open": record["open"],
+            "high": record["high"],
+            "low": record["low"],
+            "close": record["close"],
+            "volume": record["volumefrom"]
+        } for record in data["Data"]["Data"] if since is None or record["time"] >= since]
+
+        if self.rate_limit_delay:
+            time.sleep(self.rate_limit_delay)
+        return bars
+
     def download_current_metrics(self, symbol):
         """Download current market data (CryptoCompare)"""
         try:
-            url = "https://min-api.cryptocompare.com/data/pricemultifull"
-            params = {"fsyms": symbol.upper(), "tsyms": "USD"}
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-
-            data = response.json()
-            coin_info = data["RAW"][symbol.upper()]["USD"]
-
-            return {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "price": coin_info.get("PRICE"),
-                "volume_24h": coin_info.get("TOTALVOLUME24H"),
-                "high_24h": coin_info.get("HIGH24HOUR"),
-                "low_24h": coin_info.get("LOW24HOUR"),
-                "market_cap": coin_info.get("MKTCAP")
-            }
-
+            return self.fetch_current_metrics(symbol)
         except Exception as e:
             self.logger.error(f"Error fetching current metrics for {symbol}: {e}")
             return None
+
+    def fetch_current_metrics(self, symbol):
+        """Like download_current_metrics, but network and API errors are raised"""
+        url = "https://min-api.cryptocompare.com/data/pricemultifull"
+        params = {"fsyms": symbol.upper(), "tsyms": "USD"}
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        data = response.json()
+        raw = data.get("RAW", {})
+        if symbol.upper() not in raw:
+            self.logger.warning(f"No current metrics for {symbol}")
+            return None
+        coin_info = raw[symbol.upper()]["USD"]
+
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "price": coin_info.get("PRICE"),
+            "volume_24h": coin_info.get("TOTALVOLUME24H"),
+            "high_24h": coin_info.get("HIGH24HOUR"),
+            "low_24h": coin_info.get("LOW24HOUR"),
+            "market_cap": coin_info.get("MKTCAP")
+        }
@@ -1,5 +1,12 @@
 from abc import ABC, abstractmethod
 
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+
+def is_placeholder_candle(record):
+    """True for the all-zero rows providers return for days before a coin was listed"""
+    return all(not record.get(field) for field in PRICE_FIELDS)
+
 
 class DataFetchStrategy(ABC):
     @abstractmethod
@@ -9,3 +16,7 @@ class DataFetchStrategy(ABC):
     @abstractmethod
     def download_current_metrics(self, symbol):
         pass
+
+    def download_historical_range(self, symbol, start_date, end_date):
+        """Download daily candles for start_date..end_date (inclusive) in as few requests as possible"""
+        raise NotImplementedError(f"{type(self).__name__} does not support range requests")
@@ -0,0 +1,121 @@
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from config import SCHEDULER_STATE_FILE, PRIORITY_TOP_N, HISTORICAL_YEARS
+from filters.strategies.update_scheduler_strategy import UpdateSchedulerStrategy
+
+
+class PriorityUpdateStrategy(UpdateSchedulerStrategy):
+    """
+    Orders stale coins by a priority score and stops the run when its budget is spent.
+
+    The top `top_n` coins by market cap rank are always scheduled first, ordered by
+    score. Everything below that is the long tail: it is served round-robin, least
+    recently attempted first, so a limited budget still reaches every coin over
+    several runs.
+    """
+
+    MAX_STALENESS_DAYS = HISTORICAL_YEARS * 365
+    MAX_FAILURE_PENALTY = 5
+
+    def __init__(self, state_file=SCHEDULER_STATE_FILE, max_requests=None, max_seconds=None,
+                 top_n=PRIORITY_TOP_N):
+        self.state_file = state_file
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.top_n = top_n
+        self.logger = logging.getLogger(__name__)
+
+        self.state = self._load_state()
+        self.requests_used = 0
+        self.run_started = None
+
+    # ---- State ----
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading scheduler state {self.state_file}: {e}")
+            return {}
+
+    def finish_run(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            self.logger.error(f"Error saving scheduler state {self.state_file}: {e}")
+
+    # ---- Scoring ----
+    def _staleness_days(self, last_date):
+        if not last_date:
+            return self.MAX_STALENESS_DAYS
+        try:
+            days = (datetime.now() - datetime.strptime(last_date, '%Y-%m-%d')).days
+            return min(max(days, 0), self.MAX_STALENESS_DAYS)
+        except Exception:
+            return self.MAX_STALENESS_DAYS
+
+    @staticmethod
+    def _rank(crypto):
+        try:
+            rank = float(crypto.get('market_cap_rank'))
+            return rank if rank > 0 else math.inf
+        except (TypeError, ValueError):
+            return math.inf
+
+    def priority_score(self, crypto_info):
+        """Higher is more urgent: large caps first, then stale data, damped by past failures"""
+        crypto = crypto_info['crypto']
+        rank = self._rank(crypto)
+        rank_score = 0.0 if math.isinf(rank) else 1.0 / math.log2(rank + 1)
+        staleness = math.log1p(self._staleness_days(crypto_info['last_date'])) / math.log1p(self.MAX_STALENESS_DAYS)
+
+        failures = self.state.get(crypto['id'], {}).get('failures', 0)
+        failure_damping = 0.5 ** min(failures, self.MAX_FAILURE_PENALTY)
+
+        return (rank_score + staleness) * failure_damping
+
+    # ---- Scheduling ----
+    def schedule(self, crypto_date_info):
+        self.run_started = time.monotonic()
+        self.requests_used = 0
+
+        stale = [c for c in crypto_date_info if c['needs_update']]
+        head = [c for c in stale if self._rank(c['crypto']) <= self.top_n]
+        tail = [c for c in stale if self._rank(c['crypto']) > self.top_n]
+
+        head.sort(key=self.priority_score, reverse=True)
+        # Round-robin over the long tail: never attempted first, then oldest attempt
+        tail.sort(key=lambda c: (self.state.get(c['crypto']['id'], {}).get('last_attempt', 0),
+                                 -self.priority_score(c)))
+
+        self.logger.info(f"Scheduled {len(head)} top-{self.top_n} and {len(tail)} long-tail coins")
+        return head + tail
+
+    def budget_exhausted(self):
+        if self.max_requests is not None and self.requests_used >= self.max_requests:
+            return True
+        if (self.max_seconds is not None and self.run_started is not None and
+                time.monotonic() - self.run_started >= self.max_seconds):
+            return True
+        return False
+
+    def record_result(self, crypto_id, success, requests_made=1):
+        self.requests_used += requests_made
+
+        entry = self.state.setdefault(crypto_id, {'failures': 0})
+        entry['last_attempt'] = time.time()
+        if success:
+            entry['failures'] = 0
+            entry['last_success'] = entry['last_attempt']
+        else:
+            entry['failures'] = entry.get('failures', 0) + 1
@@ -0,0 +1,24 @@
+from abc import ABC, abstractmethod
+
+
+class UpdateSchedulerStrategy(ABC):
+    """Interface for ordering and budgeting the coins DataFillFilter refreshes."""
+
+    @abstractmethod
+    def schedule(self, crypto_date_info):
+        """Return the entries that need an update, in the order they should be processed"""
+        pass
+
+    @abstractmethod
+    def budget_exhausted(self) -> bool:
+        """Return True once the current run has used up its time or request budget"""
+        pass
+
+    @abstractmethod
+    def record_result(self, crypto_id, success, requests_made=1):
+        """Record the outcome of one coin update so later runs can take it into account"""
+        pass
+
+    def finish_run(self):
+        """Persist any state collected during the run"""
+        pass
@@ -2,12 +2,20 @@ import logging
 import sys
 from utils.csv_manager import CSVManager
 from utils.timer import PerformanceTimer
+from utils.profiler import SpanProfiler, instrument_class
 from filters.symbol_filter import SymbolFilter
 from filters.date_check_filter import DateCheckFilter
 from filters.data_fill_filter import DataFillFilter
+from filters.data_quality_filter import DataQualityFilter
 from filters.strategies.crypto_compare_strategy import CryptoCompareStrategy
+from filters.strategies.coingecko_strategy import CoinGeckoStrategy
+from filters.strategies.composite_fetch_strategy import CompositeFetchStrategy, FetchProvider
 from filters.strategies.daily_update_strategy import DailyUpdateStrategy
 from filters.strategies.symbol_strategy import SymbolStrategy
+from filters.strategies.priority_update_strategy import PriorityUpdateStrategy
+from utils.lazy_import import module_available
+from config import (UPDATE_MAX_REQUESTS, UPDATE_MAX_SECONDS, RATE_LIMIT_DELAY, COINGECKO_RATE_LIMIT_DELAY,
+                    PROFILING_ENABLED, GLOBAL_LSTM_TRAIN)
 
 
 def setup_logging():
@@ -23,11 +31,15 @@ def setup_logging():
 
 
 class CryptoExchangeProcessor:
-    def __init__(self, csv_manager, symbol_strategy, date_strategy, fetch_strategy):
+    def __init__(self, csv_manager, symbol_strategy, date_strategy, fetch_strategy, update_scheduler=None):
         self.csv_manager = csv_manager
         self.symbol_filter = SymbolFilter(csv_manager, symbol_strategy)
         self.date_check_filter = DateCheckFilter(csv_manager, date_strategy)
-        self.data_fill_filter = DataFillFilter(csv_manager, fetch_strategy)
+        # Providers behind a CompositeFetchStrategy pace themselves
+        fill_delay = 0 if isinstance(fetch_strategy, CompositeFetchStrategy) else RATE_LIMIT_DELAY
+        self.data_quality_filter = DataQualityFilter(csv_manager)
+        self.data_fill_filter = DataFillFilter(csv_manager, fetch_strategy, update_scheduler, fill_delay,
+                                               quality_filter=self.data_quality_filter)
         self.timer = PerformanceTimer()
         self.logger = logging.getLogger(__name__)
 
@@ -48,16 +60,38 @@ class CryptoExchangeProcessor:
                 needs_update = len([c for c in date_info if c['needs_update']])
                 self.logger.info(f"FILTER 2 COMPLETED: {needs_update}/{len(symbols)} require updates")
 
+                # The daily metrics table must hold the stored history before FILTER 3 appends to it
+                self.csv_manager.metrics_table.ensure_migrated()
+
                 # FILTER 3: Fill missing data
                 self.logger.info("FILTER 3: Downloading and processing missing exchange data")
                 result = self.data_fill_filter.process(date_info)
                 self.logger.info(f"FILTER 3 COMPLETED: {result['success_count']} successful downloads")
 
-            return self._create_success_result(result, len(symbols))
-
         except Exception as e:
             return self._create_error_result(str(e))
 
+        if GLOBAL_LSTM_TRAIN:
+            self.train_global_model()
+        return self._create_success_result(result, len(symbols))
+
+    def train_global_model(self):
+        """Offline stage: resume training the shared multi-coin LSTM on the updated store"""
+        if not module_available('tensorflow'):
+            self.logger.warning("Global LSTM training skipped: TensorFlow is not installed")
+            return None
+        from analysis.global_lstm_trainer import GlobalLSTMTrainer
+
+        self.logger.info("FILTER 4: Training the global LSTM across all stored coins")
+        try:
+            metrics = GlobalLSTMTrainer(self.csv_manager).process()
+        except Exception as e:
+            self.logger.error(f"Global LSTM training failed: {e}")
+            return None
+        self.logger.info(f"FILTER 4 COMPLETED: global LSTM evaluated on {len(metrics)} coins, "
+                         f"median R2 {metrics['R2'].median():.3f}")
+        return metrics
+
     def _create_success_result(self, result, total_symbols):
         elapsed = self.timer.get_elapsed_time()
         return {
@@ -116,17 +150,30 @@ def main():
 
     logger = setup_logging()
 
+    if PROFILING_ENABLED:
+        for profiled_class in (SymbolFilter, DateCheckFilter, DataFillFilter, DataQualityFilter):
+            instrument_class(profiled_class)
+        instrument_class(CSVManager, include_private=True)
+
     # Single instantiation of managers and strategies
     csv_manager = CSVManager()
     symbol_strategy = SymbolStrategy()
     date_strategy = DailyUpdateStrategy()
-    fetch_strategy = CryptoCompareStrategy()
+    fetch_strategy = CompositeFetchStrategy([
+        FetchProvider('CryptoCompare', CryptoCompareStrategy(rate_limit_delay=0), RATE_LIMIT_DELAY),
+        FetchProvider('CoinGecko', CoinGeckoStrategy(csv_manager, rate_limit_delay=0), COINGECKO_RATE_LIMIT_DELAY)
+    ])
+    update_scheduler = PriorityUpdateStrategy(
+        max_requests=UPDATE_MAX_REQUESTS,
+        max_seconds=UPDATE_MAX_SECONDS
+    )
 
     processor = CryptoExchangeProcessor(
         csv_manager=csv_manager,
         symbol_strategy=symbol_strategy,
         date_strategy=date_strategy,
-        fetch_strategy=fetch_strategy
+        fetch_strategy=fetch_strategy,
+        update_scheduler=update_scheduler
     )
 
     result = processor.run_pipe_and_filter()
@@ -139,6 +186,13 @@ def main():
     else:
         logger.error(f"ERROR: {result['error']}")
 
+    if PROFILING_ENABLED:
+        profiler = SpanProfiler()
+        print(profiler.report())
+        with open('pipeline_profile.folded', 'w', encoding='utf-8') as f:
+            f.write(profiler.export_collapsed())
+        logger.info("Flamegraph input written to pipeline_profile.folded")
+
     print("=" * 60)
     print("Homework 1 - Crypto Exchange Analyzer - COMPLETED")
 
@@ -0,0 +1,109 @@
+"""
+Production server for the web interface.
+
+    python serve.py                                  # CRYPTO_WORKERS x CRYPTO_THREADS on CRYPTO_BIND
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+    python serve.py --threaded                       # one process with a request thread pool
+
+With gunicorn installed (Linux/macOS) the app is loaded once in the master:
+the market snapshot is opened (or rebuilt) and memory-mapped before the
+workers are forked, so every worker shares the same pages. Without gunicorn,
+or with --threaded, a werkzeug server handles requests on a fixed thread pool
+in a single process.
+"""
+import argparse
+import gc
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SERVE_BIND, SERVE_WORKERS, SERVE_THREADS, INTRADAY_ENABLED
+from utils.lazy_import import module_available
+
+
+def prepare_app():
+    """Import the app and attach the shared market snapshot; runs once, before any fork"""
+    import web_prototype
+    from utils.market_snapshot import MarketSnapshot
+
+    processor = web_prototype.processor
+    processor.csv_manager.snapshot = MarketSnapshot.load_or_build(processor.csv_manager)
+    web_prototype.load_initial_data()
+    # Objects created so far are never collected, so the GC does not dirty (and copy) their pages after fork
+    gc.freeze()
+    return web_prototype
+
+
+def run_gunicorn(web_prototype, bind, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        # Background threads do not survive fork; intraday polling runs in the single worker
+        web_prototype.processor.start_intraday()
+
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            for key, value in {'bind': bind, 'workers': workers, 'threads': threads,
+                               'worker_class': 'gthread', 'timeout': 120, 'post_fork': post_fork}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return web_prototype.app
+
+    PreloadedApplication().run()
+
+
+def run_threaded(web_prototype, bind, threads):
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """werkzeug's WSGI server handling each connection on a fixed thread pool"""
+
+        def __init__(self, host, port, app):
+            super().__init__(host, port, app)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    host, port = bind.rsplit(':', 1)
+    server = PooledWSGIServer(host, int(port), web_prototype.app)
+    web_prototype.processor.start_intraday()
+    print(f" Serving on http://{bind} with {threads} threads (single process)")
+    try:
+        server.serve_forever()
+    finally:
+        server.pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the web interface with multiple workers")
+    parser.add_argument('--bind', default=SERVE_BIND, help="HOST:PORT to listen on")
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS, help="pre-forked worker processes")
+    parser.add_argument('--threads', type=int, default=SERVE_THREADS, help="request threads per worker")
+    parser.add_argument('--threaded', action='store_true', help="single process with a thread pool")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    workers = args.workers
+    if INTRADAY_ENABLED and workers > 1:
+        # Intraday ring buffers and SSE subscribers live in one process's memory
+        logger.warning("Intraday mode keeps its state in one process; using a single worker")
+        workers = 1
+
+    web_prototype = prepare_app()
+    if args.threaded or not module_available('gunicorn'):
+        run_threaded(web_prototype, args.bind, args.threads)
+    else:
+        run_gunicorn(web_prototype, args.bind, workers, args.threads)
+
+
+if __name__ == "__main__":
+    main()
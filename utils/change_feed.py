@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from config import CHANGE_FEED_FILE
+
+
+class ChangeFeed:
+    """
+    Append-only log of data changes made through CSVManager.
+
+    Every save appends one JSON line naming the data kind ('historical',
+    'metrics'), the coin, the date range written, the row count and the
+    version (mtime, size) of the file afterwards. Lines are appended with a
+    single O_APPEND write, so pipelines in several processes can share the log.
+
+    Consumers in the same process register a callback with subscribe(); other
+    processes (web workers, precompute jobs) keep a byte position and call
+    read(position) to get the changes made since, then recompute only those
+    coins instead of rescanning the whole universe.
+    """
+
+    def __init__(self, path=CHANGE_FEED_FILE):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._subscribers = []  # (callback, kinds)
+        self._lock = threading.Lock()
+
+    # ---- Write ----
+    def append(self, kind, crypto_id, start, end, rows, version=None):
+        """Record a change and notify subscribers; returns the entry"""
+        entry = {'ts': round(time.time(), 3), 'kind': kind, 'crypto_id': crypto_id,
+                 'start': start, 'end': end, 'rows': rows, 'version': version}
+        line = (json.dumps(entry, default=str) + "\n").encode('utf-8')
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, kinds in subscribers:
+            if kinds is None or kind in kinds:
+                try:
+                    callback(entry)
+                except Exception as e:
+                    self.logger.error(f"Change subscriber failed for {kind}/{crypto_id}: {e}")
+        return entry
+
+    # ---- Subscribe ----
+    def subscribe(self, callback, kinds=None):
+        """Call `callback(entry)` after every change of the given kinds (all kinds when None)"""
+        with self._lock:
+            self._subscribers.append((callback, set(kinds) if kinds else None))
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(cb, kinds) for cb, kinds in self._subscribers if cb is not callback]
+
+    # ---- Read ----
+    def position(self):
+        """Current end of the log; read(position()) later returns only newer changes"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, position=0, kinds=None):
+        """Changes appended after byte `position`, as (entries, new position)"""
+        try:
+            with open(self.path, 'rb') as f:
+                if position > os.fstat(f.fileno()).st_size:
+                    position = 0  # the log was truncated or replaced; start over
+                f.seek(position)
+                data = f.read()
+        except OSError:
+            return [], 0
+
+        # A line still being written has no newline yet; leave it for the next read
+        complete = data[:data.rfind(b"\n") + 1]
+        entries = []
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if kinds is None or entry.get('kind') in kinds:
+                entries.append(entry)
+        return entries, position + len(complete)
+
+    def changed_ids(self, position=0, kinds=None):
+        """Coins changed after `position`, as (set of crypto_ids, new position)"""
+        entries, position = self.read(position, kinds)
+        return {entry['crypto_id'] for entry in entries}, position
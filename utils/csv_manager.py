@@ -1,8 +1,16 @@
 import pandas as pd
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from config import SYMBOLS_DIR, HISTORICAL_DIR, METRICS_DIR, CSV_ENCODING, CSV_DELIMITER
+from config import (SYMBOLS_DIR, HISTORICAL_DIR, METRICS_DIR, QUALITY_DIR, CSV_ENCODING, CSV_DELIMITER,
+                    READ_CACHE_SIZE, STATUS_CACHE_TTL)
+from utils.change_feed import ChangeFeed
+from utils.rollup_store import RollupStore
+from utils.metrics_table import MetricsTable
+from utils.metrics import CACHE_REQUESTS
 
 
 class CSVManager:
@@ -10,10 +18,55 @@ class CSVManager:
         self.logger = logging.getLogger(__name__)
         self._ensure_directories()
 
+        # Read caches keyed by file identity (mtime, size), so a rewrite is picked up on the next read
+        self._read_cache = OrderedDict()
+        self._read_cache_lock = threading.Lock()
+        self._write_locks = {}  # filename -> lock serializing read-modify-write saves in this process
+        self._file_counts = None
+        self._file_counts_at = 0.0
+        self.snapshot = None  # MarketSnapshot serving unchanged histories without parsing (see serve.py)
+        self.changes = ChangeFeed()
+        self.rollups = RollupStore(self)
+        self.metrics_table = MetricsTable(self)
+        self.changes.subscribe(self.rollups.on_change, kinds=['historical'])
+
     def _ensure_directories(self):
-        for dir_path in [SYMBOLS_DIR, HISTORICAL_DIR, METRICS_DIR]:
+        for dir_path in [SYMBOLS_DIR, HISTORICAL_DIR, METRICS_DIR, QUALITY_DIR]:
             os.makedirs(dir_path, exist_ok=True)
 
+    def _write_csv(self, df, filename):
+        """
+        Publish a new version of `filename` atomically.
+
+        Rows go to a temporary file in the same directory that then replaces the
+        old one, so readers see the old or the new version, never a partial
+        file. A reader that already opened the old version keeps reading it; the
+        OS frees it once the last reader closes it.
+        """
+        tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding=CSV_ENCODING, newline='') as f:
+                df.to_csv(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            self._replace(tmp, filename)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @staticmethod
+    def _replace(tmp, filename, attempts=10):
+        # Windows refuses to replace a file that another process has open; retry briefly
+        for attempt in range(attempts):
+            try:
+                os.replace(tmp, filename)
+                return
+            except PermissionError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+
     def _save_csv(self, data, filename, key='date'):
         """Generic CSV save: append, deduplicate, sort."""
         if not data:
@@ -21,21 +74,94 @@ class CSVManager:
 
         df_new = pd.DataFrame(data)
 
-        if os.path.exists(filename):
-            try:
-                df_existing = pd.read_csv(filename, encoding=CSV_ENCODING)
-                df_combined = pd.concat([df_existing, df_new]).drop_duplicates(subset=[key], keep='last')
-                df_combined = df_combined.sort_values(key)
-                df_combined.to_csv(filename, index=False, encoding=CSV_ENCODING)
-            except Exception as e:
-                self.logger.error(f"Error appending CSV {filename}: {e}")
-                df_new.to_csv(filename, index=False, encoding=CSV_ENCODING)
-        else:
-            df_new.to_csv(filename, index=False, encoding=CSV_ENCODING)
+        with self._write_locks.setdefault(filename, threading.Lock()):
+            if os.path.exists(filename):
+                try:
+                    df_existing = pd.read_csv(filename, encoding=CSV_ENCODING)
+                    subset = key if isinstance(key, list) else [key]
+                    df_combined = pd.concat([df_existing, df_new]).drop_duplicates(subset=subset, keep='last')
+                    df_combined = df_combined.sort_values(key)
+                    self._write_csv(df_combined, filename)
+                except Exception as e:
+                    self.logger.error(f"Error appending CSV {filename}: {e}")
+                    self._write_csv(df_new, filename)
+            else:
+                self._write_csv(df_new, filename)
+                self._count_new_file(filename)
 
         self.logger.info(f"Saved {len(df_new)} records to {filename}")
         return filename
 
+    def _record_change(self, kind, crypto_id, filename, dates):
+        """Append a save to the change feed; a failure is logged and never fails the save"""
+        dates = [str(date)[:10] for date in dates if pd.notna(date)]
+        try:
+            stat = os.stat(filename)
+            self.changes.append(kind, crypto_id, min(dates, default=None), max(dates, default=None),
+                                len(dates), [stat.st_mtime_ns, stat.st_size])
+        except Exception as e:
+            self.logger.error(f"Error recording change of {kind}/{crypto_id}: {e}")
+
+    def _cached_read(self, cache_name, filename, loader):
+        """Return loader(file), reusing the last result while the file is unchanged"""
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        key = (cache_name, filename)
+        identity = (stat.st_mtime_ns, stat.st_size)
+
+        with self._read_cache_lock:
+            cached = self._read_cache.get(key)
+            if cached and cached[0] == identity:
+                self._read_cache.move_to_end(key)
+                CACHE_REQUESTS.inc(cache_name, 'hit')
+                return cached[1]
+        CACHE_REQUESTS.inc(cache_name, 'miss')
+
+        # Parse the version that is open and cache it under that version's identity,
+        # even if a writer publishes a newer one in the meantime
+        try:
+            with open(filename, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                value = loader(f)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_mtime_ns, stat.st_size)
+        with self._read_cache_lock:
+            self._read_cache[key] = (identity, value)
+            self._read_cache.move_to_end(key)
+            while len(self._read_cache) > READ_CACHE_SIZE:
+                self._read_cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _read_records(file):
+        """CSV rows as dicts with NaN converted to None"""
+        df = pd.read_csv(file, encoding=CSV_ENCODING)
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    # ---- Inventory ----
+    def count_files(self):
+        """CSV file counts per data directory, rescanned at most every STATUS_CACHE_TTL seconds"""
+        if self._file_counts is None or time.monotonic() - self._file_counts_at > STATUS_CACHE_TTL:
+            counts = {}
+            for kind, directory in (('symbols', SYMBOLS_DIR), ('historical', HISTORICAL_DIR),
+                                    ('metrics', METRICS_DIR)):
+                counts[kind] = len([f for f in os.listdir(directory) if f.endswith('.csv')]) \
+                    if os.path.exists(directory) else 0
+            self._file_counts = counts
+            self._file_counts_at = time.monotonic()
+        return dict(self._file_counts)
+
+    def _count_new_file(self, filename):
+        if self._file_counts is None:
+            return
+        directory = os.path.dirname(filename)
+        for kind, kind_dir in (('symbols', SYMBOLS_DIR), ('historical', HISTORICAL_DIR), ('metrics', METRICS_DIR)):
+            if os.path.normpath(directory) == os.path.normpath(kind_dir):
+                self._file_counts[kind] += 1
+
     # ---- Symbols ----
     def save_symbols(self, symbols):
         filename = os.path.join(SYMBOLS_DIR, f"crypto_symbols_{datetime.now():%Y%m%d_%H%M%S}.csv")
@@ -53,12 +179,13 @@ class CSVManager:
             return None
 
     def load_symbols(self):
+        """Records of the latest symbols file (cached; treat as read-only)"""
         file = self.get_last_symbols_file()
         if not file:
             return []
         try:
-            df = pd.read_csv(file, encoding=CSV_ENCODING)
-            return df.to_dict('records')
+            return self._cached_read('symbols', file,
+                                     lambda f: pd.read_csv(f, encoding=CSV_ENCODING).to_dict('records')) or []
         except Exception as e:
             self.logger.error(f"Error loading symbols: {e}")
             return []
@@ -66,7 +193,29 @@ class CSVManager:
     # ---- Historical Data ----
     def save_historical_data(self, crypto_id, data):
         filename = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
-        return self._save_csv(data, filename, key='date')
+        saved = self._save_csv(data, filename, key='date')
+        if saved:
+            self._record_change('historical', crypto_id, filename, [row.get('date') for row in data])
+        return saved
+
+    def write_historical_data(self, crypto_id, df):
+        """Replace the stored history of a coin (used by the quality migration)"""
+        filename = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+        with self._write_locks.setdefault(filename, threading.Lock()):
+            self._write_csv(df.sort_values('date'), filename)
+        self._record_change('historical', crypto_id, filename, df['date'].tolist())
+        self.logger.info(f"Rewrote {len(df)} records to {filename}")
+        return filename
+
+    def load_historical_records(self, crypto_id):
+        """Historical rows of a coin, NaN as None (cached; treat as read-only)"""
+        filename = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+        if self.snapshot is not None:
+            records = self.snapshot.records(crypto_id, filename)
+            CACHE_REQUESTS.inc('snapshot', 'miss' if records is None else 'hit')
+            if records is not None:
+                return records
+        return self._cached_read('historical', filename, self._read_records) or []
 
     def get_last_historical_date(self, crypto_id):
         filename = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
@@ -82,10 +231,37 @@ class CSVManager:
     def crypto_historical_exists(self, crypto_id):
         return os.path.exists(os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv"))
 
+    def historical_ids(self):
+        """Ids of every stored candle history, sorted"""
+        ids = []
+        for file in sorted(os.listdir(HISTORICAL_DIR)):
+            crypto_id = file[:-len('_historical.csv')]
+            # Exchange snapshots are stored as <name>.csv_historical.csv next to the candles
+            if file.endswith('_historical.csv') and '.csv' not in crypto_id:
+                ids.append(crypto_id)
+        return ids
+
     # ---- Metrics ----
     def save_daily_metrics(self, crypto_id, data):
         filename = os.path.join(METRICS_DIR, f"{crypto_id}_metrics.csv")
         # Convert dict to list for consistency
         if isinstance(data, dict):
             data = [data]
-        return self._save_csv(data, filename, key='date')
+        saved = self._save_csv(data, filename, key='date')
+        if saved:
+            try:
+                self.metrics_table.append(crypto_id, data)
+            except Exception as e:
+                self.logger.error(f"Error adding {crypto_id} to the daily metrics table: {e}")
+            self._record_change('metrics', crypto_id, filename, [row.get('date') for row in data])
+        return saved
+
+    def load_metrics_records(self, crypto_id):
+        """Daily metrics rows of a coin, NaN as None (cached; treat as read-only)"""
+        filename = os.path.join(METRICS_DIR, f"{crypto_id}_metrics.csv")
+        return self._cached_read('metrics', filename, self._read_records) or []
+
+    # ---- Quality Reports ----
+    def save_quality_report(self, report_rows, name='quality_report', key='crypto_id'):
+        filename = os.path.join(QUALITY_DIR, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.csv")
+        return self._save_csv(report_rows, filename, key=key)
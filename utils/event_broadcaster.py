@@ -0,0 +1,109 @@
+import json
+import queue
+import threading
+import time
+
+
+def format_sse(data, event=None, event_id=None):
+    """One Server-Sent Events message; `data` is JSON-encoded"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """A watcher's bounded event queue; the oldest events are dropped when a client falls behind"""
+
+    def __init__(self, broadcaster, topics=None, max_queue=256):
+        self.broadcaster = broadcaster
+        self.topics = set(topics) if topics else None  # None watches every topic
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def wants(self, topic):
+        return self.topics is None or topic is None or topic in self.topics
+
+    def put(self, message):
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def stream(self, heartbeat=15.0, retry_ms=5000):
+        """Yield SSE messages until the client disconnects; comments keep idle connections open"""
+        try:
+            # Sent at once so headers reach the client; also sets its reconnect delay
+            yield f"retry: {retry_ms}\n\n"
+            while True:
+                try:
+                    yield self.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.close()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class EventBroadcaster:
+    """
+    Fan-out of server events to any number of SSE watchers (thread-safe).
+
+    Each event is serialized once and copied by reference into the queue of
+    every subscription watching its topic (a crypto_id), so publishing cost
+    does not depend on how the payload was computed.
+    """
+
+    def __init__(self, max_queue=256, max_subscriptions=None):
+        self.max_queue = max_queue
+        self.max_subscriptions = max_subscriptions  # None: unlimited
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def subscribe(self, topics=None):
+        """A new subscription, or None when `max_subscriptions` are already open"""
+        subscription = Subscription(self, topics, self.max_queue)
+        with self._lock:
+            if self.max_subscriptions is not None and len(self._subscriptions) >= self.max_subscriptions:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def watchers(self, topic=None):
+        """Number of subscriptions that would receive an event for `topic`"""
+        with self._lock:
+            return sum(1 for subscription in self._subscriptions if subscription.wants(topic))
+
+    def watched_topics(self):
+        """Topics named by at least one subscription (wildcard watchers are not included)"""
+        with self._lock:
+            return set().union(*(s.topics for s in self._subscriptions if s.topics))
+
+    def publish(self, event, data, topic=None):
+        """Send `data` to every watcher of `topic` (None reaches everyone); returns the receiver count"""
+        with self._lock:
+            self._next_id += 1
+            receivers = [s for s in self._subscriptions if s.wants(topic)]
+            event_id = self._next_id
+        if not receivers:
+            return 0
+        message = format_sse({**data, 'ts': round(time.time(), 3)}, event, event_id)
+        for subscription in receivers:
+            subscription.put(message)
+        return len(receivers)
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import JOBS_DB, JOB_WORKERS, JOB_RESULT_TTL, JOB_LEASE_SECONDS
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_kind_key ON jobs (kind, key, status);
+"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _update(db_path, job_id, **fields):
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    conn = _connect(db_path)
+    try:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+    finally:
+        conn.close()
+
+
+def _run_job(db_path, job_id, func, args, lease=JOB_LEASE_SECONDS):
+    """Executed inside a pool worker; records state so any web process can poll it"""
+    _update(db_path, job_id, status=RUNNING, started=time.time(), heartbeat=time.time())
+    done = threading.Event()
+
+    def renew_lease():
+        while not done.wait(lease / 3):
+            _update(db_path, job_id, heartbeat=time.time())
+
+    threading.Thread(target=renew_lease, name=f'job-lease-{job_id}', daemon=True).start()
+    try:
+        result = func(*args)
+        _update(db_path, job_id, status=DONE, finished=time.time(),
+                result=json.dumps(result, default=str))
+    except Exception as e:
+        _update(db_path, job_id, status=FAILED, finished=time.time(), error=str(e))
+    finally:
+        done.set()
+
+
+def _pid_alive(pid):
+    if os.name != 'posix' or not pid:
+        return True  # cannot probe safely, assume the owner is still running
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Durable job queue backed by SQLite, executed by a bounded process pool.
+
+    Submitting a job whose (kind, key) is already queued or running returns the
+    existing job id instead of starting duplicate work; a finished result is
+    reused for `result_ttl` seconds unless the caller asks for a fresh run.
+    Running jobs hold a lease their worker renews; a job whose lease expired or
+    whose owning process is gone is failed, so the next submit starts it again.
+    """
+
+    def __init__(self, db_path=JOBS_DB, max_workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL,
+                 lease=JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.lease = lease
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = _connect(db_path)
+        try:
+            conn.executescript(_SCHEMA)
+            if 'heartbeat' not in {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")  # databases from before leases
+            self._recover_orphans(conn)
+        finally:
+            conn.close()
+
+    def _get_executor(self):
+        # Spawned workers do not inherit the parent's TensorFlow/Flask state
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _recover_orphans(self, conn):
+        """Fail jobs left unfinished by a process that no longer exists or whose lease expired"""
+        now = time.time()
+        expired = conn.execute("UPDATE jobs SET status = ?, finished = ?, error = ? "
+                               "WHERE status = ? AND COALESCE(heartbeat, started) < ?",
+                               (FAILED, now, 'Worker lease expired', RUNNING, now - self.lease)).rowcount
+        rows = conn.execute("SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)",
+                            (QUEUED, RUNNING)).fetchall()
+        orphans = [row['id'] for row in rows if not _pid_alive(row['owner_pid'])]
+        for job_id in orphans:
+            conn.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?",
+                         (FAILED, now, 'Interrupted by shutdown', job_id))
+        if expired or orphans:
+            self.logger.warning(f"Marked {expired + len(orphans)} interrupted jobs as failed")
+
+    def submit(self, kind, key, func, *args, reuse_result=True):
+        """
+        Queue func(*args) unless an identical job is in flight (or, with reuse_result,
+        finished within result_ttl); returns the job id
+        """
+        with self._lock:
+            conn = _connect(self.db_path)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                conn.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+                             (now - self.result_ttl,))
+                self._recover_orphans(conn)
+                reusable = (QUEUED, RUNNING, DONE) if reuse_result else (QUEUED, RUNNING)
+                existing = conn.execute(
+                    f"SELECT id, status FROM jobs WHERE kind = ? AND key = ? "
+                    f"AND status IN ({', '.join('?' * len(reusable))}) ORDER BY created DESC LIMIT 1",
+                    (kind, key, *reusable)).fetchone()
+                if existing:
+                    conn.execute("COMMIT")
+                    self.logger.info(f"Reusing {existing['status']} job {existing['id']} for {kind}:{key}")
+                    return existing['id']
+
+                job_id = uuid.uuid4().hex
+                conn.execute("INSERT INTO jobs (id, kind, key, status, owner_pid, created) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", (job_id, kind, key, QUEUED, os.getpid(), now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+            future = self._get_executor().submit(_run_job, self.db_path, job_id, func, args, self.lease)
+            future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+            self.logger.info(f"Submitted job {job_id} for {kind}:{key}")
+            return job_id
+
+    def _on_done(self, job_id, future):
+        # _run_job records its own outcome; this only catches a crashed worker
+        error = future.exception()
+        if error is not None:
+            self.logger.error(f"Job {job_id} worker crashed: {error}")
+            _update(self.db_path, job_id, status=FAILED, finished=time.time(), error=str(error))
+
+    def get(self, job_id):
+        """Job status dictionary, including the decoded result when done"""
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'key': row['key'],
+            'status': row['status'],
+            'created': row['created'],
+            'started': row['started'],
+            'finished': row['finished']
+        }
+        if row['status'] == DONE:
+            job['result'] = json.loads(row['result'])
+        elif row['status'] == FAILED:
+            job['error'] = row['error']
+        return job
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import HISTORICAL_DIR, SNAPSHOT_DIR, CSV_ENCODING
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'timestamp')
+
+
+def _identity(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class MarketSnapshot:
+    """
+    Read-only, memory-mapped copy of every stored candle history.
+
+    All coins are packed into one float64 matrix (a column per field) and an
+    int64 day-number vector, saved as .npy files with a JSON index of each
+    coin's row range and the identity (mtime, size) of the CSV it came from.
+    Workers open them with mmap_mode='r', so pre-forked web workers share the
+    same page-cache pages instead of each parsing and caching its own copy.
+    A coin whose CSV has changed since the build is not served (None).
+
+    Each build is written to its own version directory and published by
+    atomically replacing the CURRENT pointer, so a rebuild never touches files
+    that readers have mapped. Readers switch to the new version on their next
+    refresh; older version directories are removed, and the OS keeps their
+    pages alive until the last mapping is closed.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, check_interval=5.0):
+        self.directory = directory
+        self.check_interval = check_interval  # seconds between checks of the CURRENT pointer
+        self._state = (None, {}, None, None)  # (version, index, values, days), swapped as one
+        self._checked_at = 0.0
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    @property
+    def index(self):
+        return self._state[1]
+
+    def _path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def _current_version(self):
+        try:
+            with open(self._path('CURRENT'), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    # ---- Build ----
+    def build(self, csv_manager):
+        """Pack every candle history into the snapshot files (written atomically)"""
+        index, values, days, offset = {}, [], [], 0
+        for crypto_id in csv_manager.historical_ids():
+            path = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+            try:
+                identity = _identity(path)
+                df = pd.read_csv(path, encoding=CSV_ENCODING)
+            except Exception as e:
+                self.logger.warning(f"Snapshot skipped {crypto_id}: {e}")
+                continue
+            columns = [col for col in df.columns if col in COLUMNS]
+            if 'date' not in df.columns or len(columns) != len(df.columns) - 1:
+                continue  # not a plain candle file; served from CSV
+            index[crypto_id] = {
+                'start': offset,
+                'end': offset + len(df),
+                'columns': ['date', *df.columns.drop('date')],
+                'int_columns': [col for col in columns if pd.api.types.is_integer_dtype(df[col])],
+                'identity': identity
+            }
+            values.append(df.reindex(columns=list(COLUMNS)).to_numpy(dtype=np.float64))
+            days.append(pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]').astype(np.int64))
+            offset += len(df)
+
+        version = f"{datetime.now():%Y%m%d_%H%M%S_%f}"
+        version_dir = self._path(version)
+        os.makedirs(version_dir, exist_ok=True)
+        arrays = {'values.npy': np.concatenate(values) if values else np.empty((0, len(COLUMNS))),
+                  'days.npy': np.concatenate(days) if days else np.empty(0, dtype=np.int64)}
+        for name, array in arrays.items():
+            with open(os.path.join(version_dir, name), 'wb') as f:
+                np.save(f, array)
+        with open(os.path.join(version_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+
+        tmp = self._path(f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp, self._path('CURRENT'))  # publishes the complete version
+        self._collect_garbage(keep=version)
+
+        self.logger.info(f"Market snapshot {version} built: {len(index)} coins, {offset} rows, "
+                         f"{arrays['values.npy'].nbytes / 1e6:.1f} MB")
+        return self.open()
+
+    def _collect_garbage(self, keep):
+        """Remove superseded versions; processes that mapped them keep reading until they refresh"""
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name != keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def open(self, attempts=3):
+        """Memory-map the current snapshot version; False if none has been built"""
+        for _ in range(attempts):
+            version = self._current_version()
+            if version is None:
+                return False
+            try:
+                with open(self._path(version, 'index.json'), encoding='utf-8') as f:
+                    index = json.load(f)
+                values = np.load(self._path(version, 'values.npy'), mmap_mode='r')
+                days = np.load(self._path(version, 'days.npy'), mmap_mode='r')
+            except (OSError, ValueError):
+                continue  # superseded and collected while opening; read CURRENT again
+            self._state = (version, index, values, days)
+            self._checked_at = time.monotonic()
+            return True
+        return False
+
+    def refresh(self):
+        """Switch to a newer published version, checked at most every `check_interval` seconds"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        version = self._current_version()
+        return version is not None and version != self.version and self.open()
+
+    def stale_ids(self, csv_manager):
+        """Stored coins whose CSV differs from (or is missing in) the snapshot"""
+        stale = []
+        for crypto_id in csv_manager.historical_ids():
+            entry = self.index.get(crypto_id)
+            path = os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv")
+            if entry is None or entry['identity'] != _identity(path):
+                stale.append(crypto_id)
+        return stale
+
+    @classmethod
+    def load_or_build(cls, csv_manager, directory=SNAPSHOT_DIR, max_stale=0):
+        """Open the snapshot, rebuilding it first when more than `max_stale` coins changed"""
+        snapshot = cls(directory)
+        if not snapshot.open() or len(snapshot.stale_ids(csv_manager)) > max_stale:
+            snapshot.build(csv_manager)
+        return snapshot
+
+    # ---- Read ----
+    def records(self, crypto_id, path):
+        """Rows of a coin shaped like CSVManager._read_records, or None if absent or stale"""
+        self.refresh()
+        version, index, values, days = self._state
+        entry = index.get(crypto_id)
+        if entry is None:
+            return None
+        try:
+            if entry['identity'] != _identity(path):
+                return None
+        except OSError:
+            return None
+
+        start, end = entry['start'], entry['end']
+        data = {'date': np.datetime_as_string(days[start:end].astype('datetime64[D]')).tolist()}
+        block = values[start:end]
+        for col in entry['columns'][1:]:
+            column = block[:, COLUMNS.index(col)]
+            if col in entry['int_columns']:
+                data[col] = column.astype(np.int64).tolist()
+            else:
+                data[col] = [None if value != value else value for value in column.tolist()]
+        names = entry['columns']
+        return [dict(zip(names, row)) for row in zip(*(data[name] for name in names))]
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    MarketSnapshot().build(CSVManager())
@@ -0,0 +1,236 @@
+import bisect
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _ShardedMetric:
+    """
+    Base for in-process metrics that never lock on the hot path.
+
+    Each thread writes only to its own shard (a dict keyed by label values), so
+    updates are plain dict operations; the one-time shard registration per thread
+    and the scrape are the only places that take a lock. Shards of threads that
+    have exited are folded into one retired shard there, so servers that start
+    a thread per request keep a shard per live thread, not per request.
+    """
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._local = threading.local()
+        self._shards = {}  # thread -> its shard
+        self._retired = {}  # totals of exited threads
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._shards_lock:
+                self._retire_dead()
+                self._shards[threading.current_thread()] = shard
+            self._local.shard = shard
+            return shard
+
+    def _retire_dead(self):
+        """Fold the shards of exited threads into the retired totals (caller holds the lock)"""
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            for labels, value in self._shards.pop(thread).items():
+                self._merge(self._retired, labels, value)
+
+    def _merge(self, target, labels, value):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        with self._shards_lock:
+            self._retire_dead()
+            return [dict(self._retired)] + [dict(shard) for shard in self._shards.values()]
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshot():
+            for labels, value in shard.items():
+                self._merge(totals, labels, value)
+        return totals
+
+    def _format_labels(self, values, extra=None):
+        pairs = list(zip(self.label_names, values)) + (extra or [])
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter(_ShardedMetric):
+    metric_type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def _merge(self, target, labels, value):
+        target[labels] = target.get(labels, 0) + value
+
+    def value(self, *label_values):
+        return self.values().get(label_values, 0)
+
+    def expose(self):
+        return [f"{self.name}{self._format_labels(labels)} {value}" for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_ShardedMetric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        series = shard.get(label_values)
+        if series is None:
+            # [per-bucket counts..., +Inf count, sum]
+            series = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values):
+        return _HistogramTimer(self, label_values)
+
+    def _merge(self, target, labels, series):
+        merged = target.setdefault(labels, [0] * len(series))
+        for i, v in enumerate(list(series)):
+            merged[i] += v
+
+    def expose(self):
+        lines = []
+        for labels, series in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {cumulative}")
+        return lines
+
+
+class _HistogramTimer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Gauge:
+    """A value computed at scrape time by a callback returning {label values: value}"""
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.callback = callback
+
+    _format_labels = _ShardedMetric._format_labels
+
+    def expose(self):
+        try:
+            values = self.callback() if self.callback else {}
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{self._format_labels(labels)} {value}"
+                for labels, value in sorted(values.items()) if value is not None]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name, documentation, labels=(), callback=None):
+        return self.register(Gauge(name, documentation, labels, callback))
+
+    def expose(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+def process_rss_bytes():
+    """Resident set size of this process (current on Linux, peak elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+# ---- Application metrics ----
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency per route', labels=('route', 'method'))
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests per route and status code', labels=('route', 'status'))
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss)', labels=('cache', 'result'))
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    'analysis_duration_seconds', 'Model and indicator computation time',
+    labels=('analysis', 'time_frame'), buckets=DEFAULT_BUCKETS + (120.0, 300.0))
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    'pipeline_stage_duration_seconds', 'Wall time of one pipeline stage run', labels=('stage',),
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0))
+PIPELINE_STAGE_ITEMS = REGISTRY.counter(
+    'pipeline_stage_items_total', 'Items (symbols, coins, rows) handled per pipeline stage', labels=('stage',))
+PROCESS_START_TIME = time.time()
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+REGISTRY.gauge('cache_hit_ratio', 'Hits / lookups per cache since start', labels=('cache',),
+               callback=_cache_hit_ratios)
+REGISTRY.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', callback=process_rss_bytes)
+REGISTRY.gauge('process_start_time_seconds', 'Start time of the process since unix epoch',
+               callback=lambda: PROCESS_START_TIME)
@@ -0,0 +1,144 @@
+import csv
+import io
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from config import METRICS_DIR, MARKET_DIR, MARKET_COLUMNS, CSV_ENCODING
+
+
+class MetricsTable:
+    """
+    Cross-sectional daily metrics: one partition file per date, a row per coin.
+
+    save_daily_metrics appends each coin's row to its date's partition with a
+    single O_APPEND write, so the cost does not grow with the number of coins
+    already saved that day; a new partition is linked into place with its header
+    and first row already written. A coin saved twice on one day has two rows; readers
+    keep its last one. Questions about the whole market on one date ("every
+    coin's price, volume and market cap on X") read one small file instead of
+    one per coin.
+
+    Stores that predate the table are migrated by an explicit step (the
+    pipeline's first stage or `python -m utils.metrics_table`), never from a
+    request; a marker file records that the migration completed.
+    """
+
+    MIGRATED_MARKER = '.migrated'
+
+    def __init__(self, csv_manager, directory=MARKET_DIR, columns=MARKET_COLUMNS):
+        self.csv_manager = csv_manager
+        self.directory = directory
+        self.columns = ('crypto_id', *columns)
+        self.logger = logging.getLogger(__name__)
+
+    def _path(self, date):
+        return os.path.join(self.directory, f"{date}.csv")
+
+    def _line(self, crypto_id, row):
+        buffer = io.StringIO()
+        values = [crypto_id, *(row.get(col) for col in self.columns[1:])]
+        csv.writer(buffer, lineterminator='\n').writerow(['' if value is None else value for value in values])
+        return buffer.getvalue()
+
+    def is_migrated(self):
+        return os.path.exists(os.path.join(self.directory, self.MIGRATED_MARKER))
+
+    def ensure_migrated(self):
+        """Run the migration unless a previous one completed; returns the partition count or None"""
+        return None if self.is_migrated() else self.migrate()
+
+    # ---- Write ----
+    def append(self, crypto_id, rows):
+        """Add a coin's metric rows (dicts with 'date') to their date partitions"""
+        os.makedirs(self.directory, exist_ok=True)
+        for row in rows:
+            if not row.get('date'):
+                continue
+            path = self._path(str(row['date'])[:10])
+            line = self._line(crypto_id, row).encode(CSV_ENCODING)
+            if not os.path.exists(path) and self._create(path, line):
+                continue
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def _create(self, path, line):
+        """
+        Publish a new partition holding the header and `line`; False if it already exists.
+        The file is written aside and linked into place, so no writer ever sees it without its header.
+        """
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tmp:
+            tmp.write((",".join(self.columns) + "\n").encode(CSV_ENCODING) + line)
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def migrate(self, metrics_dir=METRICS_DIR):
+        """
+        Rebuild every partition from the per-coin metrics files; returns the partition count.
+        The per-coin files hold every appended row too, so an interrupted migration is simply run again.
+        """
+        by_date = defaultdict(list)
+        for file in sorted(os.listdir(metrics_dir)):
+            if not file.endswith('_metrics.csv'):
+                continue
+            try:
+                df = pd.read_csv(os.path.join(metrics_dir, file), encoding=CSV_ENCODING)
+            except Exception as e:
+                self.logger.warning(f"Skipping {file}: {e}")
+                continue
+            if 'date' not in df.columns or 'price' not in df.columns:
+                continue  # exchange snapshots, not coin metrics
+            df = df.reindex(columns=['date', *self.columns[1:]])
+            df.insert(0, 'crypto_id', file[:-len('_metrics.csv')])
+            for date, rows in df.groupby(df['date'].astype(str).str[:10]):
+                by_date[date].append(rows.drop(columns='date'))
+
+        os.makedirs(self.directory, exist_ok=True)
+        for date, frames in by_date.items():
+            partition = pd.concat(frames).drop_duplicates(subset='crypto_id', keep='last')
+            self.csv_manager._write_csv(partition, self._path(date))
+        with open(os.path.join(self.directory, self.MIGRATED_MARKER), 'w', encoding=CSV_ENCODING) as marker:
+            marker.write(f"{len(by_date)}\n")
+        self.logger.info(f"Migrated per-coin metrics into {len(by_date)} daily partitions")
+        return len(by_date)
+
+    # ---- Read ----
+    def dates(self):
+        """Dates with a partition, ascending"""
+        try:
+            return sorted(file[:-len('.csv')] for file in os.listdir(self.directory) if file.endswith('.csv'))
+        except OSError:
+            return []
+
+    def load(self, date=None):
+        """Every coin's metrics on `date` (the latest partition when None) as records; [] if absent"""
+        if date is None:
+            dates = self.dates()
+            if not dates:
+                return []
+            date = dates[-1]
+        return self.csv_manager._cached_read('market', self._path(date), self._read_partition) or []
+
+    @staticmethod
+    def _read_partition(file):
+        df = pd.read_csv(file, encoding=CSV_ENCODING).drop_duplicates(subset='crypto_id', keep='last')
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    CSVManager().metrics_table.migrate()  # also redoes a completed migration
@@ -0,0 +1,214 @@
+import contextvars
+import functools
+import inspect
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Stack of span names for the current thread / asyncio task
+_current_path = contextvars.ContextVar('profiler_span_path', default=())
+
+
+class SpanStats:
+    """Aggregated timings of one span; percentiles come from a bounded reservoir sample"""
+
+    RESERVOIR_SIZE = 2048
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.samples = []
+
+    def add(self, duration_ns):
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        if len(self.samples) < self.RESERVOIR_SIZE:
+            self.samples.append(duration_ns)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.RESERVOIR_SIZE:
+                self.samples[slot] = duration_ns
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'p50_ms': self.percentile(0.50) / 1e6,
+            'p95_ms': self.percentile(0.95) / 1e6,
+            'max_ms': self.max_ns / 1e6
+        }
+
+
+# Singleton SpanProfiler
+class SpanProfiler:
+    """
+    Collects nested timing spans (perf_counter_ns).
+
+    The current span stack lives in a ContextVar, so spans nest correctly per
+    thread and per asyncio task. Spans are aggregated by their full path for the
+    call tree, and by (name, tag) so time can be attributed per coin or indicator.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.enabled = True
+            cls._instance._lock = threading.Lock()
+            cls._instance.reset()
+        return cls._instance
+
+    def reset(self):
+        with self._lock:
+            self.path_stats = {}
+            self.tag_stats = {}
+
+    @contextmanager
+    def span(self, name, tag=None):
+        if not self.enabled:
+            yield
+            return
+
+        path = _current_path.get() + (name,)
+        token = _current_path.set(path)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            _current_path.reset(token)
+            self._record(path, tag, duration)
+
+    def _record(self, path, tag, duration_ns):
+        with self._lock:
+            self.path_stats.setdefault(path, SpanStats()).add(duration_ns)
+            if tag is not None:
+                self.tag_stats.setdefault((path[-1], str(tag)), SpanStats()).add(duration_ns)
+
+    # ---- Reporting ----
+    def stats(self):
+        """Per-path statistics, slowest total first"""
+        with self._lock:
+            rows = [dict(path=';'.join(path), **stats.as_dict()) for path, stats in self.path_stats.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def tagged_stats(self, name=None):
+        """Per (span, tag) statistics, e.g. time per coin"""
+        with self._lock:
+            rows = [dict(span=span, tag=tag, **stats.as_dict())
+                    for (span, tag), stats in self.tag_stats.items() if name is None or span == name]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def export_collapsed(self):
+        """Folded stacks ('a;b;c <self time in us>') as consumed by flamegraph.pl / speedscope"""
+        with self._lock:
+            totals = {path: stats.total_ns for path, stats in self.path_stats.items()}
+        child_totals = {}
+        for path, total in totals.items():
+            if len(path) > 1:
+                child_totals[path[:-1]] = child_totals.get(path[:-1], 0) + total
+
+        lines = []
+        for path, total in sorted(totals.items()):
+            self_us = max(total - child_totals.get(path, 0), 0) // 1000
+            if self_us:
+                lines.append(f"{';'.join(path)} {self_us}")
+        return '\n'.join(lines)
+
+    def report(self, limit=30):
+        lines = [f"{'count':>8} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}  span"]
+        for row in self.stats()[:limit]:
+            lines.append(f"{row['count']:>8} {row['total_ms']:>10.2f} {row['p50_ms']:>9.3f} "
+                         f"{row['p95_ms']:>9.3f} {row['max_ms']:>9.3f}  {row['path']}")
+        return '\n'.join(lines)
+
+
+def propagate_context(func):
+    """
+    Bind func to a copy of the caller's context, so spans it opens in a worker
+    thread (e.g. via ThreadPoolExecutor.submit) nest under the caller's span.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return wrapper
+
+
+def profiled(name=None, tag_arg=None):
+    """
+    Decorator that runs a function (sync or async) inside a span.
+
+    :param name: span name, defaults to the function's qualified name
+    :param tag_arg: name of an argument whose value tags the span (e.g. 'crypto_id')
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        tag_index = None
+        if tag_arg:
+            params = list(inspect.signature(func).parameters)
+            tag_index = params.index(tag_arg) if tag_arg in params else None
+
+        def tag_of(args, kwargs):
+            if tag_arg is None:
+                return None
+            if tag_arg in kwargs:
+                return kwargs[tag_arg]
+            if tag_index is not None and tag_index < len(args):
+                return args[tag_index]
+            return None
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with SpanProfiler().span(span_name, tag_of(args, kwargs)):
+                    return await func(*args, **kwargs)
+            async_wrapper.__profiled__ = True
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with SpanProfiler().span(span_name, tag_of(args, kwargs)):
+                return func(*args, **kwargs)
+        wrapper.__profiled__ = True
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls, tag_arg='crypto_id', include_private=False):
+    """
+    Wrap the methods of a class in spans named 'Class.method', in place.
+
+    Methods that take a `tag_arg` parameter are tagged with its value, which gives
+    per-coin timings for CSVManager, the filters and the analysis strategies.
+    """
+    for attr_name, attr in list(vars(cls).items()):
+        if attr_name.startswith('__') or (attr_name.startswith('_') and not include_private):
+            continue
+        if isinstance(attr, (staticmethod, classmethod)) or not inspect.isfunction(attr):
+            continue
+        if getattr(attr, '__profiled__', False):
+            continue
+        setattr(cls, attr_name, profiled(f"{cls.__name__}.{attr_name}", tag_arg)(attr))
+    return cls
+
+
+def instrument_flask(app):
+    """Wrap every registered Flask view in a span named after its route"""
+    rules = {rule.endpoint: rule.rule for rule in app.url_map.iter_rules()}
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint == 'static' or getattr(view, '__profiled__', False):
+            continue
+        app.view_functions[endpoint] = profiled(f"route {rules.get(endpoint, endpoint)}",
+                                                tag_arg='crypto_id')(view)
+    return app
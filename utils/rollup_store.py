@@ -0,0 +1,142 @@
+import bisect
+import logging
+import os
+import threading
+
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+from config import HISTORICAL_DIR, ROLLUP_DIR, ROLLUP_TIMEFRAMES, CSV_ENCODING
+
+OHLCV_AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def _bucket_length(offset):
+    """Fixed bucket length of day/intraday rules ('3D'), None for calendar-anchored ones (W, ME, QE)"""
+    if isinstance(offset, pd.offsets.Day):
+        return pd.Timedelta(days=offset.n)
+    if isinstance(offset, Tick):
+        return pd.Timedelta(offset)
+    return None
+
+
+def bucket_labels(dates, rule):
+    """
+    Label of the bucket each date falls in.
+
+    Calendar rules are labelled like pandas resampling (the week's Sunday for
+    'W', the period end for 'ME' and 'QE'); fixed-length rules count buckets
+    from the epoch, so a bucket does not move when older history is dropped.
+    """
+    offset = to_offset(rule)
+    length = _bucket_length(offset)
+    if isinstance(dates, pd.Timestamp):
+        return dates.floor(length) if length is not None else offset.rollforward(dates)
+    dates = pd.DatetimeIndex(dates)
+    return dates.floor(length) if length is not None else dates + offset * 0
+
+
+def rollup(df, rule):
+    """OHLCV bars of `rule` from daily rows (a DataFrame with a datetime 'date' column)"""
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in df.columns}
+    bars = df.groupby(bucket_labels(df['date'], rule)).agg(agg).dropna()
+    bars.index.name = 'date'
+    return bars.reset_index()
+
+
+class RollupStore:
+    """
+    Materialized higher-timeframe bars, one CSV per coin and timeframe.
+
+    Rollups follow the daily store through the CSVManager change feed: when
+    days from `start` onwards are saved, only the buckets from the one holding
+    `start` are recomputed and the earlier bars are kept as they are, so a
+    daily append touches just the open bucket. A rollup older than its daily
+    file (written by a process without the feed, or never built) is rebuilt on
+    read.
+    """
+
+    def __init__(self, csv_manager, directory=ROLLUP_DIR, timeframes=ROLLUP_TIMEFRAMES):
+        self.csv_manager = csv_manager
+        self.directory = directory
+        self.timeframes = timeframes  # analysis time_frame -> pandas rule
+        self.logger = logging.getLogger(__name__)
+        self._locks = {}  # crypto_id -> lock serializing its rollup updates
+
+    def _path(self, crypto_id, time_frame):
+        return os.path.join(self.directory, time_frame, f"{crypto_id}_{time_frame}.csv")
+
+    def _is_current(self, crypto_id, time_frame):
+        try:
+            daily = os.stat(os.path.join(HISTORICAL_DIR, f"{crypto_id}_historical.csv"))
+            return os.stat(self._path(crypto_id, time_frame)).st_mtime_ns >= daily.st_mtime_ns
+        except OSError:
+            return False
+
+    def _write(self, crypto_id, time_frame, bars):
+        path = self._path(crypto_id, time_frame)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.csv_manager._write_csv(bars.assign(date=bars['date'].dt.strftime('%Y-%m-%d')), path)
+
+    # ---- Maintain ----
+    def on_change(self, entry):
+        """ChangeFeed subscriber for 'historical' saves"""
+        self.update(entry['crypto_id'], entry.get('start'))
+
+    def update(self, crypto_id, since=None):
+        """Recompute every timeframe from the bucket holding `since` (all buckets when None)"""
+        records = self.csv_manager.load_historical_records(crypto_id)
+        if not records or 'close' not in records[-1]:
+            return
+        with self._locks.setdefault(crypto_id, threading.Lock()):
+            for time_frame, rule in self.timeframes.items():
+                try:
+                    self._update_time_frame(crypto_id, time_frame, rule, records, since)
+                except Exception as e:
+                    self.logger.error(f"Rollup {time_frame} of {crypto_id} failed: {e}")
+
+    def _update_time_frame(self, crypto_id, time_frame, rule, records, since):
+        path = self._path(crypto_id, time_frame)
+        kept, first = None, 0
+        if since is not None and os.path.exists(path):
+            label = bucket_labels(pd.Timestamp(since), rule)
+            existing = pd.read_csv(path, encoding=CSV_ENCODING, parse_dates=['date'], float_precision='round_trip')
+            kept = existing[existing['date'] < label]
+            # Dates are sorted and labels never decrease with them, so the open bucket's first day bisects
+            first = bisect.bisect_left(records, label, key=lambda row: bucket_labels(pd.Timestamp(row['date']), rule))
+
+        daily = pd.DataFrame(records[first:])
+        daily['date'] = pd.to_datetime(daily['date'])
+        for col in OHLCV_AGG:
+            if col in daily.columns:
+                daily[col] = pd.to_numeric(daily[col], errors='coerce')
+        bars = rollup(daily.dropna(subset=['close']), rule)
+        if kept is not None and len(kept):
+            bars = pd.concat([kept, bars], ignore_index=True)
+        self._write(crypto_id, time_frame, bars)
+
+    def build_all(self):
+        """Rebuild every coin's rollups from its full daily history; returns the coin count"""
+        ids = self.csv_manager.historical_ids()
+        for crypto_id in ids:
+            self.update(crypto_id)
+        self.logger.info(f"Rolled up {len(ids)} coins to {', '.join(self.timeframes)}")
+        return len(ids)
+
+    # ---- Read ----
+    def load(self, crypto_id, time_frame):
+        """Bars of a coin as records (cached; treat as read-only), rebuilding a stale rollup first"""
+        if time_frame not in self.timeframes:
+            raise ValueError(f"Unknown rollup time frame: {time_frame}")
+        if not self._is_current(crypto_id, time_frame):
+            self.update(crypto_id)
+        return self.csv_manager._cached_read('rollup', self._path(crypto_id, time_frame),
+                                             self.csv_manager._read_records) or []
+
+
+if __name__ == "__main__":
+    from utils.csv_manager import CSVManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    CSVManager().rollups.build_all()
@@ -1,6 +1,7 @@
 import time
 import logging
 from contextlib import contextmanager
+from utils.profiler import SpanProfiler
 
 
 # Strategy for logging
@@ -35,19 +36,27 @@ class PerformanceTimer:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance.logger_strategy = logger_strategy or ConsoleLogger()
+            cls._instance.last_elapsed = 0.0
         return cls._instance
 
     @contextmanager
     def measure_time(self, operation_name="Operation"):
-        start_time = time.time()
+        """Time a block; nested measurements show up as nested spans in SpanProfiler"""
+        start_time = time.perf_counter_ns()
         self.logger_strategy.log(f"Starting {operation_name}...")
 
         try:
-            yield
+            with SpanProfiler().span(operation_name):
+                yield
         finally:
-            elapsed_time = time.time() - start_time
+            elapsed_time = (time.perf_counter_ns() - start_time) / 1e9
+            self.last_elapsed = elapsed_time
             self.logger_strategy.log(f"{operation_name} completed in {elapsed_time:.2f} seconds")
 
+    def get_elapsed_time(self):
+        """Seconds taken by the most recently finished measurement"""
+        return self.last_elapsed
+
 
 # Example usage:
 if __name__ == "__main__":
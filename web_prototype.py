@@ -2,45 +2,69 @@ import os
 import math
 import sys
 import logging
-from flask import Flask, render_template, request, jsonify
+import time
+import threading
+from datetime import datetime
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context
 
 # Utilities
 from utils.csv_manager import CSVManager
 from utils.timer import PerformanceTimer
+from utils.profiler import SpanProfiler, instrument_class, instrument_flask
+from utils.job_queue import JobQueue
+from utils.event_broadcaster import EventBroadcaster
+from utils.lazy_import import module_available
+from utils.metrics import (REGISTRY, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, ANALYSIS_SECONDS,
+                           PIPELINE_STAGE_SECONDS, PIPELINE_STAGE_ITEMS)
 
 # Filters & Strategies
 from filters.symbol_filter import SymbolFilter
 from filters.date_check_filter import DateCheckFilter
 from filters.data_fill_filter import DataFillFilter
+from filters.data_quality_filter import DataQualityFilter
 from filters.strategies.symbol_strategy import SymbolStrategy
 from filters.strategies.daily_update_strategy import DailyUpdateStrategy
 from filters.strategies.crypto_compare_strategy import CryptoCompareStrategy
+from filters.strategies.coingecko_strategy import CoinGeckoStrategy
+from filters.strategies.composite_fetch_strategy import CompositeFetchStrategy, FetchProvider
+from filters.strategies.priority_update_strategy import PriorityUpdateStrategy
+from config import (UPDATE_MAX_REQUESTS, UPDATE_MAX_SECONDS, RATE_LIMIT_DELAY, COINGECKO_RATE_LIMIT_DELAY,
+                    PROFILING_ENABLED, INTRADAY_ENABLED, INTRADAY_SOURCE, INTRADAY_TOP_N,
+                    PUSH_ENABLED, EVENT_STREAMS_PER_WORKER)
 
 # Analysis Strategies
 from analysis.strategies.context import AnalysisContext
 
 # Analysis modules
-from analysis.technical_analyzer import TechnicalAnalyzer
+from analysis.technical_analyzer import TechnicalAnalyzer, SUMMARY_INDICATORS
 from analysis.lstm_predictor import LSTMPredictor
+from analysis.lstm_inference import LSTMInference
+from analysis.correlation_engine import CorrelationEngine
+from analysis.screener import Screener, QueryError
+from analysis.alert_engine import AlertEngine
+from analysis.risk_analyzer import RiskAnalyzer
+from analysis.intraday_engine import IntradayEngine, CryptoCompareIntradayFeed, ReplayFeed
+from analysis.analysis_publisher import AnalysisPublisher
 from analysis.onchain_sentiment_analyzer import OnChainSentimentAnalyzer
+from analysis.prediction_job import run_lstm_prediction
+from analysis.strategies.technical_strategy import TechnicalAnalysisStrategy
+from analysis.strategies.lstm_strategy import LSTMAnalysisStrategy
+from analysis.strategies.onchain_strategy import OnChainSentimentStrategy
+from analysis.strategies.risk_strategy import RiskAnalysisStrategy
 
-try:
-    from analysis.strategies.technical_strategy import TechnicalAnalysisStrategy
+# pandas_ta, TensorFlow and TextBlob are imported on first use; only check they are installed
+TECHNICAL_ANALYSIS_AVAILABLE = module_available('pandas_ta')
+LSTM_AVAILABLE = module_available('tensorflow')
+ONCHAIN_AVAILABLE = module_available('textblob')
 
-    TECHNICAL_ANALYSIS_AVAILABLE = True
 
-    from analysis.strategies.lstm_strategy import LSTMAnalysisStrategy
-
-    LSTM_AVAILABLE = True
-
-    ONCHAIN_AVAILABLE = True
-    from analysis.strategies.onchain_strategy import OnChainSentimentStrategy
-
-except ImportError:
-    LSTM_AVAILABLE = False
-    TECHNICAL_ANALYSIS_AVAILABLE = False
-    ONCHAIN_AVAILABLE = False
-    sentiment_analyzer = None
+if PROFILING_ENABLED:
+    for profiled_class in (SymbolFilter, DateCheckFilter, DataFillFilter, DataQualityFilter,
+                           TechnicalAnalysisStrategy, LSTMAnalysisStrategy, OnChainSentimentStrategy,
+                           RiskAnalysisStrategy):
+        instrument_class(profiled_class)
+    instrument_class(CSVManager, include_private=True)
+    instrument_class(TechnicalAnalyzer, include_private=True)
 
 
 class CryptoExchangeProcessor:
@@ -55,12 +79,23 @@ class CryptoExchangeProcessor:
         # ---- Filter Strategies ----
         self.symbol_strategy = SymbolStrategy()
         self.date_strategy = DailyUpdateStrategy()
-        self.fetch_strategy = CryptoCompareStrategy()
+        self.fetch_strategy = CompositeFetchStrategy([
+            FetchProvider('CryptoCompare', CryptoCompareStrategy(rate_limit_delay=0), RATE_LIMIT_DELAY),
+            FetchProvider('CoinGecko', CoinGeckoStrategy(self.csv_manager, rate_limit_delay=0),
+                          COINGECKO_RATE_LIMIT_DELAY)
+        ])
+        self.update_scheduler = PriorityUpdateStrategy(
+            max_requests=UPDATE_MAX_REQUESTS,
+            max_seconds=UPDATE_MAX_SECONDS
+        )
 
         # ---- Filters using injected strategies ----
         self.symbol_filter = SymbolFilter(self.csv_manager, self.symbol_strategy)
         self.date_check_filter = DateCheckFilter(self.csv_manager, self.date_strategy)
-        self.data_fill_filter = DataFillFilter(self.csv_manager, self.fetch_strategy)
+        self.data_quality_filter = DataQualityFilter(self.csv_manager)
+        self.data_fill_filter = DataFillFilter(self.csv_manager, self.fetch_strategy,
+                                               self.update_scheduler, rate_limit_delay=0,
+                                               quality_filter=self.data_quality_filter)
 
         # ---- Analysis Strategies ----
         self.technical_analyzer = TechnicalAnalyzer()
@@ -71,18 +106,50 @@ class CryptoExchangeProcessor:
         )
         self.technical_context = AnalysisContext(self.technical_strategy)
 
-        self.lstm_predictor = LSTMPredictor()
+        self.lstm_inference = LSTMInference()
         self.lstm_strategy = LSTMAnalysisStrategy(
             predictor_class=LSTMPredictor,
             data_provider=self,
             logger=self.logger
         )
         self.lstm_context = AnalysisContext(self.lstm_strategy)
+        self.job_queue = JobQueue()
 
         self.sentiment_analyzer = OnChainSentimentAnalyzer()
         self.onchain_strategy = OnChainSentimentStrategy(self.sentiment_analyzer, self.logger)
         self.onchain_context = AnalysisContext(self.onchain_strategy)
 
+        self.risk_analyzer = RiskAnalyzer(self.csv_manager)
+        self.risk_strategy = RiskAnalysisStrategy(self.risk_analyzer, self.logger)
+        self.risk_context = AnalysisContext(self.risk_strategy)
+
+        self.correlation_engine = CorrelationEngine(self.csv_manager)
+        self.screener = Screener(self.technical_analyzer, self.csv_manager)
+        self.alert_engine = AlertEngine(self.screener, self.csv_manager.changes)
+
+        # ---- Server push ----
+        self.event_broadcaster = EventBroadcaster(max_subscriptions=EVENT_STREAMS_PER_WORKER)
+        self.analysis_publisher = AnalysisPublisher(self.event_broadcaster, self.build_analysis_update,
+                                                    self.csv_manager.changes)
+        self.intraday_engine = None
+        self._intraday_started = False
+        self._intraday_lock = threading.Lock()
+        if INTRADAY_ENABLED:
+            feed = ReplayFeed(self.csv_manager) if INTRADAY_SOURCE == 'replay' else CryptoCompareIntradayFeed()
+            self.intraday_engine = IntradayEngine(self.technical_analyzer, self.event_broadcaster, feed)
+
+    def start_intraday(self):
+        """Start polling intraday bars for the top coins by market cap, once (intraday mode only)"""
+        if self.intraday_engine is None:
+            return False
+        with self._intraday_lock:
+            if not self._intraday_started:
+                symbols = sorted((s for s in self.csv_manager.load_symbols() if s.get('market_cap_rank')),
+                                 key=lambda s: s['market_cap_rank'])[:INTRADAY_TOP_N]
+                self.intraday_engine.start({s['id']: s['symbol'] for s in symbols})
+                self._intraday_started = True
+        return True
+
     def _setup_logging(self):
         logging.basicConfig(
             level=logging.INFO,
@@ -99,20 +166,48 @@ class CryptoExchangeProcessor:
         self.logger.info("Starting Crypto Exchange Analyzer - Pipe and Filter Architecture")
         try:
             with self.timer.measure_time("Complete Crypto Exchange Data Pipeline"):
-                symbols = self.symbol_filter.process()
+                with PIPELINE_STAGE_SECONDS.time('symbol'):
+                    symbols = self.symbol_filter.process()
+                PIPELINE_STAGE_ITEMS.inc('symbol', amount=len(symbols))
                 self.logger.info(f"FILTER 1 COMPLETED: {len(symbols)} symbols retrieved")
 
-                date_info = self.date_check_filter.process(symbols)
+                with PIPELINE_STAGE_SECONDS.time('date_check'):
+                    date_info = self.date_check_filter.process(symbols)
+                PIPELINE_STAGE_ITEMS.inc('date_check', amount=len(date_info))
                 needs_update = len([c for c in date_info if c['needs_update']])
                 self.logger.info(f"FILTER 2 COMPLETED: {needs_update}/{len(symbols)} require updates")
 
-                result = self.data_fill_filter.process(date_info)
+                with PIPELINE_STAGE_SECONDS.time('metrics_migration'):
+                    self.csv_manager.metrics_table.ensure_migrated()  # no-op once the table exists
+                with PIPELINE_STAGE_SECONDS.time('data_fill'):
+                    result = self.data_fill_filter.process(date_info)
+                PIPELINE_STAGE_ITEMS.inc('data_fill', amount=result['processed_count'])
                 self.logger.info(f"FILTER 3 COMPLETED: {result['success_count']} successful downloads")
 
-            return self._create_success_result(result, len(symbols))
+            if self.csv_manager.snapshot is not None and result['success_count']:
+                # Publish a new snapshot version; every worker switches to it on its next refresh
+                self.csv_manager.snapshot.build(self.csv_manager)
         except Exception as e:
             return self._create_error_result(str(e))
 
+        self._run_post_ingest()
+        return self._create_success_result(result, len(symbols))
+
+    def _run_post_ingest(self):
+        """Refresh the consumers of the stored data; a failure is logged and does not fail the data fill"""
+        consumers = [('risk', self.risk_analyzer.refresh)]
+        if TECHNICAL_ANALYSIS_AVAILABLE:
+            consumers += [('screener', self.screener.refresh),  # recomputes only the coins this run saved
+                          ('alerts', self.alert_engine.evaluate)]
+        for stage, refresh in consumers:
+            try:
+                with PIPELINE_STAGE_SECONDS.time(stage):
+                    outcome = refresh()
+                if stage == 'alerts':
+                    PIPELINE_STAGE_ITEMS.inc('alerts', amount=outcome)
+            except Exception as e:
+                self.logger.error(f"Post-ingest stage {stage} failed: {e}")
+
     def _create_success_result(self, result, total_symbols):
         elapsed = self.timer.get_elapsed_time()
         return {
@@ -138,53 +233,23 @@ class CryptoExchangeProcessor:
     def _get_crypto_historical_data(self, crypto_id):
         """Get historical data for a specific cryptocurrency"""
         try:
-            filename = os.path.join('data', 'historical', f"{crypto_id}_historical.csv")
-            if os.path.exists(filename):
-                import pandas as pd
-                import math
-                df = pd.read_csv(filename)
-
-                # Convert DataFrame to list of dictionaries and handle NaN values
-                data = []
-                for record in df.to_dict('records'):
-                    cleaned_record = {}
-                    for key, value in record.items():
-                        # Convert NaN, None, or pandas NA to None
-                        if value is None or (isinstance(value, float) and math.isnan(value)):
-                            cleaned_record[key] = None
-                        else:
-                            cleaned_record[key] = value
-                    data.append(cleaned_record)
-
-                return data
-            return []
+            return self.csv_manager.load_historical_records(crypto_id)
         except Exception as e:
             self.logger.error(f"Error reading historical data for {crypto_id}: {e}")
             return []
 
+    def _get_crypto_rollup_data(self, crypto_id, time_frame):
+        """Get materialized higher-timeframe bars for a specific cryptocurrency"""
+        try:
+            return self.csv_manager.rollups.load(crypto_id, time_frame)
+        except Exception as e:
+            self.logger.error(f"Error reading {time_frame} rollup for {crypto_id}: {e}")
+            return []
+
     def _get_crypto_metrics_data(self, crypto_id):
         """Get metrics data for a specific cryptocurrency"""
         try:
-            filename = os.path.join('data', 'metrics', f"{crypto_id}_metrics.csv")
-            if os.path.exists(filename):
-                import pandas as pd
-                import math
-                df = pd.read_csv(filename)
-
-                # Convert DataFrame to list of dictionaries and handle NaN values
-                data = []
-                for record in df.to_dict('records'):
-                    cleaned_record = {}
-                    for key, value in record.items():
-                        # Convert NaN, None, or pandas NA to None
-                        if value is None or (isinstance(value, float) and math.isnan(value)):
-                            cleaned_record[key] = None
-                        else:
-                            cleaned_record[key] = value
-                    data.append(cleaned_record)
-
-                return data
-            return []
+            return self.csv_manager.load_metrics_records(crypto_id)
         except Exception as e:
             self.logger.error(f"Error reading metrics data for {crypto_id}: {e}")
             return []
@@ -343,21 +408,53 @@ class CryptoExchangeProcessor:
     # Technical Analysis
     def perform_technical_analysis(self, crypto_id, time_frame='daily'):
         if self.technical_context:
-            return self.technical_context.execute(crypto_id, time_frame=time_frame)
+            with ANALYSIS_SECONDS.time('technical', time_frame):
+                return self.technical_context.execute(crypto_id, time_frame=time_frame)
         return None
 
+    def technical_summary(self, crypto_id):
+        """Latest signal and indicator values only; computes just the indicators the summary reads"""
+        records = self._get_crypto_historical_data(crypto_id)
+        if len(records) < 50:
+            return None
+        with ANALYSIS_SECONDS.time('technical_summary', 'daily'):
+            df = self.technical_analyzer.calculate_indicators(records, 'daily', crypto_id, indicators=SUMMARY_INDICATORS)
+        return {'summary': self.technical_analyzer.get_analysis_summary(df)} if 'signal' in df.columns else None
+
+    def build_analysis_update(self, crypto_id):
+        """'analysis' event pushed to watchers after new data for a coin is written"""
+        records = self._get_crypto_historical_data(crypto_id)
+        if not records:
+            return None  # unreadable while the pipeline rewrites it; the next check retries
+        daily_analysis = self.perform_technical_analysis(crypto_id, 'daily') if TECHNICAL_ANALYSIS_AVAILABLE else None
+        return self._convert_numpy_types({
+            'crypto_id': crypto_id,
+            'daily_analysis': daily_analysis,
+            'recent_records': records[-5:],
+            'recent_metrics': self._get_crypto_metrics_data(crypto_id)[-5:]
+        })
+
     # LSTM Analysis
     def perform_lstm_analysis(self, crypto_id):
         if self.lstm_context:
-            return self.lstm_context.execute(crypto_id)
+            with ANALYSIS_SECONDS.time('lstm', 'daily'):
+                return self.lstm_context.execute(crypto_id)
         return {'error': 'LSTM strategy not available'}
 
     # OnChain / Sentiment Analysis
     def perform_onchain_analysis(self, crypto_id):
         if self.onchain_context:
-            return self.onchain_context.execute(crypto_id)
+            with ANALYSIS_SECONDS.time('onchain', 'none'):
+                return self.onchain_context.execute(crypto_id)
         return {'error': 'OnChain/Sentiment strategy not available'}
 
+    # Risk Analysis
+    def perform_risk_analysis(self, crypto_id, points=None):
+        if self.risk_context:
+            with ANALYSIS_SECONDS.time('risk', 'daily'):
+                return self.risk_context.execute(crypto_id, points=points)
+        return {'error': 'Risk strategy not available'}
+
 
 # ------------------ Flask App ------------------
 # Flask Web Application
@@ -367,6 +464,24 @@ processor = CryptoExchangeProcessor()
 # Global variable to track if data has been loaded
 data_loaded = False
 
+REGISTRY.gauge('store_files', 'CSV files per data directory (cached inventory)', labels=('kind',),
+               callback=lambda: {(kind,): count for kind, count in processor.csv_manager.count_files().items()})
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+        HTTP_REQUESTS.inc(route, str(response.status_code))
+    return response
+
 
 def load_initial_data():
     """Load initial cryptocurrency data"""
@@ -452,7 +567,7 @@ def search():
 @app.route('/crypto/<crypto_id>')
 def crypto_details_page(crypto_id):
     """Page showing detailed cryptocurrency data"""
-    return render_template('crypto_details.html', crypto_id=crypto_id)
+    return render_template('crypto_details.html', crypto_id=crypto_id, push_enabled=PUSH_ENABLED)
 
 
 @app.route('/api/crypto/<crypto_id>')
@@ -475,10 +590,42 @@ def get_crypto_details_api(crypto_id):
         return jsonify({'error': f'Error loading details: {str(e)}'})
 
 
+@app.route('/api/market')
+def market_day():
+    """
+    Every coin's metrics on ?date= (YYYY-MM-DD, latest day by default), sorted by ?sort= (market_cap)
+    in ?order= (desc) and cut to ?limit=
+    """
+    date = request.args.get('date')
+    sort = request.args.get('sort', 'market_cap')
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    limit = request.args.get('limit', 100, type=int)
+    if date is not None:
+        try:
+            date = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    rows = processor.csv_manager.metrics_table.load(date)
+    if not rows:
+        return jsonify({'error': f'No metrics for {date or "any date"}'}), 404
+    if sort not in rows[0]:
+        return jsonify({'error': f'Unknown sort column: {sort}'}), 400
+
+    ranked = sorted((row for row in rows if row[sort] is not None), key=lambda row: row[sort],
+                    reverse=order == 'desc')
+    return jsonify(processor._convert_numpy_types({
+        'date': date or processor.csv_manager.metrics_table.dates()[-1],
+        'coins': len(rows),
+        'sort': sort,
+        'order': order,
+        'rows': ranked[:limit]
+    }))
+
+
 @app.route('/analysis/<crypto_id>')
 def analysis_page(crypto_id):
     """Technical analysis page for a cryptocurrency"""
-    return render_template('analysis.html', crypto_id=crypto_id)
+    return render_template('analysis.html', crypto_id=crypto_id, push_enabled=PUSH_ENABLED)
 
 
 @app.route('/api/analysis/<crypto_id>')
@@ -525,7 +672,7 @@ def get_top_cryptos_analysis(top_n):
 
         # Analyze top N cryptocurrencies
         for crypto in symbols[:20]:  # Limit to 20 for performance
-            analysis = processor.perform_technical_analysis(crypto['id'], 'daily')
+            analysis = processor.technical_summary(crypto['id'])
             if analysis:
                 analysis_data[crypto['id']] = analysis
 
@@ -571,34 +718,182 @@ def get_all_cryptos():
 @app.route('/status')
 def status():
     """Check application status"""
-    symbols_count = len([f for f in os.listdir('data/symbols') if f.endswith('.csv')]) if os.path.exists(
-        'data/symbols') else 0
-    historical_count = len([f for f in os.listdir('data/historical') if f.endswith('.csv')]) if os.path.exists(
-        'data/historical') else 0
-    metrics_count = len([f for f in os.listdir('data/metrics') if f.endswith('.csv')]) if os.path.exists(
-        'data/metrics') else 0
+    file_counts = processor.csv_manager.count_files()
 
     return jsonify({
         'status': 'running',
         'data_loaded': data_loaded,
-        'symbols_count': symbols_count,
-        'historical_files': historical_count,
-        'metrics_files': metrics_count,
+        'symbols_count': file_counts['symbols'],
+        'historical_files': file_counts['historical'],
+        'metrics_files': file_counts['metrics'],
         'technical_analysis_available': TECHNICAL_ANALYSIS_AVAILABLE
     })
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/predict/<crypto_id>')
 def lstm_predict(crypto_id):
-    if not LSTM_AVAILABLE:
-        return jsonify({'error': 'LSTM not available. Install TensorFlow.'})
+    """LSTM forecast from exported weights, or a queued training job to poll at /api/jobs/<job_id>"""
     try:
-        result = processor.perform_lstm_analysis(crypto_id)
-        return jsonify(processor._convert_numpy_types(result))
+        # Exported weights are served in-process; training only runs in the job pool
+        retrain = request.args.get('retrain') == '1'
+        if not retrain:
+            result = processor.lstm_inference.predict(crypto_id, processor._get_crypto_historical_data(crypto_id))
+            if result is not None:
+                return jsonify({'status': 'done', 'result': result})
+
+        if not LSTM_AVAILABLE:
+            return jsonify({'error': 'LSTM not available. Install TensorFlow.'})
+        job_id = processor.job_queue.submit('lstm', crypto_id, run_lstm_prediction, crypto_id,
+                                             reuse_result=not retrain)
+        job = processor.job_queue.get(job_id)
+        return jsonify({
+            'job_id': job_id,
+            'status': job['status'],
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
     except Exception as e:
         return jsonify({'error': str(e)})
 
 
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a background job, with its result once done"""
+    job = processor.job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/events')
+def event_stream():
+    """Server-Sent Events for the coins in ?coins=a,b (every coin when omitted)"""
+    if not PUSH_ENABLED:
+        return jsonify({'error': 'Server push is disabled (set CRYPTO_PUSH=1)'}), 404
+    coins = [c for c in request.args.get('coins', '').split(',') if c]
+    subscription = processor.event_broadcaster.subscribe(coins or None)
+    if subscription is None:
+        # Each stream holds a request thread; refuse rather than starve ordinary requests
+        return jsonify({'error': 'Too many open event streams, retry later'}), 503, {'Retry-After': '30'}
+    processor.analysis_publisher.start()
+    return Response(stream_with_context(subscription.stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/intraday/<crypto_id>')
+def intraday(crypto_id):
+    """Latest intraday signal, indicators and the last ?points= bars of a coin"""
+    if processor.intraday_engine is None:
+        return jsonify({'error': 'Intraday mode is disabled (set CRYPTO_INTRADAY=1)'}), 503
+    processor.start_intraday()  # no-op once polling runs
+    snapshot = processor.intraday_engine.snapshot(crypto_id, min(request.args.get('points', 120, type=int), 1440))
+    if snapshot is None:
+        return jsonify({'error': f'No intraday data for {crypto_id} yet'}), 404
+    return jsonify(snapshot)
+
+
+@app.route('/api/screen')
+def screen():
+    """Coins whose latest indicators match ?q= (e.g. RSI < 30 and close > SMA_200), sorted by ?sort= and cut to ?limit="""
+    if not TECHNICAL_ANALYSIS_AVAILABLE:
+        return jsonify({'error': 'Technical analysis not available. Install pandas-ta.'}), 503
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query (?q=)'}), 400
+    try:
+        result = processor.screener.screen(query, sort=request.args.get('sort'),
+                                           descending=request.args.get('order', 'desc') != 'asc',
+                                           limit=min(request.args.get('limit', 50, type=int), 1000))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(processor._convert_numpy_types({'query': query, **result}))
+
+
+@app.route('/api/alerts/rules', methods=['GET', 'POST'])
+def alert_rules():
+    """List alert rules, or add one from a JSON body {name, condition, coins?}"""
+    if request.method == 'GET':
+        return jsonify(processor.alert_engine.rules())
+    if not TECHNICAL_ANALYSIS_AVAILABLE:
+        return jsonify({'error': 'Technical analysis not available. Install pandas-ta.'}), 503
+    body = request.get_json(silent=True) or {}
+    condition = str(body.get('condition', '')).strip()
+    if not condition:
+        return jsonify({'error': 'Missing condition'}), 400
+    try:
+        rule = processor.alert_engine.add_rule(body.get('name') or condition, condition, body.get('coins'))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(rule), 201
+
+
+@app.route('/api/alerts/rules/<int:rule_id>', methods=['DELETE'])
+def remove_alert_rule(rule_id):
+    if not processor.alert_engine.remove_rule(rule_id):
+        return jsonify({'error': 'Unknown rule'}), 404
+    return jsonify({'removed': rule_id})
+
+
+@app.route('/api/alerts/outbox', methods=['GET', 'POST'])
+def alert_outbox():
+    """Undelivered alerts (GET ?limit=); POST {ids: [...]} marks them delivered"""
+    if request.method == 'GET':
+        return jsonify(processor.alert_engine.pending(min(request.args.get('limit', 100, type=int), 1000)))
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list):
+        return jsonify({'error': 'Expected {"ids": [...]}'}), 400
+    return jsonify({'delivered': processor.alert_engine.mark_delivered([i for i in ids if isinstance(i, int)])})
+
+
+@app.route('/api/correlation/<crypto_id>')
+def correlation(crypto_id):
+    """Top-k coins by return correlation over the rolling window, plus the coin's cluster"""
+    try:
+        k = min(request.args.get('k', 10, type=int), 100)
+        engine = processor.correlation_engine
+        engine.ensure_fresh()
+        if crypto_id not in engine.coin_ids:
+            return jsonify({'error': f'No return history for {crypto_id}'}), 404
+
+        clusters = engine.clusters()
+        cluster = clusters.get(crypto_id)
+        members = clusters.index[clusters == cluster].tolist() if cluster is not None else []
+        correlated = engine.top_correlated(crypto_id, k)
+        result = {
+            'crypto_id': crypto_id,
+            'window_days': engine.window,
+            'as_of': engine.last_date.strftime('%Y-%m-%d'),
+            'return_days': engine.return_days(crypto_id),
+            'correlated': correlated,
+            'cluster': int(cluster) if cluster is not None else None,
+            'cluster_size': len(members),
+            'cluster_members': [m for m in members if m != crypto_id][:50]
+        }
+        if not correlated:
+            result['reason'] = (f"No coin shares at least {engine.min_overlap} return days with {crypto_id} "
+                                f"in the window")
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+
+@app.route('/api/risk/<crypto_id>')
+def risk(crypto_id):
+    """Latest volatility, drawdown, VaR/CVaR and beta of a coin, with the last ?points= days of rolling values"""
+    points = request.args.get('points', 90, type=int)
+    if points < 1:
+        return jsonify({'error': 'points must be at least 1'}), 400
+    result = processor.perform_risk_analysis(crypto_id, min(points, 1000))
+    if result is None:
+        return jsonify({'error': f'No candle history for {crypto_id}'}), 404
+    return jsonify(processor._convert_numpy_types(result))
+
+
 @app.route('/api/onchain_sentiment/<crypto_id>')
 def onchain_sentiment(crypto_id):
     if not ONCHAIN_AVAILABLE:
@@ -610,6 +905,22 @@ def onchain_sentiment(crypto_id):
         return jsonify({'error': str(e)})
 
 
+@app.route('/debug/profile')
+def profile_report():
+    """Span profiler statistics; ?format=folded returns flamegraph input"""
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling disabled. Start with CRYPTO_PROFILING=1.'}), 404
+
+    profiler = SpanProfiler()
+    if request.args.get('format') == 'folded':
+        return profiler.export_collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify({'spans': profiler.stats(), 'tagged': profiler.tagged_stats()})
+
+
+if PROFILING_ENABLED:
+    instrument_flask(app)
+
+
 def display_startup_banner():
     """Display startup information"""
     print("\n" + "=" * 70)
@@ -661,6 +972,10 @@ if __name__ == "__main__":
         print("   Try: Search 'BTC' → Click 'Analyze' for Technical Analysis")
         print("=" * 70)
 
+        # The debug reloader runs this block twice; only its child process serves requests
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and processor.start_intraday():
+            print(f" Intraday mode: polling top {INTRADAY_TOP_N} coins ({INTRADAY_SOURCE})")
+
         # Start the web server
         app.run(debug=True, host='0.0.0.0', port=5000)
     else: